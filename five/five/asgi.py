@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "five.settings")
+os.environ.setdefault("DJANGO_DB_PROFILE", "production")
+os.environ.setdefault("DJANGO_TEMPLATE_PROFILE", "production")
+# Serve the hot todo views from their async implementations (todo/async_views.py).
+os.environ.setdefault("DJANGO_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +27,9 @@ SECRET_KEY = "django-insecure-qc)s8d(mm9fk2$i-!jz&pjoqys))5#v*-=pwtg_wxioifam#*v
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# `manage.py test`; some defaults below differ for the test suite.
+TESTING = sys.argv[1:2] == ["test"]
+
 ALLOWED_HOSTS = []
 
 
@@ -41,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the whole stack.
+    "todo.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,8 +61,11 @@ ROOT_URLCONF = "five.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [BASE_DIR/'todo'/'templates'],
+        # DjangoTemplates plus per-request render timing (todo/metrics.py).
+        "BACKEND": "todo.metrics.InstrumentedDjangoTemplates",
+        # Templates live in the apps' templates/ directories only, so each
+        # lookup searches one place.
+        "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -67,6 +77,15 @@ TEMPLATES = [
     },
 ]
 
+# Production template profile, switched on by five/wsgi.py and five/asgi.py:
+# name the loaders explicitly and keep every compiled template in the cached
+# loader for the life of the process. Template edits need a restart.
+if os.environ.get("DJANGO_TEMPLATE_PROFILE") == "production":
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("django.template.loaders.cached.Loader", ["django.template.loaders.app_directories.Loader"]),
+    ]
+
 WSGI_APPLICATION = "five.wsgi.application"
 
 
@@ -76,10 +95,144 @@ WSGI_APPLICATION = "five.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("DJANGO_DB_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
 
+# Production SQLite profile, switched on by five/wsgi.py and five/asgi.py.
+# WAL lets readers run alongside the single writer, and synchronous=NORMAL is
+# durable enough under WAL. Every transaction starts with BEGIN IMMEDIATE, so
+# a read-then-write block takes the write lock up front and waits out the
+# busy timeout. Otherwise it would fail with "database is locked" when it
+# tried to upgrade. Persistent connections are for WSGI only; Django
+# recommends turning them off under ASGI.
+SQLITE_PRODUCTION_OPTIONS = {
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA mmap_size=268435456;"
+        "PRAGMA cache_size=-64000;"
+    ),
+}
+
+if os.environ.get("DJANGO_DB_PROFILE") == "production":
+    DATABASES["default"].update({
+        "OPTIONS": SQLITE_PRODUCTION_OPTIONS,
+        "CONN_MAX_AGE": 0 if os.environ.get("DJANGO_ASYNC_VIEWS") == "1" else 600,
+        "CONN_HEALTH_CHECKS": True,
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process. Deployments running several worker processes
+# should set DJANGO_CACHE_DIR so every worker shares one file-based cache and
+# sees the same todo_list invalidations.
+
+if os.environ.get("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["DJANGO_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+TODO_LIST_CACHE_TIMEOUT = 300
+
+
+# Sessions and authentication
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/#configuring-the-session-engine
+# By default every login_required request reads the session row and then the
+# auth_user row. DJANGO_SESSION_MODE=cached keeps both in the cache
+# (cached_db sessions plus todo.auth.CachedModelBackend). signed_cookies moves
+# the session into the cookie itself. Either mode must share one cache
+# between all worker processes (DJANGO_CACHE_DIR); otherwise a logout or
+# password change only clears the cache of the worker that handled it.
+SESSION_MODE = os.environ.get("DJANGO_SESSION_MODE", "db")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_MODE]
+AUTHENTICATION_BACKENDS = [
+    "django.contrib.auth.backends.ModelBackend" if SESSION_MODE == "db" else "todo.auth.CachedModelBackend",
+]
+TODO_USER_CACHE_TIMEOUT = 300
+
+# Route todo_list, toggle, reorder and the JSON API to their async views.
+# five/asgi.py turns this on; WSGI deployments keep the sync views.
+TODO_ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS") == "1"
+
+# Live todo_list updates over Server-Sent Events (todo/live.py), served only
+# with the async views. The in-process broker reaches streams in the same
+# process; with several ASGI processes set DJANGO_LIVE_DIR to a directory they
+# share, and writes from any process (WSGI, run_workers) wake every stream.
+if os.environ.get("DJANGO_LIVE_DIR"):
+    TODO_LIVE_BROKER = {
+        "BACKEND": "todo.live.FileBroker",
+        "OPTIONS": {"path": os.environ["DJANGO_LIVE_DIR"], "poll_interval": 0.5},
+    }
+else:
+    TODO_LIVE_BROKER = {"BACKEND": "todo.live.InProcessBroker"}
+# Seconds between keepalive comments on an idle stream.
+TODO_LIVE_KEEPALIVE = 15
+
+# Background jobs (todo/jobs.py), run by `manage.py run_workers`. A deleted
+# project's todos are tombstoned TODO_JOB_DELETE_BATCH per transaction, and a
+# job still running after TODO_JOB_STALE_AFTER seconds is assumed orphaned
+# and requeued.
+TODO_JOB_DELETE_BATCH = 1000
+TODO_JOB_STALE_AFTER = 600
+TODO_JOB_POLL_INTERVAL = 1.0
+# Uploads over TODO_IMPORT_INLINE_BYTES, and exports requested with ?queue=1,
+# run as jobs. Their files live in TODO_JOB_FILES_DIR, which every host
+# running workers must share.
+TODO_IMPORT_INLINE_BYTES = 1_000_000
+TODO_JOB_FILES_DIR = os.environ.get("DJANGO_JOB_FILES_DIR", str(BASE_DIR / "job_files"))
+# Repeating todos (todo/recurrence.py). `manage.py materialize_recurrences`
+# keeps the next TODO_RECURRENCE_AHEAD occurrences of each as real rows;
+# todo_list previews the rest, TODO_RECURRENCE_PREVIEW_DAYS ahead.
+TODO_RECURRENCE_AHEAD = 3
+TODO_RECURRENCE_PREVIEW_DAYS = 14
+# Deletes can be undone until `manage.py purge_deleted` removes them, by
+# default once they are this many days old.
+TODO_PURGE_AFTER_DAYS = 30
+
+# Most SQL queries a request to each view may run, counting the session and
+# user lookups and any SAVEPOINT statements (see todo/metrics.py). Over-budget requests are logged;
+# DJANGO_QUERY_BUDGET_ACTION=raise makes them raise QueryBudgetExceeded, which
+# is the default in the test suite.
+TODO_QUERY_BUDGETS = {
+    "todo_list": 6,
+    "todo_toggle_complete": 7,
+    "todo_complete_bulk": 8,
+    # Five fixed queries plus one UPDATE per 332 ids, at most TODO_REORDER_LIMIT (1000).
+    "reorder_todos": 9,
+    "todo_create": 9,
+    "todo_edit": 12,
+    "todo_delete": 11,
+    "project_list": 4,
+    "dashboard": 4,
+    "api_todo_collection": 9,
+    "api_todo_detail": 11,
+    "api_agenda": 4,
+    "api_sync": 7,
+    "api_stats": 4,
+    "api_project_collection": 6,
+    "api_project_detail": 10,
+    "api_job_collection": 4,
+    "api_job_detail": 4,
+}
+TODO_QUERY_BUDGET_ACTION = os.environ.get("DJANGO_QUERY_BUDGET_ACTION", "raise" if TESTING else "log")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -100,6 +253,39 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# DJANGO_PASSWORD_HASHER picks the hasher for new passwords. "pbkdf2" runs on
+# the bounded pool in todo/hashers.py at DJANGO_PBKDF2_ITERATIONS, "argon2"
+# needs argon2-cffi, and "md5" is for the test suite only (its default there). The remaining entries
+# only verify existing hashes, which are upgraded on the next login.
+PASSWORD_HASHER = os.environ.get("DJANGO_PASSWORD_HASHER", "md5" if TESTING else "pbkdf2")
+PASSWORD_HASHERS = [
+    "todo.hashers.TunablePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+if PASSWORD_HASHER == "argon2":
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+elif PASSWORD_HASHER == "md5":
+    PASSWORD_HASHERS.insert(0, "django.contrib.auth.hashers.MD5PasswordHasher")
+TODO_PBKDF2_ITERATIONS = int(os.environ.get("DJANGO_PBKDF2_ITERATIONS", 1_000_000))
+# Concurrent hashes (default: half the CPUs) and how many more may queue.
+TODO_HASHING_WORKERS = int(os.environ.get("DJANGO_HASHING_WORKERS", 0)) or None
+TODO_HASHING_QUEUE = 16
+TODO_HASHING_WAIT = 5
+
+# Sliding-window limits on login/register attempts (todo/throttle.py).
+TODO_LOGIN_THROTTLE = {
+    "window": 300,
+    "login_per_ip": 30,
+    "login_per_username": 5,
+    "register_per_ip": 10,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "five.settings")
+os.environ.setdefault("DJANGO_DB_PROFILE", "production")
+os.environ.setdefault("DJANGO_TEMPLATE_PROFILE", "production")
 
 application = get_wsgi_application()
@@ -0,0 +1,544 @@
+"""
+JSON API, version 1.
+
+List and detail endpoints for todos and projects, plus bulk endpoints that
+validate every item with the same form rules as the HTML views and write all
+valid items in one transaction. Bulk responses carry one result per item, in
+request order.
+"""
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from . import caching, jobs, recurrence, sharing, stats, sync
+from .forms import BulkToDoForm, ProjectForm, ToDoForm
+from .listing import page_todos
+from .models import Job, Membership, Project, ToDo
+
+DEFAULT_BULK_LIMIT = 1000
+
+DEFAULT_JOB_LIST_SIZE = 20
+
+DEFAULT_AGENDA_DAYS = 7
+MAX_AGENDA_DAYS = 90
+
+TODO_FIELDS = list(ToDoForm._meta.fields)
+PROJECT_FIELDS = list(ProjectForm._meta.fields)
+
+
+class InvalidPayload(Exception):
+    pass
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidPayload as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+    return wrapper
+
+
+def read_json(request):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        raise InvalidPayload('Body must be valid JSON')
+    if not isinstance(payload, dict):
+        raise InvalidPayload('Body must be a JSON object')
+    return payload
+
+
+def read_bulk_items(request, key):
+    items = read_json(request).get(key)
+    if not isinstance(items, list):
+        raise InvalidPayload(f"'{key}' must be a list")
+    limit = getattr(settings, 'TODO_API_BULK_LIMIT', DEFAULT_BULK_LIMIT)
+    if len(items) > limit:
+        raise InvalidPayload(f'At most {limit} items per request')
+    return items
+
+
+def as_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def todo_to_dict(todo):
+    return {
+        'id': todo.pk,
+        'name': todo.name,
+        'description': todo.description,
+        'completed': todo.completed,
+        'priority': todo.priority,
+        'position': todo.position,
+        'due_date': todo.due_date.isoformat() if todo.due_date else None,
+        'project': todo.project_id,
+        'created_at': todo.created_at.isoformat(),
+        'updated_at': todo.updated_at.isoformat(),
+    }
+
+
+def occurrence_to_dict(todo):
+    """A virtual occurrence of a repeating todo: no row, so no id."""
+    return {
+        'id': None,
+        'name': todo.name,
+        'description': todo.description,
+        'completed': False,
+        'priority': todo.priority,
+        'position': todo.position,
+        'due_date': todo.due_date.isoformat(),
+        'project': todo.project_id,
+        'created_at': None,
+        'updated_at': None,
+        'recurrence': todo.occurrence_of_id,
+        'virtual': True,
+    }
+
+
+def project_to_dict(project):
+    return {
+        'id': project.pk,
+        'name': project.name,
+        'description': project.description,
+        'todo_count': project.todo_count,
+        'completed_count': project.completed_count,
+        'created_at': project.created_at.isoformat(),
+    }
+
+
+def membership_to_dict(membership):
+    return {
+        'user': membership.user_id,
+        'username': membership.user.username,
+        'role': membership.role,
+        'created_at': membership.created_at.isoformat(),
+    }
+
+
+def job_to_dict(job):
+    # The traceback in job.error stays server-side; clients see the status.
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'result': job.result,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at and job.started_at.isoformat(),
+        'finished_at': job.finished_at and job.finished_at.isoformat(),
+    }
+
+
+def form_data(instance, fields, changes):
+    """Current field values overlaid with ``changes``, for partial updates."""
+    return {**model_to_dict(instance, fields=fields), **changes}
+
+
+# Todos
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+def todo_collection(request):
+    if request.method == 'GET':
+        todos, next_cursor = page_todos(sharing.own_todos(request.user), request.GET)
+        return JsonResponse({'results': [todo_to_dict(t) for t in todos], 'next': next_cursor})
+
+    form = ToDoForm(form_data(ToDo(), TODO_FIELDS, read_json(request)), user=request.user)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    todo = form.save(commit=False)
+    todo.user = request.user
+    todo.save()
+    return JsonResponse(todo_to_dict(todo), status=201)
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def todo_detail(request, pk):
+    todo = get_object_or_404(sharing.own_todos(request.user), pk=pk)
+    if request.method == 'PATCH':
+        form = ToDoForm(form_data(todo, TODO_FIELDS, read_json(request)), instance=todo, user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        form.save()
+    elif request.method == 'DELETE':
+        todo.soft_delete()
+        return HttpResponse(status=204)
+    return JsonResponse(todo_to_dict(todo))
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def todo_restore(request, pk):
+    """Undo a delete, until purge_deleted removes the tombstone."""
+    todo = get_object_or_404(ToDo.all_objects, pk=pk, user=request.user, deleted_at__isnull=False)
+    if todo.project_id and not Project.objects.filter(pk=todo.project_id).exists():
+        return JsonResponse({'error': 'Restore the project first'}, status=409)
+    todo.restore()
+    return JsonResponse(todo_to_dict(todo))
+
+
+@api_login_required
+@require_http_methods(['POST', 'PATCH', 'DELETE'])
+def todo_bulk(request):
+    """POST creates ``items``, PATCH updates ``items`` by id, DELETE removes ``ids``."""
+    if request.method == 'DELETE':
+        results = bulk_delete_todos(request.user, read_bulk_items(request, 'ids'))
+    elif request.method == 'PATCH':
+        results = bulk_update_todos(request.user, read_bulk_items(request, 'items'))
+    else:
+        results = bulk_create_todos(request.user, read_bulk_items(request, 'items'))
+    caching.bump_list_version(request.user.pk)
+    return JsonResponse({'results': results})
+
+
+def user_projects(user):
+    """The projects ``user`` may add todos to, by pk: the same rule as ToDoForm."""
+    return sharing.editable_projects(user).in_bulk()
+
+
+def bulk_create_todos(user, items):
+    projects = user_projects(user)
+    results, created = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 'invalid', 'errors': {'__all__': ['Expected an object']}})
+            continue
+        form = BulkToDoForm(form_data(ToDo(), TODO_FIELDS, item), user=user, projects=projects)
+        if not form.is_valid():
+            results.append({'index': index, 'status': 'invalid', 'errors': form.errors})
+            continue
+        todo = form.save(commit=False)
+        todo.user = user
+        result = {'index': index, 'status': 'created'}
+        results.append(result)
+        created.append((result, todo))
+
+    todos = [todo for _, todo in created]
+    with transaction.atomic():
+        ToDo.objects.bulk_create(todos)
+        Project.adjust_counts(Project.count_deltas((t.project_id, t.completed) for t in todos))
+    for result, todo in created:
+        result['id'] = todo.pk
+    return results
+
+
+def bulk_update_todos(user, items):
+    projects = user_projects(user)
+    existing = sharing.own_todos(user).in_bulk(
+        [pk for pk in (as_pk(item.get('id')) for item in items if isinstance(item, dict)) if pk]
+    )
+    results, changed, before, seen = [], [], [], set()
+    now = timezone.now()
+    for index, item in enumerate(items):
+        todo = existing.get(as_pk(item.get('id'))) if isinstance(item, dict) else None
+        if todo is None:
+            results.append({'index': index, 'status': 'not_found'})
+            continue
+        if todo.pk in seen:
+            # The counter deltas need each row's stored state, taken once.
+            results.append({'index': index, 'id': todo.pk, 'status': 'invalid',
+                            'errors': {'id': ['Appears more than once in this request']}})
+            continue
+        seen.add(todo.pk)
+        before.append((todo.project_id, todo.completed))
+        changes = {k: v for k, v in item.items() if k != 'id'}
+        form = BulkToDoForm(form_data(todo, TODO_FIELDS, changes), instance=todo, user=user, projects=projects)
+        if not form.is_valid():
+            before.pop()
+            # A failed form may have half-applied cleaned values to the instance.
+            todo.refresh_from_db()
+            results.append({'index': index, 'id': todo.pk, 'status': 'invalid', 'errors': form.errors})
+            continue
+        form.save(commit=False)
+        todo.updated_at = now
+        changed.append(todo)
+        results.append({'index': index, 'id': todo.pk, 'status': 'updated'})
+
+    deltas = Project.count_deltas(before, sign=-1)
+    for project_id, (total, done) in Project.count_deltas((t.project_id, t.completed) for t in changed).items():
+        old_total, old_done = deltas[project_id]
+        deltas[project_id] = (old_total + total, old_done + done)
+    with transaction.atomic():
+        ToDo.objects.bulk_update(changed, TODO_FIELDS + ['updated_at'])
+        Project.adjust_counts(deltas)
+    return results
+
+
+def bulk_delete_todos(user, ids):
+    pks = [as_pk(value) for value in ids]
+    found = {
+        pk: (project_id, completed)
+        for pk, project_id, completed in sharing.own_todos(user).filter(pk__in=[pk for pk in pks if pk])
+        .values_list('pk', 'project_id', 'completed')
+    }
+    with transaction.atomic():
+        now = timezone.now()
+        ToDo.objects.filter(pk__in=found).update(deleted_at=now, updated_at=now)
+        Project.adjust_counts(Project.count_deltas(found.values(), sign=-1))
+    return [
+        {'index': index, 'id': pk, 'status': 'deleted' if pk in found else 'not_found'}
+        for index, pk in enumerate(pks)
+    ]
+
+
+# Agenda
+
+def agenda_query(user, today, days):
+    """Open todos due up to ``days`` from ``today``, overdue first, in due order."""
+    return (sharing.own_todos(user).filter(completed=False, due_date__lte=today + timedelta(days=days))
+            .order_by('due_date', 'priority', 'position', 'id'))
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def agenda(request):
+    """
+    The user's open todos grouped by due date: everything overdue, then one
+    entry per day from today through ``days`` ahead (empty days included).
+    One query, walking todo_user_open_due_idx in order, plus one for repeating
+    todos, whose occurrences past the materialized ones are added per day
+    with ``"virtual": true``.
+    """
+    try:
+        days = min(max(int(request.GET.get('days', DEFAULT_AGENDA_DAYS)), 0), MAX_AGENDA_DAYS)
+    except ValueError:
+        raise InvalidPayload("'days' must be an integer")
+    today = timezone.localdate()
+    overdue = []
+    by_day = {today + timedelta(days=offset): [] for offset in range(days + 1)}
+    for todo in agenda_query(request.user, today, days):
+        (overdue if todo.due_date < today else by_day[todo.due_date]).append(todo_to_dict(todo))
+    upcoming = recurrence.virtual_occurrences(
+        recurrence.active_rules(request.user), today - timedelta(days=1), today + timedelta(days=days),
+    )
+    for todo in upcoming:
+        by_day[todo.due_date].append(occurrence_to_dict(todo))
+    return JsonResponse({
+        'today': today.isoformat(),
+        'overdue': overdue,
+        'days': [{'date': day.isoformat(), 'todos': todos} for day, todos in by_day.items()],
+    })
+
+
+# Stats
+
+@api_login_required
+@require_http_methods(['GET'])
+def stats_summary(request):
+    """Counts by status, priority and project for the dashboard (see stats.py)."""
+    return JsonResponse(stats.user_stats(request.user))
+
+
+# Sync
+
+@api_login_required
+@require_http_methods(['GET'])
+def sync_changes(request):
+    """
+    Todos and projects changed since ``cursor`` (everything when absent), in
+    change order. Deleted rows come back as ids only. Keep requesting with the
+    returned ``cursor`` while ``has_more``; the last cursor is the one to poll
+    with next time. A 410 means the cursor predates a purge: start over.
+    """
+    try:
+        since = sync.decode_cursor(request.GET.get('cursor'))
+        limit = min(max(int(request.GET.get('limit', sync.DEFAULT_PAGE_SIZE)), 1), sync.MAX_PAGE_SIZE)
+    except ValueError as exc:
+        raise InvalidPayload(str(exc))
+    if since and since < sync.purged_through():
+        return JsonResponse({'error': 'Cursor has expired; sync again without one'}, status=410)
+
+    rows, has_more = sync.changes_since(request.user, since, limit)
+    todos = [row for row in rows if isinstance(row, ToDo)]
+    projects = [row for row in rows if isinstance(row, Project)]
+    return JsonResponse({
+        'todos': [todo_to_dict(todo) for todo in todos if not todo.deleted_at],
+        'projects': [project_to_dict(project) for project in projects if not project.deleted_at],
+        'deleted': {
+            'todos': [todo.pk for todo in todos if todo.deleted_at],
+            'projects': [project.pk for project in projects if project.deleted_at],
+        },
+        'cursor': sync.encode_cursor(rows[-1].change_seq if rows else since),
+        'has_more': has_more,
+    })
+
+
+# Projects
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+def project_collection(request):
+    if request.method == 'GET':
+        projects = Project.objects.filter(user=request.user).order_by('id')
+        return JsonResponse({'results': [project_to_dict(p) for p in projects]})
+
+    form = ProjectForm(form_data(Project(), PROJECT_FIELDS, read_json(request)))
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    project = form.save(commit=False)
+    project.user = request.user
+    project.save()
+    return JsonResponse(project_to_dict(project), status=201)
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def project_detail(request, pk):
+    project = get_object_or_404(Project, pk=pk, user=request.user)
+    if request.method == 'PATCH':
+        form = ProjectForm(form_data(project, PROJECT_FIELDS, read_json(request)), instance=project)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        form.save()
+    elif request.method == 'DELETE':
+        job = jobs.delete_projects_later(request.user, [project.pk])
+        return JsonResponse(job_to_dict(job), status=202)
+    return JsonResponse(project_to_dict(project))
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def project_restore(request, pk):
+    """Undo a delete: the project is back at once, its todos once the job has run."""
+    project = get_object_or_404(Project.all_objects, pk=pk, user=request.user, deleted_at__isnull=False)
+    job = jobs.restore_project_later(project)
+    return JsonResponse({**project_to_dict(project), 'job': job_to_dict(job)}, status=202)
+
+
+@api_login_required
+@require_http_methods(['GET', 'POST', 'DELETE'])
+def project_members(request, pk):
+    """
+    GET lists a project's members to anyone who can see it. The owner can
+    POST ``{"username", "role"}`` to share it (or change a role) and DELETE
+    ``{"user"}`` to take someone off.
+    """
+    if request.method == 'GET':
+        project = get_object_or_404(sharing.visible_projects(request.user), pk=pk)
+        memberships = project.memberships.select_related('user').order_by('id')
+        return JsonResponse({'results': [membership_to_dict(m) for m in memberships]})
+
+    project = get_object_or_404(Project, pk=pk, user=request.user)
+    payload = read_json(request)
+    if request.method == 'DELETE':
+        if not sharing.unshare(project, as_pk(payload.get('user'))):
+            return JsonResponse({'error': 'Not a member'}, status=404)
+        return HttpResponse(status=204)
+
+    member = User.objects.filter(username=payload.get('username')).first()
+    if member is None:
+        return JsonResponse({'errors': {'username': ['No such user.']}}, status=400)
+    try:
+        membership = sharing.share(project, member, payload.get('role', Membership.EDITOR))
+    except ValueError as exc:
+        return JsonResponse({'errors': {'__all__': [str(exc)]}}, status=400)
+    return JsonResponse(membership_to_dict(membership), status=201)
+
+
+@api_login_required
+@require_http_methods(['POST', 'PATCH', 'DELETE'])
+def project_bulk(request):
+    """POST creates ``items``, PATCH updates ``items`` by id, DELETE removes ``ids``."""
+    if request.method == 'DELETE':
+        results = bulk_delete_projects(request.user, read_bulk_items(request, 'ids'))
+    elif request.method == 'PATCH':
+        results = bulk_update_projects(request.user, read_bulk_items(request, 'items'))
+    else:
+        results = bulk_create_projects(request.user, read_bulk_items(request, 'items'))
+    bump_for_projects(request.user, results)
+    return JsonResponse({'results': results})
+
+
+def bump_for_projects(user, results):
+    """After a project bulk write: the user, and the members of any shared project it renamed."""
+    sharing.bump_members([result['id'] for result in results if result['status'] == 'updated'], [user.pk])
+
+
+def bulk_create_projects(user, items):
+    results, created = [], []
+    for index, item in enumerate(items):
+        form = ProjectForm(form_data(Project(), PROJECT_FIELDS, item)) if isinstance(item, dict) else None
+        if form is None or not form.is_valid():
+            errors = form.errors if form is not None else {'__all__': ['Expected an object']}
+            results.append({'index': index, 'status': 'invalid', 'errors': errors})
+            continue
+        project = form.save(commit=False)
+        project.user = user
+        result = {'index': index, 'status': 'created'}
+        results.append(result)
+        created.append((result, project))
+
+    with transaction.atomic():
+        Project.objects.bulk_create([project for _, project in created])
+    for result, project in created:
+        result['id'] = project.pk
+    return results
+
+
+def bulk_update_projects(user, items):
+    existing = Project.objects.filter(user=user).in_bulk(
+        [pk for pk in (as_pk(item.get('id')) for item in items if isinstance(item, dict)) if pk]
+    )
+    results, changed = [], []
+    for index, item in enumerate(items):
+        project = existing.get(as_pk(item.get('id'))) if isinstance(item, dict) else None
+        if project is None:
+            results.append({'index': index, 'status': 'not_found'})
+            continue
+        changes = {k: v for k, v in item.items() if k != 'id'}
+        form = ProjectForm(form_data(project, PROJECT_FIELDS, changes), instance=project)
+        if not form.is_valid():
+            project.refresh_from_db()
+            results.append({'index': index, 'id': project.pk, 'status': 'invalid', 'errors': form.errors})
+            continue
+        form.save(commit=False)
+        changed.append(project)
+        results.append({'index': index, 'id': project.pk, 'status': 'updated'})
+
+    with transaction.atomic():
+        Project.objects.bulk_update(changed, PROJECT_FIELDS)
+    return results
+
+
+def bulk_delete_projects(user, ids):
+    pks = [as_pk(value) for value in ids]
+    found = set(Project.objects.filter(user=user, pk__in=[pk for pk in pks if pk]).values_list('pk', flat=True))
+    job = jobs.delete_projects_later(user, sorted(found)) if found else None
+    return [
+        {'index': index, 'id': pk, 'status': 'deleted', 'job': job.pk} if pk in found
+        else {'index': index, 'id': pk, 'status': 'not_found'}
+        for index, pk in enumerate(pks)
+    ]
+
+
+# Jobs
+
+@api_login_required
+@require_http_methods(['GET'])
+def job_collection(request):
+    """The user's most recent background jobs, newest first."""
+    recent = Job.objects.filter(user=request.user).order_by('-id')[:DEFAULT_JOB_LIST_SIZE]
+    return JsonResponse({'results': [job_to_dict(job) for job in recent]})
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def job_detail(request, pk):
+    """Poll one job until its status is ``done`` or ``failed``."""
+    return JsonResponse(job_to_dict(get_object_or_404(Job, pk=pk, user=request.user)))
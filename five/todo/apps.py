@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class TodoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "todo"
+
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.signals import user_logged_out
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_migrate, post_save
+        from . import auth, caching, metrics, search, sharing, sync
+        from .models import Project, ToDo
+
+        post_migrate.connect(search.install_triggers, sender=self)
+        post_migrate.connect(sync.install_triggers, sender=self)
+        connection_created.connect(metrics.install_query_recorder)
+        post_save.connect(caching.invalidate_for_instance, sender=ToDo)
+        post_delete.connect(caching.invalidate_for_instance, sender=ToDo)
+        post_save.connect(sharing.invalidate_for_todo, sender=ToDo)
+        post_delete.connect(sharing.invalidate_for_todo, sender=ToDo)
+        post_save.connect(sharing.invalidate_for_project, sender=Project)
+        post_delete.connect(sharing.invalidate_for_project, sender=Project)
+        post_save.connect(auth.invalidate_user, sender=get_user_model())
+        post_delete.connect(auth.invalidate_user, sender=get_user_model())
+        user_logged_out.connect(auth.invalidate_on_logout)
@@ -0,0 +1,244 @@
+"""
+Async (ASGI-native) versions of the hot todo views.
+
+urls.py routes these in place of their sync twins when TODO_ASYNC_VIEWS is
+on, which five/asgi.py switches on. They resolve the user with
+``request.auser()`` and read through the async ORM. Writes that need
+``transaction.atomic()`` still hop to a thread with ``sync_to_async``,
+because Django transactions are sync-only.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_http_methods
+
+from . import api, caching, jobs, live, recurrence, sharing, sync
+from .api import InvalidPayload, PROJECT_FIELDS, TODO_FIELDS, form_data, project_to_dict, read_json, todo_to_dict
+from .forms import BulkToDoForm, ProjectForm
+from .listing import TODO_LIST_FIELDS, apage_todos
+from .models import Project, ToDo
+from .views import apply_positions, parse_positions, todo_list_context
+
+
+async def aget_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+async def user_projects(user):
+    return {project.pk: project async for project in sharing.editable_projects(user)}
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+async def todo_list(request):
+    # Replace the lazy user so templates never trigger a sync DB lookup.
+    user = request.user = await request.auser()
+    version = await caching.alist_version(user.pk)
+    etag = quote_etag(caching.version_etag(request, version))
+    last_modified = int(caching.version_last_modified(version).timestamp())
+
+    validate = not caching.pending_messages(request)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified) if validate else None
+    if response is None:
+        # Read before the rows, so the live stream replays anything the
+        # fragment might have missed rather than skipping it.
+        events_cursor = sync.encode_cursor(await sync.ahead())
+        key = caching.fragment_key(request, version)
+        content = await cache.aget(key)
+        context = {}
+        if content is None:
+            projects = [p async for p in sharing.visible_projects(user).only('id', 'name')]
+            shared = any(p.shared for p in projects)
+            todos = (sharing.visible_todos(user, shared)
+                     .select_related('project')
+                     .only(*TODO_LIST_FIELDS)
+                     .with_overdue())
+            todos, next_cursor = await apage_todos(todos, request.GET, sharing.todo_parts(user) if shared else ())
+            rules = recurrence.preview_rules(user, request.GET)
+            if rules is not None:
+                rules = [rule async for rule in rules]
+            context = todo_list_context(request, todos, next_cursor, projects, rules)
+            content = render_to_string('todo/todo_list_items.html', context, request)
+            await cache.aset(key, content, caching.fragment_timeout())
+        response = render(request, 'todo/todo_list.html',
+                          {'content': content, 'events_cursor': events_cursor, **context})
+
+    if validate:
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+@login_required
+async def todo_events(request):
+    """
+    Server-Sent Events stream of the user's todo and project changes after
+    the cursor in Last-Event-ID (set by the browser on reconnect) or ?cursor.
+    """
+    user = await request.auser()
+    try:
+        since = sync.decode_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400, content_type='text/plain')
+    response = StreamingHttpResponse(live.event_stream(user, since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def todo_toggle_complete(request, pk):
+    user = await request.auser()
+    changed = await sync_to_async(sharing.editable_todos(user).filter(pk=pk).toggle_completed)()
+    if not changed:
+        raise Http404('No ToDo matches the given query.')
+    await sync_to_async(sharing.bump_members)(changed.project_ids, [user.pk])
+    completed = changed[pk]
+    status = 'complete' if completed else 'incomplete'
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'status': status,
+            'completed': completed
+        })
+
+    messages.success(request, f'Todo marked as {status}!')
+    return redirect('todo_list')
+
+
+@login_required
+async def reorder_todos(request):
+    if request.method != 'POST':
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+    positions = parse_positions(request)
+    if positions is None:
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+
+    user = await request.auser()
+    if not await sync_to_async(apply_positions)(user, positions):
+        return JsonResponse({'error': 'Unknown todo'}, status=404)
+    return JsonResponse({'success': True, 'updated': len(positions)})
+
+
+# JSON API
+
+def api_login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        request.user = user
+        try:
+            return await view(request, *args, **kwargs)
+        except InvalidPayload as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+    return wrapper
+
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+async def todo_collection(request):
+    user = request.user
+    if request.method == 'GET':
+        todos, next_cursor = await apage_todos(sharing.own_todos(user), request.GET)
+        return JsonResponse({'results': [todo_to_dict(t) for t in todos], 'next': next_cursor})
+
+    form = BulkToDoForm(form_data(ToDo(), TODO_FIELDS, read_json(request)),
+                        user=user, projects=await user_projects(user))
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    todo = form.save(commit=False)
+    todo.user = user
+    await todo.asave()
+    return JsonResponse(todo_to_dict(todo), status=201)
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+async def todo_detail(request, pk):
+    user = request.user
+    todo = await aget_or_404(sharing.own_todos(user), pk=pk)
+    if request.method == 'PATCH':
+        form = BulkToDoForm(form_data(todo, TODO_FIELDS, read_json(request)), instance=todo,
+                            user=user, projects=await user_projects(user))
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        await form.instance.asave()
+    elif request.method == 'DELETE':
+        await sync_to_async(todo.soft_delete)()
+        return HttpResponse(status=204)
+    return JsonResponse(todo_to_dict(todo))
+
+
+@api_login_required
+@require_http_methods(['POST', 'PATCH', 'DELETE'])
+async def todo_bulk(request):
+    if request.method == 'DELETE':
+        run, key = api.bulk_delete_todos, 'ids'
+    elif request.method == 'PATCH':
+        run, key = api.bulk_update_todos, 'items'
+    else:
+        run, key = api.bulk_create_todos, 'items'
+    results = await sync_to_async(run)(request.user, api.read_bulk_items(request, key))
+    await sync_to_async(caching.bump_list_version)(request.user.pk)
+    return JsonResponse({'results': results})
+
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+async def project_collection(request):
+    user = request.user
+    if request.method == 'GET':
+        projects = [project_to_dict(p) async for p in Project.objects.filter(user=user).order_by('id')]
+        return JsonResponse({'results': projects})
+
+    form = ProjectForm(form_data(Project(), PROJECT_FIELDS, read_json(request)))
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    project = form.save(commit=False)
+    project.user = user
+    await project.asave()
+    return JsonResponse(project_to_dict(project), status=201)
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+async def project_detail(request, pk):
+    project = await aget_or_404(Project.objects, pk=pk, user=request.user)
+    if request.method == 'PATCH':
+        form = ProjectForm(form_data(project, PROJECT_FIELDS, read_json(request)), instance=project)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        await form.instance.asave()
+    elif request.method == 'DELETE':
+        job = await sync_to_async(jobs.delete_projects_later)(request.user, [project.pk])
+        return JsonResponse(api.job_to_dict(job), status=202)
+    return JsonResponse(project_to_dict(project))
+
+
+@api_login_required
+@require_http_methods(['POST', 'PATCH', 'DELETE'])
+async def project_bulk(request):
+    if request.method == 'DELETE':
+        run, key = api.bulk_delete_projects, 'ids'
+    elif request.method == 'PATCH':
+        run, key = api.bulk_update_projects, 'items'
+    else:
+        run, key = api.bulk_create_projects, 'items'
+    results = await sync_to_async(run)(request.user, api.read_bulk_items(request, key))
+    await sync_to_async(api.bump_for_projects)(request.user, results)
+    return JsonResponse({'results': results})
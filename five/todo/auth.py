@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+# Cached auth_user rows, one per user and shared by all of that user's
+# sessions. Saving or deleting the user, or logging out, drops the entry.
+# Sessions still check the password hash on every request, so a fresh row
+# after a password change is what logs the other sessions out.
+USER_KEY = 'todo:auth-user:{user_id}'
+
+DEFAULT_TIMEOUT = 300
+
+
+def user_timeout():
+    return getattr(settings, 'TODO_USER_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request ``get_user`` is served from the cache."""
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, user_timeout())
+        return user
+
+    async def aget_user(self, user_id):
+        key = USER_KEY.format(user_id=user_id)
+        user = await cache.aget(key)
+        if user is None:
+            # ModelBackend.aget_user() reads the row itself and never calls
+            # get_user(), so fill the cache here.
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, user_timeout())
+        return user
+
+
+def forget_user(user_id):
+    if user_id is not None:
+        cache.delete(USER_KEY.format(user_id=user_id))
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """post_save/post_delete receiver for the user model."""
+    forget_user(instance.pk)
+
+
+def invalidate_on_logout(sender, request, user, **kwargs):
+    """user_logged_out receiver."""
+    if user is not None:
+        forget_user(user.pk)
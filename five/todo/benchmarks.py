@@ -0,0 +1,261 @@
+"""
+View benchmarks over seeded datasets, used by ``manage.py benchmark_views``.
+
+Every case is a real request through the test client. Each result records the
+best wall time of several runs (the least noisy statistic on a shared machine)
+and the query count. ``compare`` checks results against a
+stored baseline: any extra query is a regression. Wall times depend on the
+machine that recorded the baseline, so they are only checked when a
+tolerance is given.
+"""
+import time
+from datetime import timedelta
+from itertools import product
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, sync
+from .listing import TODO_LIST_FIELDS, display_rows
+from .models import Membership, Project, ToDo
+
+PROJECTS_PER_USER = 20
+# The shared_todo_list cases: projects shared by one owner, members per
+# project (the owner included) and todos filed in each.
+SHARED_PROJECTS = 100
+SHARED_MEMBERS = 50
+SHARED_TODOS_PER_PROJECT = 20
+# Rows rendered by the todo_rows case, however big the dataset.
+RENDER_ROWS = 10_000
+SEED_BATCH_SIZE = 5000
+WORDS = ('report', 'invoice', 'garden', 'email', 'meeting', 'groceries', 'taxes', 'review')
+
+LIST_FILTERS = {
+    'status': ('', 'incomplete', 'completed', 'overdue', 'due_week'),
+    'priority': ('', '1'),
+    'project': ('', 'first'),
+    'q': ('', 'report'),
+}
+
+# Wall times this close to the baseline are noise, whatever the ratio.
+MIN_SLACK_MS = 2.0
+
+# DJANGO_SESSION_MODE values and the settings they select (see settings.py).
+SESSION_MODES = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.auth.backends.ModelBackend'),
+    'cached': ('django.contrib.sessions.backends.cached_db', 'todo.auth.CachedModelBackend'),
+    'signed_cookies': ('django.contrib.sessions.backends.signed_cookies', 'todo.auth.CachedModelBackend'),
+}
+
+
+def seed(user, size):
+    """Give ``user`` ``size`` todos spread over PROJECTS_PER_USER projects."""
+    projects = Project.objects.bulk_create(
+        Project(user=user, name=f'Project {i}') for i in range(PROJECTS_PER_USER)
+    )
+    today = timezone.now().date()
+    for start in range(0, size, SEED_BATCH_SIZE):
+        batch = [
+            ToDo(
+                user=user,
+                project=projects[i % len(projects)],
+                name=f'{WORDS[i % len(WORDS)]} {i}',
+                description=f'Seeded task {i} about {WORDS[(i * 7) % len(WORDS)]}',
+                priority=i % 3 + 1,
+                position=i,
+                completed=i % 4 == 0,
+                due_date=today + timedelta(days=i % 60 - 20) if i % 5 else None,
+            )
+            for i in range(start, min(start + SEED_BATCH_SIZE, size))
+        ]
+        ToDo.objects.bulk_create(batch)
+        Project.adjust_counts(Project.count_deltas((t.project_id, t.completed) for t in batch))
+    return projects
+
+
+def list_cases(project_id):
+    names = list(LIST_FILTERS)
+    for values in product(*LIST_FILTERS.values()):
+        params = {name: value for name, value in zip(names, values) if value}
+        # Named by label so case names match across datasets.
+        name = f"todo_list?{urlencode(params)}"
+        if params.get('project') == 'first':
+            params['project'] = project_id
+        yield name, params
+
+
+def measure(request, repeat, clear_cache=True):
+    """Best wall time in ms and the query count of the last run, after one warm-up."""
+    timings = []
+    for run in range(repeat + 1):
+        if clear_cache:
+            # Time the uncached path; the fragment cache would otherwise serve it.
+            cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'Benchmark request failed with {response.status_code}')
+        if run:
+            timings.append(elapsed)
+    return {'ms': round(min(timings), 2), 'queries': len(ctx.captured_queries)}
+
+
+def run_cases(user, repeat=5):
+    """Time every benchmark case for ``user``; returns ``{case: result}``."""
+    client = Client()
+    client.force_login(user)
+    project = Project.objects.filter(user=user).order_by('id').first()
+    todo_ids = list(ToDo.objects.filter(user=user).values_list('id', flat=True)[:50])
+
+    results = {}
+    for name, params in list_cases(project.pk if project else ''):
+        results[name] = measure(lambda: client.get(reverse('todo_list'), params), repeat)
+    results['reorder_todos'] = measure(
+        lambda: client.post(reverse('reorder_todos'), {'order': todo_ids}, content_type='application/json'),
+        repeat,
+    )
+    results['todo_toggle_complete'] = measure(
+        lambda: client.post(reverse('todo_toggle_complete', args=[todo_ids[0]])), repeat,
+    )
+    results['todo_create'] = measure(
+        lambda: client.post(reverse('todo_create'), {'name': 'Benchmark task', 'priority': 2}), repeat,
+    )
+    results['project_list'] = measure(lambda: client.get(reverse('project_list')), repeat)
+    results['api_stats'] = measure(lambda: client.get(reverse('api_stats')), repeat)
+    results['api_stats[cached]'] = measure(lambda: client.get(reverse('api_stats')), repeat, clear_cache=False)
+
+    def stats_after_write():
+        caching.bump_list_version(user.pk)
+        return client.get(reverse('api_stats'))
+
+    results['api_stats[after_write]'] = measure(stats_after_write, repeat, clear_cache=False)
+    results.update(render_cases(user, repeat))
+    results.update(sync_cases(client, user, repeat))
+    results.update(session_cases(user, todo_ids[0], repeat))
+    # Last: it makes ``user`` a member of the shared projects.
+    results.update(shared_cases(user, repeat))
+    return results
+
+
+def render_cases(user, repeat):
+    """Time display_rows() plus the todo_list fragment render over up to RENDER_ROWS loaded todos."""
+    todos = list(ToDo.objects.filter(user=user).select_related('project')
+                 .only(*TODO_LIST_FIELDS).with_overdue()[:RENDER_ROWS])
+    request = RequestFactory().get(reverse('todo_list'))
+    request.user = user
+
+    def render():
+        context = {'todos': todos, 'rows': display_rows(todos), 'projects': [], 'status_filters': []}
+        return HttpResponse(render_to_string('todo/todo_list_items.html', context, request))
+
+    return {'todo_rows[render_10k]': measure(render, repeat, clear_cache=False)}
+
+
+def sync_cases(client, user, repeat):
+    """Time the sync feed for a client that is up to date, and one 100 changes behind."""
+    seqs = list(ToDo.all_objects.filter(user=user).order_by('-change_seq').values_list('change_seq', flat=True)[:101])
+    results = {}
+    for name, seq in (('api_sync[caught_up]', seqs[0]), ('api_sync[100_changes]', seqs[-1])):
+        cursor = sync.encode_cursor(seq)
+        results[name] = measure(lambda: client.get(reverse('api_sync'), {'cursor': cursor}), repeat)
+    return results
+
+
+def session_cases(user, todo_id, repeat):
+    """Time the toggle under each session mode, with warm session/user caches."""
+    results = {}
+    for mode, (engine, backend) in SESSION_MODES.items():
+        with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]):
+            client = Client()
+            client.force_login(user)
+            results[f'todo_toggle_complete[session={mode}]'] = measure(
+                lambda: client.post(reverse('todo_toggle_complete', args=[todo_id])), repeat, clear_cache=False,
+            )
+    return results
+
+
+def seed_shared(user):
+    """
+    Share SHARED_PROJECTS projects of a new owner with SHARED_MEMBERS members
+    each, ``user`` among them, and file todos by several authors in each.
+    Returns ``(member, project_ids)`` for a member with no todos of their own.
+    """
+    prefix = f'{user.username}-shared'
+    owner, *others = User.objects.bulk_create(
+        User(username=f'{prefix}-{i}') for i in range(SHARED_MEMBERS - 1)
+    )
+    projects = Project.objects.bulk_create(
+        Project(user=owner, name=f'Shared {i}') for i in range(SHARED_PROJECTS)
+    )
+    people = [owner, user, *others]
+    Membership.objects.bulk_create(
+        Membership(project=project, user=person, role=Membership.OWNER if person is owner else Membership.EDITOR)
+        for project in projects for person in people
+    )
+    todos = [
+        ToDo(user=people[i % len(people)], project=project, name=f'{WORDS[i % len(WORDS)]} shared {i}',
+             priority=i % 3 + 1, position=i, completed=i % 4 == 0)
+        for project in projects for i in range(SHARED_TODOS_PER_PROJECT)
+    ]
+    ToDo.objects.bulk_create(todos, batch_size=SEED_BATCH_SIZE)
+    Project.adjust_counts(Project.count_deltas((t.project_id, t.completed) for t in todos))
+    return others[-1], [project.pk for project in projects]
+
+
+def shared_cases(user, repeat):
+    """
+    Time todo_list across the seed_shared() projects, for a member who owns
+    nothing and for ``user`` (own todos plus shared ones), and a toggle whose
+    change reaches all SHARED_MEMBERS members' caches.
+    """
+    member, project_ids = seed_shared(user)
+    shared_todo = ToDo.objects.filter(project_id=project_ids[0]).values_list('pk', flat=True).first()
+    label = f'{SHARED_PROJECTS}x{SHARED_MEMBERS}'
+    results = {}
+    for who, person in (('member', member), ('seeded_user', user)):
+        client = Client()
+        client.force_login(person)
+        for params in ({}, {'status': 'incomplete'}, {'project': project_ids[-1]}):
+            name = f"shared_todo_list[{label},{who}]{'?' + urlencode(params) if params else ''}"
+            if 'project' in params:
+                name = name.replace(f"project={params['project']}", 'project=shared')
+            results[name] = measure(lambda: client.get(reverse('todo_list'), params), repeat)
+    client = Client()
+    client.force_login(member)
+    results[f'todo_toggle_complete[shared={label}]'] = measure(
+        lambda: client.post(reverse('todo_toggle_complete', args=[shared_todo])), repeat,
+    )
+    return results
+
+
+def compare(results, baseline, tolerance=None):
+    """
+    List regressions of ``results`` against ``baseline`` (same shape).
+
+    Query counts are always compared; wall times only with a ``tolerance``
+    (the allowed slowdown as a fraction). Cases missing from the baseline
+    are skipped.
+    """
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{case}: {result['queries']} queries, baseline {expected['queries']}")
+        if tolerance is None:
+            continue
+        limit = max(expected['ms'] * (1 + tolerance), expected['ms'] + MIN_SLACK_MS)
+        if result['ms'] > limit:
+            regressions.append(f"{case}: {result['ms']} ms, baseline {expected['ms']} ms")
+    return regressions
@@ -0,0 +1,111 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import live
+
+# Every ToDo/Project write for a user bumps that user's version stamp, which
+# retires all of their cached todo_list fragments at once. The stamp is a
+# nanosecond timestamp, so it doubles as the page's Last-Modified value.
+VERSION_KEY = 'todo:list-version:{user_id}'
+FRAGMENT_KEY = 'todo:list:{user_id}:{version}:{params}'
+
+DEFAULT_TIMEOUT = 300
+
+
+def list_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add() so concurrent first requests agree on one stamp.
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+async def alist_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_list_version(user_id):
+    if user_id is not None:
+        cache.set(VERSION_KEY.format(user_id=user_id), time.time_ns(), timeout=None)
+        live.publish(user_id)
+
+
+def bump_all_list_versions(user_ids):
+    stamp = time.time_ns()
+    cache.set_many({VERSION_KEY.format(user_id=pk): stamp for pk in user_ids if pk is not None}, timeout=None)
+    for user_id in user_ids:
+        live.publish(user_id)
+
+
+def params_digest(request):
+    query = '&'.join(sorted(f'{k}={v}' for k, values in request.GET.lists() for v in values))
+    # Overdue badges and the overdue/due-this-week filters change at midnight.
+    query += f'@{timezone.localdate()}'
+    return hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+
+
+def fragment_key(request, version=None):
+    user_id = request.user.pk
+    if version is None:
+        version = list_version(user_id)
+    return FRAGMENT_KEY.format(user_id=user_id, version=version, params=params_digest(request))
+
+
+def fragment_timeout():
+    return getattr(settings, 'TODO_LIST_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_fragment(request):
+    return cache.get(fragment_key(request))
+
+
+def set_fragment(request, content):
+    cache.set(fragment_key(request), content, fragment_timeout())
+
+
+def version_etag(request, version):
+    return f'{request.user.pk}-{version}-{params_digest(request)}'
+
+
+def version_last_modified(version):
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+
+def pending_messages(request):
+    """
+    Whether flash messages wait to be shown. The version stamp does not cover
+    them, so a page that shows them must not be validated or carry validators.
+    """
+    return bool(messages.get_messages(request))
+
+
+def list_etag(request):
+    if not request.user.is_authenticated or pending_messages(request):
+        return None
+    return version_etag(request, list_version(request.user.pk))
+
+
+def list_last_modified(request):
+    if not request.user.is_authenticated or pending_messages(request):
+        return None
+    return version_last_modified(list_version(request.user.pk))
+
+
+def invalidate_for_instance(sender, instance, **kwargs):
+    """post_save/post_delete receiver for ToDo; Project goes through sharing.invalidate_for_project."""
+    bump_list_version(instance.user_id)
@@ -0,0 +1,51 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .listing import filter_todos
+
+# values_list() columns, so rows are plain tuples rather than model instances.
+EXPORT_FIELDS = (
+    'id', 'name', 'description', 'completed', 'priority', 'position',
+    'due_date', 'project__name', 'created_at', 'updated_at',
+)
+EXPORT_HEADER = tuple(field.replace('__', '_') for field in EXPORT_FIELDS)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+
+def export_rows(todos, params, chunk_size=CHUNK_SIZE):
+    """Stream filtered rows in id order, ``chunk_size`` rows per fetch."""
+    todos = filter_todos(todos, params, search=True)
+    return todos.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_HEADER, row))) + '\n'
+
+
+def export_lines(rows, fmt):
+    if fmt == 'ndjson':
+        return ndjson_lines(rows)
+    return csv_lines(rows)
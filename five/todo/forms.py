@@ -1,5 +1,8 @@
 from django import forms
-from .models import ToDo,Project
+from django.core.exceptions import ValidationError
+from .models import Project, Recurrence, ToDo
+from .recurrence import parse_cron
+from .sharing import editable_projects
 
 class ToDoForm(forms.ModelForm):
     due_date = forms.DateField(
@@ -21,10 +24,92 @@ class ToDoForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args,**kwargs)
         if user:
-            self.fields['project'].queryset = Project.objects.filter(user=user)
+            self.fields['project'].queryset = editable_projects(user)
             self.fields['priority'].initial = 3
         
+class PreloadedProjectField(forms.ModelChoiceField):
+    """Project choice validated against an in-memory ``{pk: Project}`` map."""
+
+    def __init__(self, projects, **kwargs):
+        self.projects = projects
+        super().__init__(queryset=Project.objects.none(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.projects[int(value)]
+        except (KeyError, ValueError, TypeError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class BulkToDoForm(ToDoForm):
+    """
+    ToDoForm for validating many rows at once.
+
+    The caller loads the projects the user may edit once and passes them as ``projects``,
+    so validating a row never queries the database.
+    """
+
+    def __init__(self, *args, projects, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['project'] = PreloadedProjectField(projects, required=False)
+
+    def _get_validation_exclusions(self):
+        # The project was already checked against the user's editable projects;
+        # skip the model-level FK existence query for each row.
+        exclude = super()._get_validation_exclusions()
+        exclude.add('project')
+        return exclude
+
+
+class RecurrenceForm(forms.ModelForm):
+    """The repeat settings shown under ToDoForm; a blank frequency means none."""
+    frequency = forms.ChoiceField(
+        choices=[('', 'Does not repeat')] + Recurrence.FREQUENCY_CHOICES, required=False,
+    )
+    interval = forms.IntegerField(min_value=1, max_value=365, required=False)
+    until = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        input_formats=['%Y-%m-%d'],
+    )
+
+    class Meta:
+        model = Recurrence
+        fields = ['frequency', 'interval', 'cron', 'until']
+
+    @property
+    def repeats(self):
+        return bool(self.cleaned_data.get('frequency'))
+
+    def clean(self):
+        cleaned = super().clean()
+        cleaned['interval'] = cleaned.get('interval') or 1
+        if cleaned.get('frequency') == Recurrence.CRON:
+            try:
+                parse_cron(cleaned.get('cron', ''))
+            except ValueError as exc:
+                self.add_error('cron', str(exc))
+        return cleaned
+
+    def save_for(self, todo):
+        """Attach, update or, for "does not repeat", remove ``todo``'s rule."""
+        if not self.repeats:
+            if self.instance.pk:
+                self.instance.delete()
+            return None
+        rule = self.save(commit=False)
+        rule.todo, rule.user_id = todo, todo.user_id
+        rule.save()
+        return rule
+
+
 class ProjectForm(forms.ModelForm):
     class Meta:
         model = Project
-        fields = ['name', 'description']
\ No newline at end of file
+        fields = ['name', 'description']
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or NDJSON, in the format written by the export.')
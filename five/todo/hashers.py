@@ -0,0 +1,85 @@
+"""
+Password hashing with a tunable cost that runs in a bounded worker pool.
+
+PBKDF2 is deliberately CPU-bound. Without a cap, a burst of logins keeps
+every core busy and starves ordinary todo requests. TunablePBKDF2PasswordHasher
+runs each hash on a small shared thread pool (hashlib releases the GIL while
+hashing). At most TODO_HASHING_WORKERS hashes run at once, and at most
+TODO_HASHING_QUEUE more wait for a slot. When the queue is full, callers wait
+up to TODO_HASHING_WAIT seconds for a slot and then get HashingBusy.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.signals import setting_changed
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class HashingPool:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _setup(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'TODO_HASHING_WORKERS', None) or default_workers()
+                queue = getattr(settings, 'TODO_HASHING_QUEUE', workers * 4)
+                self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing')
+                self._slots = threading.BoundedSemaphore(workers + queue)
+            return self._executor, self._slots
+
+    def run(self, fn, *args):
+        executor, slots = self._setup()
+        if not slots.acquire(timeout=getattr(settings, 'TODO_HASHING_WAIT', 5)):
+            raise HashingBusy('Too many password hashes in progress')
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def reset(self):
+        with self._lock:
+            executor, self._executor, self._slots = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+pool = HashingPool()
+
+
+def reset_pool(setting, **kwargs):
+    """setting_changed receiver, so tests can resize the pool."""
+    if setting in ('TODO_HASHING_WORKERS', 'TODO_HASHING_QUEUE'):
+        pool.reset()
+
+
+setting_changed.connect(reset_pool)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count from TODO_PBKDF2_ITERATIONS.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes still
+    verify. On the next login they are upgraded to the configured count.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'TODO_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+    def encode(self, password, salt, iterations=None):
+        return pool.run(super().encode, password, salt, iterations)
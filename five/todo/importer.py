@@ -0,0 +1,123 @@
+import csv
+import json
+import time
+
+from django.db import transaction
+from django.forms.models import model_to_dict
+
+from . import caching
+from .forms import BulkToDoForm
+from .models import Project, ToDo
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Columns naming the project; export_todos writes ``project_name``.
+PROJECT_COLUMNS = ('project_name', 'project')
+TODO_COLUMNS = [field for field in BulkToDoForm._meta.fields if field != 'project']
+PROJECT_NAME_LENGTH = Project._meta.get_field('name').max_length
+
+
+def detect_format(filename):
+    return 'ndjson' if filename.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(lines, fmt):
+    """
+    Yield ``(line_number, row)`` pairs from an iterable of text lines.
+
+    Malformed NDJSON lines are yielded with ``row`` set to None so they end up
+    in the reject output instead of aborting the import.
+    """
+    if fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+
+
+class Importer:
+    """
+    Validate rows with ToDoForm rules and insert them in ``bulk_create`` batches.
+
+    Each batch is written in its own transaction, so a crash part way through
+    keeps every finished batch. Projects are looked up by name from an
+    in-memory map and created on first use.
+    """
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE, on_reject=None, on_progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.on_reject = on_reject
+        self.on_progress = on_progress
+        self.projects = {p.name: p for p in Project.objects.filter(user=user)}
+        self.defaults = model_to_dict(ToDo(), fields=TODO_COLUMNS)
+        self.created = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+        self._batch = []
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return (self.created + self.rejected) / elapsed if elapsed else 0.0
+
+    def run(self, rows):
+        for number, row in rows:
+            self.add(number, row)
+        self.flush()
+        caching.bump_list_version(self.user.pk)
+        return self
+
+    def add(self, number, row):
+        if row is None:
+            self.reject(number, row, {'__all__': ['Malformed row']})
+            return
+        data = {
+            field: default if row.get(field) in (None, '') else row[field]
+            for field, default in self.defaults.items()
+        }
+        form = BulkToDoForm(data, user=self.user, projects={})
+        if not form.is_valid():
+            self.reject(number, row, form.errors)
+            return
+        project_name = str(next((row[c] for c in PROJECT_COLUMNS if row.get(c)), '')).strip()
+        if len(project_name) > PROJECT_NAME_LENGTH:
+            self.reject(number, row, {'project': [f'Project names are at most {PROJECT_NAME_LENGTH} characters']})
+            return
+        todo = form.save(commit=False)
+        todo.user = self.user
+        if project_name:
+            todo.project = self.project_named(project_name)
+        self._batch.append(todo)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def project_named(self, name):
+        project = self.projects.get(name)
+        if project is None:
+            project = self.projects[name] = Project.objects.create(user=self.user, name=name)
+        return project
+
+    def reject(self, number, row, errors):
+        self.rejected += 1
+        if self.on_reject:
+            self.on_reject(number, row, errors)
+
+    def flush(self):
+        if not self._batch:
+            return
+        with transaction.atomic():
+            ToDo.objects.bulk_create(self._batch)
+            Project.adjust_counts(Project.count_deltas((t.project_id, t.completed) for t in self._batch))
+        self.created += len(self._batch)
+        self._batch = []
+        if self.on_progress:
+            self.on_progress(self)
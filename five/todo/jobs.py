@@ -0,0 +1,286 @@
+"""
+A small job queue kept in the database, so heavy work leaves the request
+cycle without an external broker.
+
+enqueue() inserts a Job row. ``manage.py run_workers`` runs threads that
+claim queued jobs oldest first, each with a single UPDATE ... RETURNING, so
+any number of worker threads and processes can share the queue. The handler
+registered for the job's kind gets the Job, may call ``job.report()`` with
+progress, and returns a JSON-serializable result; an exception marks the job
+failed. Jobs still running after TODO_JOB_STALE_AFTER seconds belonged to a
+worker that died and are requeued, up to MAX_ATTEMPTS times.
+
+Imports and exports read and write their files in TODO_JOB_FILES_DIR, which
+every host running workers must share.
+"""
+import io
+import logging
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import export, importer, sharing
+from .models import Job, Project, ToDo
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+DEFAULT_STALE_AFTER = 600
+DEFAULT_DELETE_BATCH_SIZE = 1000
+# Rejected import rows kept in the job result; the rest are only counted.
+MAX_REPORTED_REJECTS = 100
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the decorated function as the handler for ``kind`` jobs."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user=None, **payload):
+    if kind not in HANDLERS:
+        raise ValueError(f'No handler for job kind {kind!r}')
+    return Job.objects.create(kind=kind, user=user, payload=payload)
+
+
+def claim(worker):
+    """Mark the oldest queued job as running for ``worker`` and return it, or None."""
+    qn = connection.ops.quote_name
+    table = qn(Job._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {qn("status")} = %s, {qn("worker")} = %s, {qn("started_at")} = %s, '
+            f'{qn("attempts")} = {qn("attempts")} + 1 '
+            f'WHERE {qn("id")} = (SELECT {qn("id")} FROM {table} WHERE {qn("status")} = %s '
+            f'ORDER BY {qn("id")} LIMIT 1) AND {qn("status")} = %s '
+            f'RETURNING {qn("id")}',
+            [Job.RUNNING, worker, now, Job.QUEUED, Job.QUEUED],
+        )
+        row = cursor.fetchone()
+    return Job.objects.get(pk=row[0]) if row else None
+
+
+def run(job):
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise LookupError(f'No handler for job kind {job.kind!r}')
+        result = func(job)
+    except Exception:
+        logger.exception('Job %s failed', job)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=traceback.format_exc(), finished_at=timezone.now(),
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, result=job.result if result is None else result, finished_at=timezone.now(),
+        )
+
+
+def run_pending(worker='inline'):
+    """Run queued jobs in this thread until none are left. Returns how many ran."""
+    count = 0
+    while (job := claim(worker)) is not None:
+        run(job)
+        count += 1
+    return count
+
+
+def requeue_stale():
+    """Requeue jobs whose worker stopped mid-run; fail those out of attempts."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TODO_JOB_STALE_AFTER', DEFAULT_STALE_AFTER))
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=cutoff)
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=Job.QUEUED, worker='')
+    stale.update(status=Job.FAILED, error='Worker stopped; out of attempts.', finished_at=timezone.now())
+    return requeued
+
+
+# Project deletion and undo
+
+def batch_size():
+    return getattr(settings, 'TODO_JOB_DELETE_BATCH', DEFAULT_DELETE_BATCH_SIZE)
+
+
+def delete_projects_later(user, project_ids):
+    """
+    Soft-delete the projects now and queue a job that tombstones their todos
+    in batches. ``manage.py purge_deleted`` removes both later.
+    """
+    with transaction.atomic():
+        Project.objects.filter(user=user, pk__in=project_ids).update(deleted_at=timezone.now())
+        job = enqueue('delete_projects', user=user, project_ids=list(project_ids))
+    sharing.bump_members(project_ids, [user.pk])
+    return job
+
+
+def restore_project_later(project):
+    """Bring a soft-deleted project back now and queue a job that restores its todos."""
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(deleted_at=None)
+        job = enqueue(
+            'restore_project', user=project.user,
+            project_id=project.pk, deleted_at=project.deleted_at.isoformat(),
+        )
+    project.deleted_at = None
+    sharing.bump_members([project.pk], [project.user_id])
+    return job
+
+
+def _tombstone_batch(project):
+    with transaction.atomic():
+        # An undo between batches stops the job.
+        if not Project.all_objects.filter(pk=project.pk, deleted_at=project.deleted_at).exists():
+            return 0
+        return ToDo.objects.filter(project=project).set_deleted_batch(batch_size(), project.deleted_at)
+
+
+@handler('delete_projects')
+def delete_projects(job):
+    """
+    Tombstone the todos of each deleted project, one short transaction per
+    batch so other writers get the database in between. The todos carry the
+    project's own deleted_at, which is what restore_project looks for.
+    Counters are left alone: they are right again if the project comes back.
+    """
+    todos, projects = job.result.get('todos_deleted', 0), 0
+    for project in Project.all_objects.filter(pk__in=job.payload['project_ids'], deleted_at__isnull=False):
+        while deleted := _tombstone_batch(project):
+            todos += deleted
+            sharing.bump_members([project.pk], [project.user_id])
+            job.report(todos_deleted=todos)
+        projects += 1
+        job.report(projects_deleted=projects)
+    return {'todos_deleted': todos, 'projects_deleted': projects}
+
+
+@handler('restore_project')
+def restore_project(job):
+    stamp = datetime.fromisoformat(job.payload['deleted_at'])
+    tombstones = ToDo.all_objects.filter(project_id=job.payload['project_id'], deleted_at=stamp)
+    restored = job.result.get('todos_restored', 0)
+    while batch := tombstones.set_deleted_batch(batch_size(), None):
+        restored += batch
+        sharing.bump_members([job.payload['project_id']], [job.user_id])
+        job.report(todos_restored=restored)
+    return {'todos_restored': restored}
+
+
+# Imports, exports and recounts
+
+def job_files():
+    """Storage for uploads waiting to be imported and for finished exports."""
+    return FileSystemStorage(
+        location=getattr(settings, 'TODO_JOB_FILES_DIR', Path(settings.BASE_DIR) / 'job_files'),
+    )
+
+
+def import_later(user, upload, fmt):
+    """Save ``upload`` and queue a job that imports it for ``user``."""
+    name = job_files().save(f'imports/{user.pk}.{fmt}', upload)
+    return enqueue('import_todos', user=user, file=name, format=fmt)
+
+
+def export_later(user, fmt, params):
+    """Queue a job that writes ``user``'s todos, filtered by ``params``, to a file."""
+    return enqueue('export_todos', user=user, format=fmt, params=params)
+
+
+@handler('import_todos')
+def import_todos(job):
+    """
+    Import the uploaded file with importer.Importer, reporting progress after
+    every batch. Each batch commits on its own, so a requeued job skips the
+    lines an earlier attempt got through. The upload is removed at the end.
+    """
+    files = job_files()
+    through = job.result.get('imported_through', 0)
+    created, rejected = job.result.get('created', 0), job.result.get('rejected', 0)
+    rejects = job.result.get('rejects', [])
+    last = through
+
+    def remaining(lines):
+        nonlocal last
+        for number, row in importer.read_rows(lines, job.payload['format']):
+            if number > through:
+                last = number
+                yield number, row
+
+    def on_reject(number, row, errors):
+        if len(rejects) < MAX_REPORTED_REJECTS:
+            rejects.append({'line': number, 'errors': errors})
+
+    def progress(run):
+        return {'imported_through': last, 'created': created + run.created,
+                'rejected': rejected + run.rejected, 'rejects': rejects}
+
+    def on_progress(run):
+        job.report(**progress(run))
+
+    with files.open(job.payload['file'], 'rb') as upload:
+        lines = io.TextIOWrapper(upload, encoding='utf-8', errors='replace', newline='')
+        run = importer.Importer(job.user, on_reject=on_reject, on_progress=on_progress).run(remaining(lines))
+    files.delete(job.payload['file'])
+    return progress(run)
+
+
+@handler('export_todos')
+def export_todos(job):
+    """
+    Write the user's todos, as the todo_export view would stream them, to
+    ``exports/<job id>.<format>``. A rerun overwrites the same file.
+    """
+    fmt = job.payload['format']
+    name = f'exports/{job.pk}.{fmt}'
+    path = Path(job_files().path(name))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for written, row in enumerate(rows, start=1):
+            yield row
+
+    rows = export.export_rows(sharing.own_todos(job.user), job.payload['params'])
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        out.writelines(export.export_lines(counted(rows), fmt))
+    return {'rows': written, 'file': name}
+
+
+def repair_counts(projects, dry_run=False):
+    """
+    Recompute todo_count/completed_count for the ``projects`` queryset and
+    return the ones that had drifted, annotated with their actual counts.
+    Unless ``dry_run``, store the actual counts.
+    """
+    with transaction.atomic():
+        drifted = list(
+            Project.with_actual_counts(projects)
+            .exclude(todo_count=F('actual_todo_count'), completed_count=F('actual_completed_count'))
+        )
+        if not dry_run:
+            Project.objects.bulk_update([
+                Project(pk=project.pk, todo_count=project.actual_todo_count,
+                        completed_count=project.actual_completed_count)
+                for project in drifted
+            ], ['todo_count', 'completed_count'])
+    if drifted and not dry_run:
+        sharing.bump_members([project.pk for project in drifted], [project.user_id for project in drifted])
+    return drifted
+
+
+@handler('recount_projects')
+def recount_projects(job):
+    """Repair drifted counters of the job user's projects, or of every project for a job with no user."""
+    projects = Project.objects.all() if job.user_id is None else Project.objects.filter(user_id=job.user_id)
+    return {'projects_repaired': len(repair_counts(projects))}
@@ -0,0 +1,158 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.formats import date_format
+from django.utils.text import Truncator
+
+from .models import ToDo
+from .pagination import DEFAULT_PAGE_SIZE, encode_cursor, keyset_query, split_page
+from .search import match_todos, search_query
+
+DUE_SOON_DAYS = 7
+
+# Columns todo_list.html actually renders; everything else stays in the DB.
+TODO_LIST_FIELDS = (
+    'id', 'name', 'description', 'completed', 'due_date', 'priority',
+    'position', 'created_at', 'project__id', 'project__name',
+)
+
+PRIORITY_LABELS = dict(ToDo._meta.get_field('priority').choices)
+PRIORITY_BADGES = {1: 'bg-danger', 2: 'bg-warning text-dark'}
+DESCRIPTION_WORDS = 20
+# Stands in for the pk when reversing a row URL once per render.
+_PK_PLACEHOLDER = 2147483647
+
+STATUS_FILTERS = (
+    ('incomplete', 'Incomplete'),
+    ('completed', 'Completed'),
+    ('overdue', 'Overdue'),
+    ('due_week', 'Due this week'),
+)
+
+
+def filter_todos(todos, params, search=False):
+    """
+    Apply the todo_list ``project``/``priority``/``status`` filters.
+    Malformed ``project`` and ``priority`` values are ignored.
+
+    ``status`` is one of STATUS_FILTERS; overdue and due-this-week are
+    evaluated in SQL against today's date.
+
+    With ``search=True`` the ``q`` filter is applied as well (unranked).
+    """
+    project_filter = params.get('project')
+    priority = params.get('priority')
+    status = params.get('status')
+
+    if project_filter:
+        try:
+            todos = todos.filter(project__id=int(project_filter))
+        except (ValueError, TypeError):
+            pass
+    if priority:
+        try:
+            priority = int(priority)
+        except (ValueError, TypeError):
+            pass
+        else:
+            if priority in PRIORITY_LABELS:
+                todos = todos.filter(priority=priority)
+    if status == 'completed':
+        todos = todos.filter(completed = True)
+    elif status == 'incomplete':
+        todos = todos.filter(completed = False)
+    elif status == 'overdue':
+        todos = todos.overdue()
+    elif status == 'due_week':
+        todos = todos.due_within(DUE_SOON_DAYS)
+    if search and params.get('q'):
+        todos = match_todos(todos, params['q'])
+    return todos
+
+
+def page_query(todos, params, parts=()):
+    """
+    Build the one query that serves a page for the given request parameters.
+
+    ``parts`` optionally splits ``todos`` into disjoint querysets that are
+    each cheap to walk in keyset order (see sharing.todo_parts). The page is
+    then taken from each part's index inside subqueries and only those rows
+    are merged and sorted, rather than sorting every row an OR filter
+    matches. Searches rank across ``todos`` as a whole.
+
+    Returns ``(queryset, page_size, make_cursor)``; pass the evaluated rows to
+    ``pagination.split_page``. Sync and async callers share this.
+    """
+    todos = filter_todos(todos, params)
+    query = params.get('q')
+    cursor = params.get('after')
+    page_size = getattr(settings, 'TODO_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    pinned = ('priority',) if params.get('priority') else ()
+    if query:
+        queryset, make_cursor = search_query(todos, query, cursor, page_size, pinned)
+    else:
+        if parts:
+            todos = todos.filter(reduce(or_, (
+                Q(pk__in=keyset_query(filter_todos(part, params), cursor, page_size, pinned).values('pk'))
+                for part in parts
+            )))
+        queryset, make_cursor = keyset_query(todos, cursor, page_size, pinned), encode_cursor
+    return queryset, page_size, make_cursor
+
+
+def page_todos(todos, params, parts=()):
+    """
+    Filter, search and keyset-paginate ``todos`` from request parameters.
+
+    Returns ``(rows, next_cursor)``. Shared by the todo_list page and the API
+    so both accept the same ``q``/``project``/``priority``/``status``/``after``.
+    """
+    queryset, page_size, make_cursor = page_query(todos, params, parts)
+    return split_page(list(queryset), page_size, make_cursor)
+
+
+async def apage_todos(todos, params, parts=()):
+    """Async ``page_todos``: the page query runs through async iteration."""
+    queryset, page_size, make_cursor = page_query(todos, params, parts)
+    return split_page([todo async for todo in queryset], page_size, make_cursor)
+
+
+def row_url(name):
+    """``reverse(name, args=[pk])`` as a function of ``pk``, reversed only once."""
+    prefix, suffix = reverse(name, args=[_PK_PLACEHOLDER]).split(str(_PK_PLACEHOLDER))
+    return lambda pk: f'{prefix}{pk}{suffix}'
+
+
+def display_rows(todos):
+    """
+    What todo_row.html shows for each todo, worked out in one pass.
+
+    The template then only reads dict keys: no model properties, choice
+    lookups, URL reversing or filters per row. Due dates are formatted once
+    per distinct date.
+    """
+    edit_url, delete_url = row_url('todo_edit'), row_url('todo_delete')
+    due_labels = {}
+    rows = []
+    for todo in todos:
+        due = todo.due_date
+        if due is not None and due not in due_labels:
+            due_labels[due] = date_format(due, 'M d, Y')
+        project = todo.project
+        rows.append({
+            'id': todo.pk,
+            'name': todo.name,
+            'project': project.name if project else '',
+            'description': Truncator(todo.description).words(DESCRIPTION_WORDS, truncate=' …') if todo.description else '',
+            'completed': todo.completed,
+            'overdue': bool(todo.is_overdue),
+            'due': due_labels.get(due, ''),
+            'priority': PRIORITY_LABELS.get(todo.priority, todo.priority),
+            'priority_badge': PRIORITY_BADGES.get(todo.priority, 'bg-secondary'),
+            'edit_url': edit_url(todo.pk),
+            'delete_url': delete_url(todo.pk),
+        })
+    return rows
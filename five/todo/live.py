@@ -0,0 +1,206 @@
+"""
+Live updates for the todo list over Server-Sent Events.
+
+Every write that bumps a user's list version (see caching.py) also publishes
+a wake-up for that user once its transaction commits. Each open
+``/todos/events/`` stream waits for one. When it arrives, the stream reads the
+user's sync feed from its last cursor (see sync.py) and pushes one event per
+changed row. Publishing carries no data, so a missed or duplicate wake-up
+loses nothing. The SSE event id is the sync cursor, so a browser that
+reconnects with Last-Event-ID resumes where it stopped.
+
+The fan-out backend is set by TODO_LIVE_BROKER. InProcessBroker only reaches
+streams in the same process. FileBroker also touches a file per user in a
+shared directory and polls the files of its subscribers, so writes from other
+processes (WSGI workers, run_workers) reach them too.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from . import sync
+from .listing import TODO_LIST_FIELDS, display_rows
+from .models import ToDo
+
+ROW_TEMPLATE = 'todo/todo_row.html'
+DEFAULT_KEEPALIVE = 15
+# Past this many changes at once the page reloads instead of patching.
+MAX_EVENTS_PER_WAKE = 200
+
+
+class InProcessBroker:
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    def publish(self, user_id):
+        """Wake every stream of ``user_id``; callable from any thread."""
+        with self._lock:
+            waiters = list(self._waiters.get(user_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's event loop has closed.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        """Yield an asyncio.Event that is set whenever ``user_id`` changes."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                self._waiters[user_id].discard(waiter)
+                if not self._waiters[user_id]:
+                    del self._waiters[user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+
+
+class FileBroker(InProcessBroker):
+    """
+    Multi-process stand-in: ``publish`` touches ``<path>/<user_id>``, and one
+    task per event loop polls the files of the users it has streams for.
+    """
+
+    def __init__(self, path, poll_interval=0.5, **options):
+        super().__init__(**options)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self._pollers = {}
+
+    def publish(self, user_id):
+        (self.path / str(user_id)).touch()
+        super().publish(user_id)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._pollers or self._pollers[loop].done():
+                self._pollers[loop] = loop.create_task(self._poll())
+        async with super().subscribe(user_id) as event:
+            yield event
+
+    def _stamp(self, user_id):
+        try:
+            return os.stat(self.path / str(user_id)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    async def _poll(self):
+        seen = {}
+        while True:
+            with self._lock:
+                user_ids = list(self._waiters)
+            for user_id in user_ids:
+                stamp = self._stamp(user_id)
+                if seen.setdefault(user_id, stamp) != stamp:
+                    seen[user_id] = stamp
+                    InProcessBroker.publish(self, user_id)
+            await asyncio.sleep(self.poll_interval)
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        config = getattr(settings, 'TODO_LIVE_BROKER', {})
+        backend = import_string(config.get('BACKEND', 'todo.live.InProcessBroker'))
+        _broker = backend(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def reset_broker(setting, **kwargs):
+    """setting_changed receiver, so tests can swap the backend."""
+    global _broker
+    if setting == 'TODO_LIVE_BROKER':
+        _broker = None
+
+
+setting_changed.connect(reset_broker)
+
+
+def publish(user_id):
+    """Wake ``user_id``'s streams once the current transaction commits."""
+    if user_id is not None:
+        transaction.on_commit(lambda: broker().publish(user_id))
+
+
+# Events
+
+def sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def collect_events(user, since):
+    """
+    SSE messages for the user's changes after ``since`` and the new cursor
+    position. Live todos carry their re-rendered row so the page can swap it
+    in place.
+    """
+    rows, has_more = sync.changes_since(user, since, MAX_EVENTS_PER_WAKE)
+    # A cursor from before the last purge may have missed deletions.
+    if has_more or since < sync.purged_through():
+        head = sync.head()
+        return [sse('reload', {}, sync.encode_cursor(head))], head
+    live_ids = [row.pk for row in rows if isinstance(row, ToDo) and not row.deleted_at]
+    todos = (ToDo.objects.filter(pk__in=live_ids).select_related('project')
+             .only(*TODO_LIST_FIELDS).with_overdue())
+    todos = {row['id']: row for row in display_rows(todos)}
+    events = []
+    for row in rows:
+        cursor = sync.encode_cursor(row.change_seq)
+        if not isinstance(row, ToDo):
+            if row.deleted_at:
+                events.append(sse('project-deleted', {'id': row.pk}, cursor))
+            else:
+                events.append(sse('project', {'id': row.pk, 'name': row.name}, cursor))
+        elif row.pk in todos:
+            html = render_to_string(ROW_TEMPLATE, {'todo': todos[row.pk]})
+            events.append(sse('todo', {'id': row.pk, 'completed': row.completed, 'html': html}, cursor))
+        else:
+            events.append(sse('todo-deleted', {'id': row.pk}, cursor))
+    return events, rows[-1].change_seq if rows else since
+
+
+async def event_stream(user, since):
+    keepalive = getattr(settings, 'TODO_LIVE_KEEPALIVE', DEFAULT_KEEPALIVE)
+    yield 'retry: 5000\n\n'
+    async with broker().subscribe(user.pk) as wake:
+        # Catch up on anything since ``since`` before the first wait.
+        wake.set()
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), keepalive)
+            except asyncio.TimeoutError:
+                # Comments keep proxies from closing an idle stream.
+                yield ': keepalive\n\n'
+                continue
+            wake.clear()
+            events, since = await sync_to_async(collect_events)(user, since)
+            for event in events:
+                yield event
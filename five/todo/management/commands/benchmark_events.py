@@ -0,0 +1,182 @@
+import asyncio
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import include, path
+
+from todo import benchmarks, caching, live, sync
+from todo.models import ToDo
+from todo.urls import build_urlpatterns
+
+HOST = "testserver"
+
+
+class AsyncURLConf:
+    urlpatterns = [path("", include(build_urlpatterns(True)))]
+
+
+def rss_kib():
+    """Current resident set size; falls back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Stream:
+    """One idle EventSource connection driven straight through the ASGI app."""
+
+    def __init__(self, application, cookie, cursor):
+        self.application, self.cookie, self.cursor = application, cookie, cursor
+        self.connected = asyncio.Event()
+        self.received = asyncio.Event()
+        self.received_at = None
+        self.status = None
+        self.hang_up = asyncio.Event()
+
+    async def run(self):
+        query = f"cursor={self.cursor}".encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/todos/events/",
+            "raw_path": b"/todos/events/",
+            "query_string": query,
+            "root_path": "",
+            "headers": [(b"host", HOST.encode()), (b"cookie", self.cookie.encode()),
+                        (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 0),
+            "server": (HOST, 80),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await self.hang_up.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                self.status = message["status"]
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body.startswith(b"retry:"):
+                    self.connected.set()
+                elif b"event: todo" in body and not self.received.is_set():
+                    self.received_at = time.perf_counter()
+                    self.received.set()
+                if not message.get("more_body"):
+                    self.connected.set()
+
+        await self.application(scope, receive, send)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the todo_list live-update stream: hold --connections idle "
+        "Server-Sent Events connections open on one ASGI process, then have "
+        "every user write once and time how long the change takes to reach "
+        "each of their streams."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=1000, help="Idle streams to open.")
+        parser.add_argument("--users", type=int, default=100, help="Users the streams are spread over.")
+        parser.add_argument("--todos", type=int, default=20, help="Todos seeded per user.")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each phase.")
+
+    def handle(self, *args, **options):
+        if options["connections"] < 1 or options["users"] < 1:
+            raise CommandError("--connections and --users must be positive")
+        setup_test_environment()
+        # A file-backed test database, so the sync_to_async thread sees the rows.
+        handle, db_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connection.settings_dict["TEST"]["NAME"] = db_path
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            cookies, todos = [], []
+            for i in range(options["users"]):
+                user = User.objects.create_user(username=f"bench-events-{i}")
+                benchmarks.seed(user, options["todos"])
+                client = Client()
+                client.force_login(user)
+                cookies.append(f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}")
+                todos.append((ToDo.objects.filter(user=user).values_list("pk", flat=True).first(), user.pk))
+            # Keepalives would muddy "idle"; this run is about holding connections.
+            with override_settings(ROOT_URLCONF=AsyncURLConf, TODO_LIVE_KEEPALIVE=3600,
+                                   TODO_QUERY_BUDGET_ACTION="log"):
+                report = asyncio.run(self.run(cookies, todos, options))
+        finally:
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+        for label, value in report.items():
+            self.stdout.write(f"{label:<28}{value}")
+
+    async def run(self, cookies, todos, options):
+        application = get_asgi_application()
+        cursor = sync.encode_cursor(await sync.ahead())
+        timeout = options["timeout"]
+
+        before = rss_kib()
+        started = time.perf_counter()
+        streams = [Stream(application, cookies[i % len(cookies)], cursor) for i in range(options["connections"])]
+        tasks = [asyncio.create_task(stream.run()) for stream in streams]
+        await asyncio.wait_for(asyncio.gather(*(stream.connected.wait() for stream in streams)), timeout)
+        connect_seconds = time.perf_counter() - started
+        held = live.broker().subscriber_count()
+        if any(stream.status != 200 for stream in streams):
+            raise CommandError(f"Streams failed: statuses {sorted({s.status for s in streams})}")
+        per_connection = (rss_kib() - before) / len(streams)
+
+        # One write per user, each waking all of that user's streams.
+        written_at = {}
+
+        def write_all():
+            for user_index, (pk, user_id) in enumerate(todos):
+                written_at[user_index] = time.perf_counter()
+                ToDo.objects.filter(pk=pk).toggle_completed()
+                caching.bump_list_version(user_id)
+
+        await sync_to_async(write_all)()
+        await asyncio.wait_for(asyncio.gather(*(stream.received.wait() for stream in streams)), timeout)
+        latencies = sorted(
+            (stream.received_at - written_at[i % len(cookies)]) * 1000 for i, stream in enumerate(streams)
+        )
+
+        for stream in streams:
+            stream.hang_up.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout)
+        cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            "connections held": held,
+            "connect time s": round(connect_seconds, 2),
+            "RSS per connection KiB": round(per_connection, 1),
+            "fan-out p50 ms": round(cuts[49], 1),
+            "fan-out p99 ms": round(cuts[98], 1),
+            "fan-out max ms": round(latencies[-1], 1),
+            "subscribers after close": live.broker().subscriber_count(),
+        }
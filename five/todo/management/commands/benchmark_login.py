@@ -0,0 +1,114 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from todo import benchmarks
+
+# Limits high enough that the throttle never triggers.
+UNTHROTTLED = {"window": 300, "login_per_ip": 10**9, "login_per_username": 10**9, "register_per_ip": 10**9}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure todo_list latency for a signed-in user while attacker threads "
+        "post wrong passwords to the login view, with the login throttle off and on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attackers", type=int, default=8, help="Concurrent attacker threads.")
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario.")
+        parser.add_argument("--todos", type=int, default=200, help="Todos seeded for the legitimate user.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # A file-backed test database, so the worker threads share it.
+        handle, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connection.settings_dict["TEST"]["NAME"] = path
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            User.objects.create_user(username="victim", password="correct horse battery staple")
+            user = User.objects.create_user(username="bench-login")
+            benchmarks.seed(user, options["todos"])
+            connection.close()
+            results = {
+                "idle": self.run_scenario(user, 0, UNTHROTTLED, options),
+                "attack, throttle off": self.run_scenario(user, options["attackers"], UNTHROTTLED, options),
+                "attack, throttle on": self.run_scenario(user, options["attackers"], None, options),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.stdout.write(
+            f"{'scenario':<24}{'login req/s':>12}{'429':>7}{'503':>7}{'list p50 ms':>13}{'list p99 ms':>13}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<24}{result['login_rate']:>12.1f}{result['throttled']:>7}{result['busy']:>7}"
+                f"{result['p50']:>13.2f}{result['p99']:>13.2f}"
+            )
+
+    def run_scenario(self, user, attackers, throttle, options):
+        cache.clear()
+        stop = threading.Event()
+        statuses, latencies = [], []
+        login_url, list_url = reverse("login"), reverse("todo_list")
+
+        def attack(worker):
+            client = Client()
+            attempt = 0
+            try:
+                while not stop.is_set():
+                    attempt += 1
+                    # A different source address per attempt defeats the per-IP limit.
+                    response = client.post(
+                        login_url, {"username": "victim", "password": f"guess {attempt}"},
+                        REMOTE_ADDR=f"10.{worker}.{attempt // 250 % 250}.{attempt % 250}",
+                    )
+                    statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        def browse():
+            client = Client()
+            client.force_login(user)
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    client.get(list_url)
+                    latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+
+        overrides = {"TODO_LOGIN_THROTTLE": throttle} if throttle else {}
+        with override_settings(**overrides):
+            threads = [threading.Thread(target=attack, args=(worker,)) for worker in range(attackers)]
+            threads.append(threading.Thread(target=browse))
+            for thread in threads:
+                thread.start()
+            time.sleep(options["duration"])
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        latencies.sort()
+        return {
+            "login_rate": len(statuses) / options["duration"],
+            "throttled": statuses.count(429),
+            "busy": statuses.count(503),
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "p99": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from todo.models import Project, ToDo
+
+MODES = ("wsgi", "asgi")
+DEFAULT_PATHS = ["/todos/", "/api/v1/todos/"]
+BENCH_USERNAME = "benchmark-servers"
+HOST = "localhost"
+
+
+def summarize(mode, latencies, elapsed, failures):
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "failures": failures,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def run_wsgi(paths, cookie, total, concurrency):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def one(index):
+        path = paths[index % len(paths)]
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": HOST,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": HOST,
+            "HTTP_COOKIE": cookie,
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        body = application(environ, lambda status, headers: statuses.append(status))
+        try:
+            b"".join(body)
+        finally:
+            getattr(body, "close", lambda: None)()
+        return time.perf_counter() - started, statuses[0].startswith("200")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    return results, time.perf_counter() - started
+
+
+def run_asgi(paths, cookie, total, concurrency):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def one(index, slots):
+        path = paths[index % len(paths)]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", HOST.encode()), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (HOST, 80),
+        }
+        statuses = []
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        finished = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Django listens for a disconnect while the view runs.
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            elif not message.get("more_body"):
+                finished.set()
+
+        async with slots:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - started, statuses[0] == 200
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(one(index, slots) for index in range(total)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    return results, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and latency of the todo hot paths served through "
+        "the WSGI handler (sync views) and the ASGI handler (async views)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per mode.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument("--todos", type=int, default=500, help="Todos seeded for the benchmark user.")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help=f"URL to request, repeatable (default: {' '.join(DEFAULT_PATHS)}).")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+        # Internal: run a single mode in a child process.
+        parser.add_argument("--mode", choices=MODES, help="(internal) Serve one mode and print its results.")
+        parser.add_argument("--cookie", help="(internal) Session cookie for --mode.")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or DEFAULT_PATHS
+        if options["mode"]:
+            runner = run_wsgi if options["mode"] == "wsgi" else run_asgi
+            # One untimed pass warms connections, templates and caches.
+            runner(paths, options["cookie"], len(paths), 1)
+            results, elapsed = runner(paths, options["cookie"], options["requests"], options["concurrency"])
+            failures = sum(1 for _, ok in results if not ok)
+            self.stdout.write(json.dumps(summarize(options["mode"], [t for t, _ in results], elapsed, failures)))
+            return
+
+        if User.objects.filter(username=BENCH_USERNAME).exists():
+            raise CommandError(f"User {BENCH_USERNAME!r} already exists; remove it or wait for the other run.")
+        user = User.objects.create_user(username=BENCH_USERNAME)
+        try:
+            self.seed(user, options["todos"])
+            client = Client()
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            reports = [self.run_mode(mode, cookie, paths, options) for mode in MODES]
+        finally:
+            user.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        self.stdout.write(f"{'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failures':>10}")
+        for report in reports:
+            self.stdout.write(
+                f"{report['mode']:<6}{report['requests_per_second']:>10}"
+                f"{report['p50_ms']:>10}{report['p99_ms']:>10}{report['failures']:>10}"
+            )
+
+    def seed(self, user, count):
+        projects = Project.objects.bulk_create(Project(user=user, name=f"Bench {i}") for i in range(5))
+        todos = [
+            ToDo(user=user, name=f"Bench todo {i}", priority=i % 3 + 1, completed=i % 4 == 0,
+                 project=projects[i % len(projects)])
+            for i in range(count)
+        ]
+        ToDo.objects.bulk_create(todos, batch_size=500)
+        Project.adjust_counts(Project.count_deltas((t.project_id, t.completed) for t in todos))
+
+    def run_mode(self, mode, cookie, paths, options):
+        # Each mode runs in its own process: the URLconf picks sync or async
+        # views at import time from DJANGO_ASYNC_VIEWS.
+        env = {**os.environ, "DJANGO_ASYNC_VIEWS": "1" if mode == "asgi" else "0"}
+        command = [
+            sys.executable, sys.argv[0], "benchmark_servers", "--mode", mode, "--cookie", cookie,
+            "--requests", str(options["requests"]), "--concurrency", str(options["concurrency"]),
+        ]
+        for path in paths:
+            command += ["--path", path]
+        self.stderr.write(f"Running {mode} ...")
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"{mode} run failed:\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
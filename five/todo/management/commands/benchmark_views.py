@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from todo import benchmarks
+
+DEFAULT_BASELINE = Path(benchmarks.__file__).with_name("benchmark_baseline.json")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway test databases with 1k/100k/1M todos, time the todo views "
+        "and fail if query counts (and, with --tolerance, wall times) regress against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="1000",
+            help="Comma-separated dataset sizes, e.g. 1000,100000,1000000 (default: 1000).",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the best is kept.")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file.")
+        parser.add_argument(
+            "--tolerance", type=float, default=None,
+            help="Also check wall times, allowing this slowdown as a fraction of the baseline "
+                 "(e.g. 0.25). Off by default: timings only compare on the machine that recorded them.",
+        )
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Write these results into the baseline instead of comparing.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        baseline_path = Path(options["baseline"])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+        results = {}
+        setup_test_environment()
+        # A fresh test database per run keeps seeded rows out of real data.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in sizes:
+                user = User.objects.create_user(username=f"bench-{size}")
+                self.stderr.write(f"Seeding {size} todos ...")
+                benchmarks.seed(user, size)
+                results[str(size)] = benchmarks.run_cases(user, repeat=options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for size, cases in results.items():
+            self.stdout.write(f"\n{size} todos")
+            for case, result in cases.items():
+                self.stdout.write(f"  {case:<60}{result['ms']:>10.2f} ms{result['queries']:>5} queries")
+
+        if options["update_baseline"]:
+            baseline.update(results)
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+
+        regressions = [
+            f"[{size}] {line}"
+            for size, cases in results.items()
+            for line in benchmarks.compare(cases, baseline.get(size, {}), options["tolerance"])
+        ]
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        missing = [size for size in results if size not in baseline]
+        if missing:
+            self.stdout.write(self.style.WARNING(f"No baseline for size(s) {', '.join(missing)}; not compared."))
+        self.stdout.write(self.style.SUCCESS("No regressions."))
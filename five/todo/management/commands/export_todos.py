@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo import export, sharing
+from todo.listing import STATUS_FILTERS
+
+
+class Command(BaseCommand):
+    help = "Stream a user's todos as CSV or NDJSON, using the same filters as the todo list."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--format", choices=sorted(export.FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write to (default: stdout).")
+        parser.add_argument("--q", help="Search text.")
+        parser.add_argument("--project", help="Project id.")
+        parser.add_argument("--priority", help="Priority (1-3).")
+        parser.add_argument("--status", choices=[status for status, _ in STATUS_FILTERS])
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        params = {key: options[key] for key in ("q", "project", "priority", "status") if options[key]}
+        rows = export.export_rows(sharing.own_todos(user), params, options["chunk_size"])
+        lines = export.export_lines(rows, options["format"])
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo import importer
+
+
+class Command(BaseCommand):
+    help = "Bulk-load todos for a user from a CSV or NDJSON file (as written by export_todos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Default: guessed from the file name.")
+        parser.add_argument("--batch-size", type=int, default=importer.DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--rejects",
+            help="NDJSON file for rows that fail validation (default: <path>.rejects.ndjson).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        path = options["path"]
+        fmt = options["format"] or importer.detect_format(path)
+        rejects_path = options["rejects"] or f"{path}.rejects.ndjson"
+
+        with open(path, newline="", encoding="utf-8") as source, \
+                open(rejects_path, "w", encoding="utf-8") as rejects:
+
+            def on_reject(number, row, errors):
+                rejects.write(json.dumps({"line": number, "row": row, "errors": errors}) + "\n")
+
+            def on_progress(run):
+                self.stdout.write(
+                    f"{run.created} imported, {run.rejected} rejected, {run.rows_per_second:,.0f} rows/s"
+                )
+
+            run = importer.Importer(
+                user, batch_size=options["batch_size"], on_reject=on_reject, on_progress=on_progress,
+            ).run(importer.read_rows(source, fmt))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {run.created} todos ({run.rows_per_second:,.0f} rows/s)."
+        ))
+        if run.rejected:
+            self.stdout.write(self.style.WARNING(f"{run.rejected} rows rejected; see {rejects_path}"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from todo import recurrence
+
+
+class Command(BaseCommand):
+    help = (
+        "Create ToDo rows for the next --ahead occurrences of every repeating todo. "
+        "Occurrences further out stay virtual. Safe to run as often as you like, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead", type=int, default=recurrence.ahead(),
+            help="Occurrences to keep as rows per rule, counting from today.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Rules per transaction.")
+
+    def handle(self, *args, **options):
+        if options["ahead"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--ahead and --batch-size must be positive")
+        today = timezone.localdate()
+        rule_ids = recurrence.active_rules().order_by("pk").values_list("pk", flat=True)
+        created = last = 0
+        # Walk rules by primary key, one transaction per batch, so memory and
+        # lock time stay flat however many rules there are.
+        while batch := list(rule_ids.filter(pk__gt=last)[:options["batch_size"]]):
+            created += len(recurrence.materialize(batch, today, options["ahead"]))
+            last = batch[-1]
+        self.stdout.write(self.style.SUCCESS(f"Created {created} occurrence(s)."))
@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from todo.models import Project, SyncSequence, ToDo
+
+DEFAULT_PURGE_AFTER_DAYS = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Permanently remove soft-deleted todos and projects older than --days, "
+        "in small batches with a pause between them so other writers keep going."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=float, default=getattr(settings, "TODO_PURGE_AFTER_DAYS", DEFAULT_PURGE_AFTER_DAYS),
+            help="Only purge rows deleted at least this many days ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per DELETE.")
+        parser.add_argument("--sleep", type=float, default=0.05, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        size, pause = options["batch_size"], options["sleep"]
+
+        # Sync cursors from before the last purged tombstone may have missed
+        # its deletion; raise the watermark first so they are told to resync.
+        self.mark_purged(
+            ToDo.all_objects.filter(deleted_at__lt=cutoff),
+            Project.all_objects.filter(deleted_at__lt=cutoff),
+        )
+
+        # Tombstoned rows are no longer counted anywhere, so a plain DELETE
+        # is enough; each batch is its own short transaction.
+        tombstones = ToDo.all_objects.filter(deleted_at__lt=cutoff)
+        todos = 0
+        while batch := tombstones.delete_batch(size):
+            todos += batch
+            time.sleep(pause)
+
+        # A project goes once its todos have; one whose delete job has not
+        # run yet still has live todos and waits for the next purge.
+        projects = 0
+        empty = (Project.all_objects.filter(deleted_at__lt=cutoff)
+                 .exclude(Exists(ToDo.all_objects.filter(project=OuterRef("pk")))))
+        while ids := list(empty.values_list("pk", flat=True)[:size]):
+            with transaction.atomic():
+                projects += Project.all_objects.filter(pk__in=ids).delete()[1].get("todo.Project", 0)
+            time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {todos} todo(s) and {projects} project(s)."))
+
+    def mark_purged(self, *querysets):
+        highest = max(qs.aggregate(seq=Max("change_seq"))["seq"] or 0 for qs in querysets)
+        if highest:
+            SyncSequence.objects.filter(pk=1).update(purged_through=Greatest(F("purged_through"), highest))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todo import caching, search
+from todo.models import ToDo
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for todos from the todo_todo table."
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            raise CommandError("Full-text search needs SQLite; this backend searches with icontains.")
+        search.rebuild_index()
+        # Search results may have changed, so cached todo_list pages are stale.
+        caching.bump_all_list_versions(ToDo.objects.values_list("user_id", flat=True).distinct())
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todo import jobs
+from todo.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recompute Project.todo_count/completed_count and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report projects whose counters are wrong.",
+        )
+        parser.add_argument(
+            "--queue", action="store_true",
+            help="Queue the repair as a job for run_workers instead of running it now.",
+        )
+
+    def handle(self, *args, **options):
+        if options["queue"]:
+            if options["dry_run"]:
+                raise CommandError("--queue repairs the counters; it cannot be combined with --dry-run")
+            job = jobs.enqueue("recount_projects")
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}."))
+            return
+
+        drifted = jobs.repair_counts(Project.objects.all(), dry_run=options["dry_run"])
+        for project in drifted:
+            self.stdout.write(
+                f"Project {project.pk} ({project.name}): "
+                f"{project.completed_count}/{project.todo_count} stored, "
+                f"{project.actual_completed_count}/{project.actual_todo_count} actual"
+            )
+
+        verb = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} drifted project(s)."))
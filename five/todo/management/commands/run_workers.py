@@ -0,0 +1,67 @@
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from todo import jobs
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (see todo/jobs.py) on a pool of worker threads. "
+        "Several copies can run at once, on one host or many sharing the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Worker threads, counting this one.")
+        parser.add_argument(
+            "--poll", type=float, default=getattr(settings, "TODO_JOB_POLL_INTERVAL", DEFAULT_POLL_INTERVAL),
+            help="Seconds an idle worker waits before looking for jobs again.",
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        def work(name):
+            try:
+                while not stop.is_set():
+                    job = jobs.claim(name)
+                    if job is not None:
+                        jobs.run(job)
+                        self.stdout.write(f"{name}: {job.kind} #{job.pk} finished")
+                    elif options["burst"]:
+                        return
+                    else:
+                        # Each idle worker also sweeps up jobs a dead worker left running.
+                        jobs.requeue_stale()
+                        stop.wait(options["poll"])
+            finally:
+                connections.close_all()
+
+        # This thread is worker 0; the rest get threads of their own.
+        threads = [
+            threading.Thread(target=work, args=(f"{prefix}:{worker}",), daemon=True)
+            for worker in range(1, options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            work(f"{prefix}:0")
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the current jobs ...")
+            stop.set()
+            for thread in threads:
+                thread.join()
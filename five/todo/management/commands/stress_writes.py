@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from todo.listing import page_todos
+from todo.models import Project, ToDo
+from todo.views import apply_positions
+
+STRESS_USERNAME = "stress-writes"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writers (toggles, reorders, saves) against the configured "
+        "database and fail on any 'database is locked' error. Run it with "
+        "DJANGO_DB_PROFILE=production to check the production SQLite profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent writer threads.")
+        parser.add_argument("--iterations", type=int, default=200, help="Operations per worker.")
+        parser.add_argument("--todos", type=int, default=200, help="Todos seeded for the stress user.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the operation mix.")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=STRESS_USERNAME).exists():
+            raise CommandError(f"User {STRESS_USERNAME!r} already exists; remove it or wait for the other run.")
+        user = User.objects.create_user(username=STRESS_USERNAME)
+        try:
+            project = Project.objects.create(user=user, name="Stress")
+            ToDo.objects.bulk_create(
+                ToDo(user=user, project=project, name=f"Stress {i}", position=i) for i in range(options["todos"])
+            )
+            ids = list(ToDo.objects.filter(user=user).values_list("id", flat=True))
+            Project.adjust_counts({project.pk: (len(ids), 0)})
+            # Release this thread's connection so SQLite sees only the workers.
+            connection.close()
+            errors, elapsed = self.run_workers(user, ids, options)
+
+            project.refresh_from_db()
+            actual = ToDo.objects.filter(project=project, completed=True).count()
+        finally:
+            user.delete()
+
+        operations = options["workers"] * options["iterations"]
+        self.stdout.write(
+            f"{options['workers']} workers, {operations} operations in {elapsed:.2f}s "
+            f"({operations / elapsed:.0f} ops/s), {len(errors)} error(s)"
+        )
+        if project.completed_count != actual:
+            raise CommandError(f"Project counter drifted: {project.completed_count} stored, {actual} actual")
+        if errors:
+            raise CommandError("Writers failed:\n" + "\n".join(sorted(set(errors))[:10]))
+        self.stdout.write(self.style.SUCCESS("No lock errors."))
+
+    def run_workers(self, user, ids, options):
+        errors = []
+        start = threading.Barrier(options["workers"])
+
+        def work(worker):
+            rng = random.Random(options["seed"] * 1000 + worker)
+            try:
+                start.wait()
+                for _ in range(options["iterations"]):
+                    pick = rng.choice(ids)
+                    action = rng.randrange(4)
+                    try:
+                        if action == 0:
+                            ToDo.objects.filter(pk=pick, user=user).toggle_completed()
+                        elif action == 1:
+                            # Read-then-write transaction: the classic lock upgrade failure.
+                            moved = rng.sample(ids, 5)
+                            apply_positions(user, {pk: rng.randrange(10_000) for pk in moved})
+                        elif action == 2:
+                            todo = ToDo.objects.get(pk=pick)
+                            todo.name = f"Stress {pick} by {worker}"
+                            todo.save()
+                        else:
+                            page_todos(ToDo.objects.filter(user=user), {})
+                    except OperationalError as exc:
+                        errors.append(f"worker {worker}: {exc}")
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(options["workers"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors, time.perf_counter() - started
@@ -0,0 +1,212 @@
+"""
+Per-request instrumentation: SQL query count, DB time, template render time
+and total latency, keyed by URL name.
+
+RequestMetricsMiddleware opens a RequestStats for each request in a context
+variable. Every database connection carries an execute wrapper (installed on
+``connection_created``) that adds to it, and InstrumentedDjangoTemplates times
+template rendering. Context variables follow sync_to_async into its worker
+threads, so async views are measured too.
+
+Each response gets a Server-Timing header and one JSON log line on the
+``todo.metrics`` logger. Totals are kept in an in-process histogram that staff
+can read at ``/metrics/``. Views that go over their TODO_QUERY_BUDGETS entry
+are logged, or raise QueryBudgetExceeded when TODO_QUERY_BUDGET_ACTION is
+"raise".
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last is open-ended.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+current = ContextVar('todo_request_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.rendering = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query's count and time to the current request."""
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = current.get()
+        # Only the outermost render is timed; nested renders are part of it.
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_ms += (time.perf_counter() - started) * 1000
+            stats.rendering = False
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, with render time recorded per request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histogram:
+    """Thread-safe per-view aggregates. Each worker process keeps its own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, view, total_ms, stats):
+        with self._lock:
+            entry = self._views.setdefault(view, {
+                'count': 0,
+                'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                'total_ms': 0.0, 'max_ms': 0.0,
+                'queries': 0, 'max_queries': 0,
+                'db_ms': 0.0, 'template_ms': 0.0,
+            })
+            entry['count'] += 1
+            entry['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+            entry['total_ms'] += total_ms
+            entry['max_ms'] = max(entry['max_ms'], total_ms)
+            entry['queries'] += stats.queries
+            entry['max_queries'] = max(entry['max_queries'], stats.queries)
+            entry['db_ms'] += stats.db_ms
+            entry['template_ms'] += stats.template_ms
+
+    def snapshot(self):
+        labels = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + ['inf']
+        with self._lock:
+            return {
+                view: {
+                    'count': entry['count'],
+                    'latency_ms': dict(zip(labels, entry['buckets'])),
+                    'mean_ms': round(entry['total_ms'] / entry['count'], 2),
+                    'max_ms': round(entry['max_ms'], 2),
+                    'mean_queries': round(entry['queries'] / entry['count'], 2),
+                    'max_queries': entry['max_queries'],
+                    'mean_db_ms': round(entry['db_ms'] / entry['count'], 2),
+                    'mean_template_ms': round(entry['template_ms'] / entry['count'], 2),
+                }
+                for view, entry in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+histogram = Histogram()
+
+
+def check_budget(view, stats):
+    budget = getattr(settings, 'TODO_QUERY_BUDGETS', {}).get(view)
+    if budget is None or stats.queries <= budget:
+        return
+    message = f'{view} ran {stats.queries} queries, over its budget of {budget}'
+    if getattr(settings, 'TODO_QUERY_BUDGET_ACTION', 'log') == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else None
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        if view is None:
+            return response
+        histogram.add(view, total_ms, stats)
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': round(stats.db_ms, 2),
+            'template_ms': round(stats.template_ms, 2),
+            'total_ms': round(total_ms, 2),
+        }))
+        check_budget(view, stats)
+        return response
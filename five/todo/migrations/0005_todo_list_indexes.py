@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0004_sync_todo_project_schema"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "priority", "due_date", "created_at", "id"], name="todo_user_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "completed", "priority", "due_date", "created_at", "id"], name="todo_user_status_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "project", "priority", "due_date", "created_at", "id"], name="todo_user_project_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(condition=models.Q(("completed", False)), fields=["user", "priority", "due_date", "created_at", "id"], name="todo_user_open_order_idx"),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE todo_todo_fts USING fts5(
+        name, description, content='todo_todo', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER todo_todo_fts_insert AFTER INSERT ON todo_todo BEGIN
+        INSERT INTO todo_todo_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todo_todo_fts_delete AFTER DELETE ON todo_todo BEGIN
+        INSERT INTO todo_todo_fts(todo_todo_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todo_todo_fts_update AFTER UPDATE OF name, description ON todo_todo BEGIN
+        INSERT INTO todo_todo_fts(todo_todo_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO todo_todo_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO todo_todo_fts(todo_todo_fts) VALUES ('rebuild')",
+]
+
+BACKWARD_SQL = [
+    "DROP TRIGGER IF EXISTS todo_todo_fts_update",
+    "DROP TRIGGER IF EXISTS todo_todo_fts_delete",
+    "DROP TRIGGER IF EXISTS todo_todo_fts_insert",
+    "DROP TABLE IF EXISTS todo_todo_fts",
+]
+
+
+def run_sqlite_only(statements):
+    def run(apps, schema_editor):
+        # Other backends keep using the name__icontains search path.
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0005_todo_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite_only(FORWARD_SQL), run_sqlite_only(BACKWARD_SQL)),
+    ]
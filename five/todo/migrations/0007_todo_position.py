@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0006_todo_fts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="todo",
+            options={"ordering": ["priority", "position", "due_date", "created_at"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="todo",
+            name="todo_user_order_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="todo",
+            name="todo_user_status_order_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="todo",
+            name="todo_user_project_order_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="todo",
+            name="todo_user_open_order_idx",
+        ),
+        migrations.AddField(
+            model_name="todo",
+            name="position",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "priority", "position", "due_date", "created_at", "id"], name="todo_user_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "completed", "priority", "position", "due_date", "created_at", "id"], name="todo_user_status_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["user", "project", "priority", "position", "due_date", "created_at", "id"], name="todo_user_project_order_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(condition=models.Q(("completed", False)), fields=["user", "priority", "position", "due_date", "created_at", "id"], name="todo_user_open_order_idx"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Project = apps.get_model("todo", "Project")
+    ToDo = apps.get_model("todo", "ToDo")
+
+    def count(**filters):
+        rows = (ToDo.objects.filter(project=OuterRef("pk"), **filters)
+                .order_by().values("project").annotate(n=Count("*")).values("n"))
+        return Coalesce(Subquery(rows), 0)
+
+    Project.objects.update(todo_count=count(), completed_count=count(completed=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0007_todo_position"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="completed_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="todo_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0008_project_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['user', 'due_date', 'priority', 'position', 'id'], name='todo_user_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_deleting_projects(apps, schema_editor):
+    # Projects hidden by the old `deleting` flag become soft-deleted; their
+    # queued delete jobs tombstone the todos with this same timestamp.
+    Project = apps.get_model('todo', 'Project')
+    Project.objects.filter(deleting=True).update(deleted_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_status_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_project_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_open_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_open_due_idx',
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(stamp_deleting_projects, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='project',
+            name='deleting',
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user', 'priority', 'position', 'due_date', 'created_at', 'id'], name='todo_user_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user', 'completed', 'priority', 'position', 'due_date', 'created_at', 'id'], name='todo_user_status_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user', 'project', 'priority', 'position', 'due_date', 'created_at', 'id'], name='todo_user_project_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('completed', False)), fields=['user', 'priority', 'position', 'due_date', 'created_at', 'id'], name='todo_user_open_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('completed', False)), fields=['user', 'due_date', 'priority', 'position', 'id'], name='todo_user_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='todo_tombstone_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Number the existing rows and start the counter after them. The triggers
+# that keep change_seq current are installed after migrate (todo/sync.py).
+BACKFILL_SQL = [
+    "UPDATE todo_todo SET change_seq = id",
+    "UPDATE todo_project SET change_seq = id + (SELECT COALESCE(MAX(id), 0) FROM todo_todo)",
+    """
+    INSERT INTO todo_syncsequence (id, value, purged_through) VALUES (1, (
+        SELECT MAX(seq) FROM (
+            SELECT COALESCE(MAX(change_seq), 0) AS seq FROM todo_todo
+            UNION ALL SELECT COALESCE(MAX(change_seq), 0) FROM todo_project
+        )
+    ), 0)
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0011_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('purged_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', 'change_seq'], name='project_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'change_seq'], name='todo_user_change_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
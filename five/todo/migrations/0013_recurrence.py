@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0012_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('cron', 'Cron')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('cron', models.CharField(blank=True, max_length=100)),
+                ('until', models.DateField(blank=True, null=True)),
+                ('materialized_through', models.DateField(blank=True, editable=False, null=True)),
+                ('todo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='todo.todo')),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='recurrences', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='occurrence_of',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='todo.recurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='todo',
+            constraint=models.UniqueConstraint(condition=models.Q(('occurrence_of__isnull', False)), fields=('occurrence_of', 'due_date'), name='todo_occurrence_unique'),
+        ),
+    ]
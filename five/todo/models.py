@@ -1,25 +1,241 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections, models, transaction
+from django.db.models import BooleanField, Case, Count, F, Q, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+# Rows the default managers return; partial indexes use it as their condition.
+LIVE = Q(deleted_at__isnull=True)
+
+
+class LiveManager(models.Manager):
+    """
+    Default manager that leaves out soft-deleted rows. ``all_objects`` still
+    sees them, until ``manage.py purge_deleted`` removes them for good.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(LIVE)
+
+
 class Project(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized from ToDo so progress needs no COUNT queries. Maintained by
+    # ToDo.save()/delete(); bulk paths call adjust_counts() themselves and
+    # `manage.py recount_projects` repairs any drift.
+    todo_count = models.PositiveIntegerField(default=0, editable=False)
+    completed_count = models.PositiveIntegerField(default=0, editable=False)
+    # Soft delete. The project disappears at once; a job then tombstones its
+    # todos with the same timestamp, which is how an undo finds them again
+    # (see jobs.py).
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Position in the sync feed, set by a database trigger (see sync.py).
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
     
     def completion_percent(self):
-        total = self.todos.count()
-        done = self.todos.filter(completed=True).count()
+        total = self.todo_count
+        done = self.completed_count
         return int(done / total *100) if total else 0
+
+    @staticmethod
+    def adjust_counts(deltas):
+        """
+        Apply ``{project_id: (todo_delta, completed_delta)}`` with F() updates.
+
+        One UPDATE per touched project, so concurrent writers never lose counts.
+        """
+        for project_id, (total, done) in deltas.items():
+            if project_id is None or (total == 0 and done == 0):
+                continue
+            Project.objects.filter(pk=project_id).update(
+                todo_count=F('todo_count') + total,
+                completed_count=F('completed_count') + done,
+            )
+
+    @staticmethod
+    def count_deltas(rows, sign=1):
+        """Sum ``(project_id, completed)`` pairs into adjust_counts() deltas."""
+        deltas = defaultdict(lambda: (0, 0))
+        for project_id, completed in rows:
+            total, done = deltas[project_id]
+            deltas[project_id] = (total + sign, done + sign * int(bool(completed)))
+        return deltas
+
+    @staticmethod
+    def with_actual_counts(queryset=None):
+        """Annotate projects with counts computed from their todos."""
+        if queryset is None:
+            queryset = Project.objects.all()
+        return queryset.annotate(
+            actual_todo_count=Count('todo', filter=Q(todo__deleted_at__isnull=True)),
+            actual_completed_count=Count('todo', filter=Q(todo__completed=True, todo__deleted_at__isnull=True)),
+        )
     
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='project_user_change_idx'),
+        ]
+
+
+class Membership(models.Model):
+    """
+    A user's access to a shared project. ``Project.user`` stays the owner;
+    sharing a project also gives the owner an OWNER row (see sharing.py), so
+    one index range on ``user`` lists every shared project a user can see.
+    Unshared projects have no rows at all.
+    """
+    OWNER = 'owner'
+    EDITOR = 'editor'
+    VIEWER = 'viewer'
+    ROLE_CHOICES = [(OWNER, 'Owner'), (EDITOR, 'Editor'), (VIEWER, 'Viewer')]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memberships')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=EDITOR)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} in {self.project_id} ({self.role})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'user'], name='todo_membership_unique'),
+        ]
+        indexes = [
+            # Covers "projects shared with this user (in this role)" subqueries.
+            models.Index(fields=['user', 'role', 'project'], name='todo_membership_user_idx'),
+        ]
+
+
+class CompletedChanges(dict):
+    """``{todo_id: new_completed}`` plus the ``project_ids`` the changed todos are in."""
+
+    def __init__(self, rows):
+        super().__init__((pk, completed) for pk, _, completed in rows)
+        self.project_ids = {project_id for _, project_id, _ in rows if project_id is not None}
+
+
+class ToDoQuerySet(models.QuerySet):
+
+    def overdue(self, today=None):
+        """Open todos whose due date has passed."""
+        return self.filter(completed=False, due_date__lt=today or timezone.localdate())
+
+    def due_within(self, days, today=None):
+        """Open todos due from today through ``days`` days from now."""
+        today = today or timezone.localdate()
+        return self.filter(completed=False, due_date__range=(today, today + timedelta(days=days)))
+
+    def with_overdue(self, today=None):
+        """Annotate ``overdue`` in SQL; ``ToDo.is_overdue`` then reads it."""
+        return self.annotate(overdue=Case(
+            When(completed=False, due_date__lt=today or timezone.localdate(), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+
+    def _update_returning(self, assignment, params):
+        """
+        ``UPDATE ... SET <assignment>, updated_at = now WHERE id IN (<this
+        queryset>) RETURNING id, project_id, completed`` as one statement.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        ids_sql, ids_params = self.order_by().values('pk').query.sql_with_params()
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {qn(self.model._meta.db_table)} SET {assignment}, {qn("updated_at")} = %s '
+                f'WHERE {qn("id")} IN ({ids_sql}) '
+                f'RETURNING {qn("id")}, {qn("project_id")}, {qn("completed")}',
+                [*params, now, *ids_params],
+            )
+            return [(pk, project_id, bool(completed)) for pk, project_id, completed in cursor.fetchall()]
+
+    def _write_completed(self, assignment, params):
+        with transaction.atomic(using=self.db):
+            rows = self._update_returning(assignment, params)
+            deltas = defaultdict(lambda: (0, 0))
+            for _, project_id, completed in rows:
+                deltas[project_id] = (0, deltas[project_id][1] + (1 if completed else -1))
+            Project.adjust_counts(deltas)
+        return CompletedChanges(rows)
+
+    def delete_batch(self, size):
+        """
+        Delete up to ``size`` matched todos in one statement and return how
+        many went. Rows are not loaded and no signals are sent, so callers
+        adjust counters and caches themselves.
+
+        The raw DELETE skips Django's cascades, so the batch's repeat rules
+        are deleted through the ORM first (which detaches their occurrences),
+        in the same transaction.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        batch = self.order_by('pk').values('pk')[:size]
+        ids_sql, ids_params = batch.query.sql_with_params()
+        with transaction.atomic(using=self.db):
+            Recurrence.objects.using(self.db).filter(todo__in=batch).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {qn(self.model._meta.db_table)} WHERE {qn("id")} IN ({ids_sql})',
+                    ids_params,
+                )
+                return cursor.rowcount
+
+    def set_deleted_batch(self, size, deleted_at):
+        """
+        Set ``deleted_at`` (None restores) on up to ``size`` matched todos in
+        one UPDATE and return how many changed. Like delete_batch(), it leaves
+        counters and caches to the caller.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        ids_sql, ids_params = self.order_by().values('pk')[:size].query.sql_with_params()
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {qn(self.model._meta.db_table)} SET {qn("deleted_at")} = %s, {qn("updated_at")} = %s '
+                f'WHERE {qn("id")} IN ({ids_sql})',
+                [adapt(deleted_at), adapt(timezone.now()), *ids_params],
+            )
+            return cursor.rowcount
+
+    def toggle_completed(self):
+        """
+        Flip ``completed`` on every matched todo in a single UPDATE.
+
+        Returns ``{todo_id: new_completed}`` (a CompletedChanges, which also
+        carries the touched project ids). Project counters are adjusted in
+        the same transaction; like other bulk writes, no signals are sent.
+        """
+        qn = connections[self.db].ops.quote_name
+        return self._write_completed(f'{qn("completed")} = NOT {qn("completed")}', [])
+
+    def set_completed(self, completed=True):
+        """Mark every matched todo complete (or not) in a single UPDATE."""
+        qn = connections[self.db].ops.quote_name
+        return self.exclude(completed=completed)._write_completed(f'{qn("completed")} = %s', [completed])
+
 
 class ToDo(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True)
     priority = models.PositiveSmallIntegerField(default=3, choices=[(1, 'High'), (2, 'Medium'), (3, 'Low')])
+    # Manual drag-and-drop order within a priority band. Kept apart from
+    # priority so reordering never rewrites a task's importance.
+    position = models.PositiveIntegerField(default=0)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     completed = models.BooleanField(default=False)
@@ -27,21 +243,214 @@ class ToDo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='todos', blank=True, null=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    # Set on the rows `manage.py materialize_recurrences` creates from a
+    # repeating todo (see recurrence.py).
+    occurrence_of = models.ForeignKey(
+        'Recurrence', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='occurrences',
+    )
+
+    objects = LiveManager.from_queryset(ToDoQuerySet)()
+    all_objects = ToDoQuerySet.as_manager()
+
+    def _stored_count_state(self):
+        # Read inside the caller's transaction, so a concurrent toggle between
+        # loading this instance and saving it cannot skew the counters.
+        return (ToDo.objects.select_for_update().filter(pk=self.pk)
+                .values_list('project_id', 'completed').first())
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        counted = update_fields is None or {'completed', 'project', 'project_id'} & set(update_fields)
+        with transaction.atomic():
+            old = None
+            if counted and not self._state.adding:
+                old = self._stored_count_state()
+                # Kept for receivers that must also reach the previous project.
+                self._previous_project_id = old and old[0]
+            super().save(*args, **kwargs)
+            if not counted:
+                return
+            deltas = Project.count_deltas([(self.project_id, self.completed)])
+            if old is not None:
+                for project_id, (total, done) in Project.count_deltas([old], sign=-1).items():
+                    new_total, new_done = deltas[project_id]
+                    deltas[project_id] = (new_total + total, new_done + done)
+            Project.adjust_counts(deltas)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            old = self._stored_count_state()
+            result = super().delete(*args, **kwargs)
+            if old is not None:
+                Project.adjust_counts(Project.count_deltas([old], sign=-1))
+        return result
+
+    def soft_delete(self):
+        """Tombstone this todo and take it out of its project's counters."""
+        with transaction.atomic():
+            old = self._stored_count_state()
+            if old is None:
+                return
+            self.deleted_at = timezone.now()
+            self.save(update_fields=['deleted_at', 'updated_at'])
+            Project.adjust_counts(Project.count_deltas([old], sign=-1))
+
+    def restore(self):
+        """Undo soft_delete(); returns False if the todo was not deleted."""
+        with transaction.atomic():
+            old = (ToDo.all_objects.select_for_update().filter(pk=self.pk, deleted_at__isnull=False)
+                   .values_list('project_id', 'completed').first())
+            if old is None:
+                return False
+            self.deleted_at = None
+            self.save(update_fields=['deleted_at', 'updated_at'])
+            Project.adjust_counts(Project.count_deltas([old]))
+        return True
 
     @property
     def is_overdue(self):
-        return not self.completed and self.due_date and timezone.now().date() > self.due_date
+        if 'overdue' in self.__dict__:
+            return self.overdue
+        return not self.completed and self.due_date and timezone.localdate() > self.due_date
         
     def mark_complete(self):
         self.completed = True
-        self.save()
+        self.save(update_fields=['completed', 'updated_at'])
     
     def mark_incomplete(self):
         self.completed = False
-        self.save()
+        self.save(update_fields=['completed', 'updated_at'])
     
     def __str__(self):
         return f"{self.name} ({self.get_priority_display()})"
     
     class Meta:
-        ordering = ['priority', 'due_date', 'created_at']
\ No newline at end of file
+        ordering = ['priority', 'position', 'due_date', 'created_at']
+        # Every index ends in the todo_list keyset ordering so SQLite can walk
+        # it in order instead of sorting (see pagination.ORDERING). They cover
+        # live rows only, so tombstones cost the list nothing.
+        indexes = [
+            models.Index(
+                fields=['user', 'priority', 'position', 'due_date', 'created_at', 'id'],
+                condition=LIVE,
+                name='todo_user_order_idx',
+            ),
+            models.Index(
+                fields=['user', 'completed', 'priority', 'position', 'due_date', 'created_at', 'id'],
+                condition=LIVE,
+                name='todo_user_status_order_idx',
+            ),
+            models.Index(
+                fields=['user', 'project', 'priority', 'position', 'due_date', 'created_at', 'id'],
+                condition=LIVE,
+                name='todo_user_project_order_idx',
+            ),
+            models.Index(
+                fields=['user', 'priority', 'position', 'due_date', 'created_at', 'id'],
+                condition=LIVE & Q(completed=False),
+                name='todo_user_open_order_idx',
+            ),
+            # Serves overdue(), due_within() and the agenda in due order.
+            models.Index(
+                fields=['user', 'due_date', 'priority', 'position', 'id'],
+                condition=LIVE & Q(completed=False),
+                name='todo_user_open_due_idx',
+            ),
+            # Lets purge_deleted find old tombstones without a table scan.
+            models.Index(
+                fields=['deleted_at'],
+                condition=Q(deleted_at__isnull=False),
+                name='todo_tombstone_idx',
+            ),
+            # The sync feed, tombstones included.
+            models.Index(fields=['user', 'change_seq'], name='todo_user_change_idx'),
+        ]
+        constraints = [
+            # One row per occurrence date, tombstones included, so a deleted
+            # occurrence is never materialized again.
+            models.UniqueConstraint(
+                fields=['occurrence_of', 'due_date'],
+                condition=Q(occurrence_of__isnull=False),
+                name='todo_occurrence_unique',
+            ),
+        ]
+
+
+class Recurrence(models.Model):
+    """
+    Repeats a todo. The todo is the template and the first occurrence, on its
+    due date. Later occurrences are computed from the rule (see recurrence.py).
+    ``manage.py materialize_recurrences`` copies the next few into real rows,
+    and ``materialized_through`` is the due date of the last one copied.
+    Occurrences beyond it exist only in memory.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    CRON = 'cron'
+    FREQUENCY_CHOICES = [(DAILY, 'Daily'), (WEEKLY, 'Weekly'), (MONTHLY, 'Monthly'), (CRON, 'Cron')]
+
+    todo = models.OneToOneField(ToDo, on_delete=models.CASCADE, related_name='recurrence')
+    # The template's user, so a user's rules are one index range, not a
+    # walk over all of their todos.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurrences', editable=False)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=WEEKLY)
+    # Every ``interval`` days, weeks or months; unused by cron rules.
+    interval = models.PositiveSmallIntegerField(default=1)
+    # Cron rules only: "day-of-month month day-of-week", e.g. "1,15 * *" or
+    # "* * 1-5". Occurrences are dates, so there are no time fields.
+    cron = models.CharField(max_length=100, blank=True)
+    until = models.DateField(null=True, blank=True)
+    materialized_through = models.DateField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} repeat of {self.todo_id}"
+
+
+class SyncSequence(models.Model):
+    """
+    The single-row counter behind ``change_seq``, which sync.py's triggers
+    bump on every todo and project write. ``purged_through`` is the highest
+    change_seq that purge_deleted has removed; older sync cursors may have
+    missed those deletions.
+    """
+    value = models.BigIntegerField(default=0)
+    purged_through = models.BigIntegerField(default=0)
+
+
+class Job(models.Model):
+    """A unit of background work, run by ``manage.py run_workers`` (see jobs.py)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # Progress while running, then the handler's return value.
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def report(self, **progress):
+        """Merge ``progress`` into ``result`` so pollers can follow a running job."""
+        self.result.update(progress)
+        Job.objects.filter(pk=self.pk).update(result=self.result)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job.
+            models.Index(fields=['status', 'id'], name='todo_job_queue_idx'),
+        ]
@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import F, Q
+
+# Keyset ordering for todo lists. ``id`` is the tiebreaker that makes every
+# position unique; NULL due dates sort first on every backend.
+ORDERING = (
+    'priority',
+    'position',
+    F('due_date').asc(nulls_first=True),
+    'created_at',
+    'id',
+)
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def pack_cursor(values):
+    """Encode a list of JSON-serializable sort values as an opaque string."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Inverse of ``pack_cursor``; raises ValueError on garbage input."""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    return json.loads(raw)
+
+
+def encode_cursor(todo):
+    """Return an opaque cursor pointing just after ``todo``."""
+    return pack_cursor([
+        todo.priority,
+        todo.position,
+        todo.due_date.isoformat() if todo.due_date else None,
+        todo.created_at.isoformat(),
+        todo.pk,
+    ])
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from ``encode_cursor``; return None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        priority, position, due_date, created_at, pk = unpack_cursor(cursor)
+        return (
+            int(priority),
+            int(position),
+            date.fromisoformat(due_date) if due_date else None,
+            datetime.fromisoformat(created_at),
+            int(pk),
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def after_cursor(key, pinned=()):
+    """
+    Q object matching rows that sort strictly after ``key`` in ORDERING.
+
+    Fields in ``pinned`` are already fixed by an equality filter; leaving them
+    out of the comparison keeps SQLite walking the index instead of sorting.
+    """
+    priority, position, due_date, created_at, pk = key
+    after = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+    if due_date is None:
+        after = Q(due_date__isnull=False) | (Q(due_date__isnull=True) & after)
+    else:
+        after = Q(due_date__gt=due_date) | (Q(due_date=due_date) & after)
+    after = Q(position__gt=position) | (Q(position=position) & after)
+    if 'priority' in pinned:
+        return after
+    return Q(priority__gt=priority) | (Q(priority=priority) & after)
+
+
+def keyset_query(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, pinned=()):
+    """The single query behind ``keyset_page``: ``page_size + 1`` rows after ``cursor``."""
+    key = decode_cursor(cursor)
+    queryset = queryset.order_by(*ORDERING)
+    if key is not None:
+        queryset = queryset.filter(after_cursor(key, pinned))
+    return queryset[:page_size + 1]
+
+
+def split_page(rows, page_size, make_cursor=encode_cursor):
+    """Drop the look-ahead row and build the next cursor from the last row kept."""
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, make_cursor(rows[-1])
+    return rows, None
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, pinned=()):
+    """
+    Fetch one page of ``queryset`` in a single query.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    rows = list(keyset_query(queryset, cursor, page_size, pinned))
+    return split_page(rows, page_size)
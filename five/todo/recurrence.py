@@ -0,0 +1,208 @@
+"""
+Repeating todos.
+
+A Recurrence turns its todo into a template. The template is the first
+occurrence, and ``dates_after`` yields the due dates after any given day.
+Daily, weekly and monthly rules jump straight to that day. Cron rules scan
+forward at most CRON_SEARCH_DAYS per date. So computing the next few
+occurrences costs the same whether a rule started last week or ten years ago.
+
+Only the next TODO_RECURRENCE_AHEAD occurrences are real ToDo rows, created
+by ``manage.py materialize_recurrences``. Anything further out is an unsaved
+ToDo from ``virtual_occurrences``, which todo_list and the agenda show but
+never store.
+"""
+import calendar
+from datetime import timedelta
+from itertools import count, islice
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .listing import DUE_SOON_DAYS
+from .models import Project, Recurrence, ToDo
+
+DEFAULT_AHEAD = 3
+DEFAULT_PREVIEW_DAYS = 14
+# The furthest a cron rule looks for its next date; beyond this it is done
+# (e.g. "31 2 *" never matches).
+CRON_SEARCH_DAYS = 366 * 8
+# Bounds per cron field: day of month, month, day of week (0 and 7 = Sunday).
+CRON_FIELDS = ((1, 31), (1, 12), (0, 7))
+# Template columns every occurrence copies.
+COPIED_FIELDS = ('user_id', 'project_id', 'name', 'description', 'priority', 'position')
+
+
+def parse_cron(expression):
+    """
+    ``(days, months, weekdays)`` sets, None for an unrestricted field,
+    from "day-of-month month day-of-week". Each field takes ``*``, numbers,
+    ``a-b`` ranges, ``/step`` and comma lists. Raises ValueError.
+    """
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError('Cron rules have three fields: day-of-month month day-of-week')
+    parsed = []
+    for field, (low, high) in zip(fields, CRON_FIELDS):
+        if field == '*':
+            parsed.append(None)
+            continue
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(bound) for bound in spec.split('-', 1))
+            else:
+                start = end = int(spec)
+            step = int(step) if step else 1
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f'{part!r} is out of range {low}-{high}')
+            values.update(range(start, end + 1, step))
+        parsed.append(values)
+    days, months, weekdays = parsed
+    if weekdays is not None:
+        weekdays = {weekday % 7 for weekday in weekdays}
+    return days, months, weekdays
+
+
+def _add_months(day, months, anchor_day):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def _cron_dates(rule, after):
+    days, months, weekdays = parse_cron(rule.cron)
+    day = after
+    while True:
+        for _ in range(CRON_SEARCH_DAYS):
+            day += timedelta(days=1)
+            if months is not None and day.month not in months:
+                continue
+            # Like cron: with both day fields restricted, either may match.
+            day_ok = days is None or day.day in days
+            weekday_ok = weekdays is None or day.isoweekday() % 7 in weekdays
+            if (day_ok and weekday_ok) if days is None or weekdays is None else (day_ok or weekday_ok):
+                yield day
+                break
+        else:
+            return
+
+
+def dates_after(rule, start, after):
+    """Occurrence dates of ``rule`` after ``after``, for a template due on ``start``."""
+    after = max(after, start)
+    if rule.frequency == Recurrence.CRON:
+        dates = _cron_dates(rule, after)
+    elif rule.frequency == Recurrence.MONTHLY:
+        months = (after.year - start.year) * 12 + after.month - start.month
+        step = (months // rule.interval) * rule.interval
+        dates = (_add_months(start, step + rule.interval * k, start.day) for k in count())
+    else:
+        step = rule.interval * (7 if rule.frequency == Recurrence.WEEKLY else 1)
+        first = (after - start).days // step + 1
+        dates = (start + timedelta(days=step * k) for k in count(first))
+    for day in dates:
+        if rule.until and day > rule.until:
+            return
+        if day > after:
+            yield day
+
+
+def occurrence(template, rule, due_date):
+    """An unsaved ToDo for ``template``'s occurrence on ``due_date``."""
+    todo = ToDo(due_date=due_date, occurrence_of=rule)
+    for field in COPIED_FIELDS:
+        setattr(todo, field, getattr(template, field))
+    if template.project_id:
+        todo.project = template.project
+    return todo
+
+
+def active_rules(user=None):
+    """Rules whose template is live and dated, with the template loaded."""
+    rules = Recurrence.objects.select_related('todo', 'todo__project').filter(
+        todo__deleted_at__isnull=True, todo__due_date__isnull=False,
+    )
+    return rules.filter(user=user) if user is not None else rules
+
+
+def virtual_occurrences(rules, after, through):
+    """
+    Unsaved occurrences of ``rules`` due after ``after`` and after what is
+    materialized, up to and including ``through``, in due order.
+    """
+    upcoming = []
+    for rule in rules:
+        template = rule.todo
+        start = max(after, rule.materialized_through or template.due_date)
+        for day in dates_after(rule, template.due_date, start):
+            if day > through:
+                break
+            upcoming.append(occurrence(template, rule, day))
+    upcoming.sort(key=lambda todo: (todo.due_date, todo.priority, todo.position))
+    return upcoming
+
+
+def preview_rules(user, params):
+    """
+    The rules whose upcoming occurrences todo_list shows for these request
+    parameters, or None when the page shows none: later pages, searches, and
+    the completed and overdue filters.
+    """
+    if params.get('after') or params.get('q') or params.get('status') in ('completed', 'overdue'):
+        return None
+    rules = active_rules(user)
+    try:
+        if params.get('project'):
+            rules = rules.filter(todo__project_id=int(params['project']))
+    except (ValueError, TypeError):
+        pass
+    if params.get('priority'):
+        rules = rules.filter(todo__priority=params['priority'])
+    return rules
+
+
+def preview(rules, params, today):
+    """Virtual occurrences from today on, over the preview window or the due-this-week filter's."""
+    days = DUE_SOON_DAYS if params.get('status') == 'due_week' else preview_days()
+    return virtual_occurrences(rules, today - timedelta(days=1), today + timedelta(days=days))
+
+
+def materialize(rule_ids, today, ahead):
+    """
+    Create rows for the next ``ahead`` occurrences from ``today`` on that are
+    not rows yet, for every rule in ``rule_ids``, with one bulk_create. Past
+    occurrences are not backfilled. Returns the new rows.
+    """
+    with transaction.atomic():
+        # Re-read under the write lock so concurrent runs do not both insert.
+        rules = list(active_rules().select_for_update(of=('self',)).filter(pk__in=rule_ids))
+        todos, advanced = [], []
+        for rule in rules:
+            template = rule.todo
+            done_through = rule.materialized_through or template.due_date
+            upcoming = islice(dates_after(rule, template.due_date, today - timedelta(days=1)), ahead)
+            new = [occurrence(template, rule, day) for day in upcoming if day > done_through]
+            if new:
+                todos += new
+                rule.materialized_through = new[-1].due_date
+                advanced.append(rule)
+        if not todos:
+            return []
+        ToDo.objects.bulk_create(todos)
+        Project.adjust_counts(Project.count_deltas((todo.project_id, False) for todo in todos))
+        Recurrence.objects.bulk_update(advanced, ['materialized_through'])
+        caching.bump_all_list_versions({todo.user_id for todo in todos})
+    return todos
+
+
+def ahead():
+    return getattr(settings, 'TODO_RECURRENCE_AHEAD', DEFAULT_AHEAD)
+
+
+def preview_days():
+    return getattr(settings, 'TODO_RECURRENCE_PREVIEW_DAYS', DEFAULT_PREVIEW_DAYS)
@@ -0,0 +1,132 @@
+import re
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+from .pagination import (
+    DEFAULT_PAGE_SIZE, encode_cursor, keyset_query, pack_cursor, split_page, unpack_cursor,
+)
+
+# External-content FTS5 index over ToDo.name/description. It is created by
+# migration 0006 and kept in sync by triggers, so bulk_create(), update() and
+# raw SQL writes are indexed too.
+FTS_TABLE = 'todo_todo_fts'
+
+# SQLite drops a table's triggers whenever a migration rebuilds todo_todo
+# (AddField, AlterField, ...), so these are reinstalled after every migrate.
+TRIGGER_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, description ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# bm25() column weights: a hit in the name counts ten times a description hit.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so user input can never be parsed
+    as FTS syntax and "mil" finds "milk". Terms are ANDed together.
+    """
+    return ' '.join(f'"{term}"*' for term in TERM_RE.findall(query))
+
+
+def install_triggers(using='default', **kwargs):
+    """post_migrate receiver: make sure the sync triggers survived the migration."""
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or FTS_TABLE not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        for statement in TRIGGER_SQL:
+            cursor.execute(statement)
+
+
+def rebuild_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_todos(queryset, query):
+    """Filter ``queryset`` to todos matching ``query``, without ranking."""
+    expression = match_expression(query)
+    if not fts_enabled() or not expression:
+        return queryset.filter(name__icontains=query)
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression],
+    ))
+
+
+def search_cursor(todo):
+    return pack_cursor([todo.search_rank, todo.pk])
+
+
+def search_query(queryset, query, cursor=None, page_size=DEFAULT_PAGE_SIZE, pinned=()):
+    """
+    The single query behind ``search_page``.
+
+    Returns ``(queryset, make_cursor)``; the queryset holds ``page_size + 1``
+    rows so the caller can tell whether another page follows.
+    """
+    expression = match_expression(query)
+    if not fts_enabled() or not expression:
+        queryset = keyset_query(queryset.filter(name__icontains=query), cursor, page_size, pinned)
+        return queryset, encode_cursor
+
+    # Join the FTS table rather than ranking through a correlated subquery:
+    # a subquery re-runs MATCH for every matching row, which is quadratic in
+    # the number of hits (seconds at 100k todos; see benchmark_views).
+    rank_sql = f'bm25({FTS_TABLE}, %s, %s)'
+    rank_params = [NAME_WEIGHT, DESCRIPTION_WEIGHT]
+    where = [f'{FTS_TABLE}.rowid = "todo_todo"."id"', f'{FTS_TABLE} MATCH %s']
+    params = [expression]
+    if cursor:
+        try:
+            rank, pk = unpack_cursor(cursor)
+            params += [*rank_params, float(rank), *rank_params, float(rank), int(pk)]
+            where.append(f'({rank_sql} > %s OR ({rank_sql} = %s AND "todo_todo"."id" > %s))')
+        except (ValueError, TypeError):
+            pass
+    queryset = queryset.extra(
+        select={'search_rank': rank_sql}, select_params=rank_params,
+        tables=[FTS_TABLE], where=where, params=params,
+    ).order_by('search_rank', 'id')
+    return queryset[:page_size + 1], search_cursor
+
+
+def search_page(queryset, query, cursor=None, page_size=DEFAULT_PAGE_SIZE, pinned=()):
+    """
+    Fetch one page of todos matching ``query``, best matches first.
+
+    Falls back to the name__icontains filter and the regular todo_list ordering
+    on backends without FTS5. Returns ``(rows, next_cursor)`` like
+    ``pagination.keyset_page``.
+    """
+    queryset, make_cursor = search_query(queryset, query, cursor, page_size, pinned)
+    return split_page(list(queryset), page_size, make_cursor)
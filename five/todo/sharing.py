@@ -0,0 +1,149 @@
+"""
+Shared projects.
+
+``Project.user`` is the owner. Sharing a project adds Membership rows: one
+OWNER row for the owner and one per member, so every project shared with a
+user, their own shared ones included, is one range of
+``todo_membership_user_idx``. Unshared projects have no rows.
+
+Permission checks never loop in Python. The helpers here return querysets
+whose filter carries the membership lookup as a subquery, so a view resolves
+"may this user see/change this todo" in the same single query that fetches
+(or updates) it. Viewers can see a shared project's todos; owners and editors
+can also change them. Only the owner deletes or shares a project.
+
+Deleting a project tombstones it at once but leaves its todos to a job
+(see jobs.delete_projects). Every todo queryset here carries LIVE_PROJECT,
+so those todos are gone from lists and locked against changes meanwhile.
+"""
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+
+from . import caching
+from .models import Membership, Project, ToDo
+
+WRITE_ROLES = (Membership.OWNER, Membership.EDITOR)
+
+# Todos with no project or a live one; a LEFT JOIN probing the project's pk.
+LIVE_PROJECT = Q(project__isnull=True) | Q(project__deleted_at__isnull=True)
+
+
+def shared_project_ids(user, roles=None):
+    """Subquery of the projects shared with ``user``, optionally only in ``roles``."""
+    memberships = Membership.objects.filter(user=user)
+    if roles is not None:
+        memberships = memberships.filter(role__in=roles)
+    return memberships.values('project_id')
+
+
+def visible_projects(user):
+    """
+    Projects ``user`` owns or is a member of, annotated with ``shared``
+    (True when the project has members). Callers that go on to list todos
+    can skip the membership lookup when no project is shared.
+    """
+    member_of = Q(pk__in=shared_project_ids(user))
+    return Project.objects.filter(Q(user=user) | member_of).annotate(
+        shared=ExpressionWrapper(member_of, output_field=BooleanField()),
+    )
+
+
+def own_todos(user):
+    """Todos ``user`` wrote, outside of deleted projects."""
+    return ToDo.objects.filter(LIVE_PROJECT, user=user)
+
+
+def visible_todos(user, shared=True):
+    """
+    Todos ``user`` may see: their own plus every todo in a project shared
+    with them. With ``shared=False`` (the caller knows there are no shared
+    projects) it is the plain per-user filter, which keeps the keyset index
+    walk for users who never share.
+    """
+    if not shared:
+        return own_todos(user)
+    return ToDo.objects.filter(Q(user=user) | Q(project_id__in=shared_project_ids(user)), LIVE_PROJECT)
+
+
+def todo_parts(user):
+    """
+    ``visible_todos(user)`` as two disjoint querysets, the user's own todos
+    and other people's in shared projects, for ``listing.page_query``.
+    Each is a single index range, so a page comes from each without sorting
+    all of the user's todos.
+    """
+    return (own_todos(user),
+            ToDo.objects.filter(LIVE_PROJECT, project_id__in=shared_project_ids(user)).exclude(user=user))
+
+
+def editable_todos(user):
+    """Todos ``user`` may change: their own plus those in projects they own or edit."""
+    return ToDo.objects.filter(Q(user=user) | Q(project_id__in=shared_project_ids(user, WRITE_ROLES)), LIVE_PROJECT)
+
+
+def editable_projects(user):
+    """Projects ``user`` may add todos to."""
+    return Project.objects.filter(Q(user=user) | Q(pk__in=shared_project_ids(user, WRITE_ROLES)))
+
+
+def members(project_ids):
+    """User ids of everyone with a Membership in any of ``project_ids``."""
+    project_ids = [pk for pk in project_ids if pk is not None]
+    if not project_ids:
+        return set()
+    return set(Membership.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True))
+
+
+def bump_members(project_ids, user_ids=()):
+    """Retire the cached todo_list of ``user_ids`` and of every member of ``project_ids``."""
+    caching.bump_all_list_versions(members(project_ids) | {pk for pk in user_ids if pk is not None})
+
+
+def invalidate_for_todo(sender, instance, **kwargs):
+    """
+    post_save/post_delete receiver for ToDo: retire the members' cached lists
+    for the todo's project and, after a move, its previous one. caching
+    already bumps the author.
+    """
+    project_ids = {instance.project_id, getattr(instance, '_previous_project_id', None)} - {None}
+    if project_ids:
+        caching.bump_all_list_versions(members(project_ids) - {instance.user_id})
+
+
+def invalidate_for_project(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Project: the owner and every member."""
+    bump_members([instance.pk], [instance.user_id])
+
+
+def share(project, user, role=Membership.EDITOR):
+    """
+    Give ``user`` ``role`` on ``project`` (updating an existing membership)
+    and return the Membership. The first share also records the owner.
+    """
+    if user.pk == project.user_id:
+        raise ValueError('The owner already has access to the project')
+    if role not in dict(Membership.ROLE_CHOICES) or role == Membership.OWNER:
+        raise ValueError(f'Cannot share a project as {role!r}')
+    with transaction.atomic():
+        Membership.objects.get_or_create(project=project, user_id=project.user_id,
+                                         defaults={'role': Membership.OWNER})
+        membership, _ = Membership.objects.update_or_create(project=project, user=user, defaults={'role': role})
+    caching.bump_all_list_versions(members([project.pk]))
+    return membership
+
+
+def unshare(project, user_id):
+    """
+    Take ``user_id`` off ``project``; returns False if they were not a member.
+    Removing the last member drops the owner row too, so the project is
+    unshared again.
+    """
+    with transaction.atomic():
+        removed, _ = (Membership.objects.filter(project=project, user_id=user_id)
+                      .exclude(role=Membership.OWNER).delete())
+        if not removed:
+            return False
+        if not Membership.objects.filter(project=project).exclude(role=Membership.OWNER).exists():
+            Membership.objects.filter(project=project).delete()
+    caching.bump_all_list_versions(members([project.pk]) | {user_id, project.user_id})
+    return True
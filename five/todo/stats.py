@@ -0,0 +1,74 @@
+"""
+Dashboard statistics.
+
+Everything the dashboard shows comes from two queries. The projects query
+reads the denormalized ``todo_count``/``completed_count`` counters, so no
+per-project COUNT runs. The todos query is one ``aggregate()`` of
+conditional ``Count(filter=Q(...))`` columns. The result is cached per user
+under their todo_list version stamp, which every write (a shared project
+member's included) bumps. A repeat visit therefore costs a cache read until
+something changes, or until midnight moves the overdue line.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import caching, sharing
+from .listing import DUE_SOON_DAYS, PRIORITY_LABELS, STATUS_FILTERS
+
+STATS_KEY = 'todo:stats:{user_id}:{version}:{today}'
+
+
+def percent(done, total):
+    return int(done / total * 100) if total else 0
+
+
+def compute(user, today):
+    """The dashboard numbers for ``user`` as of ``today``, in two queries."""
+    projects = list(sharing.visible_projects(user).order_by('name', 'id')
+                    .values('id', 'name', 'todo_count', 'completed_count', 'shared'))
+    is_open = Q(completed=False)
+    columns = {
+        'total': Count('pk'),
+        'done': Count('pk', filter=Q(completed=True)),
+        'overdue': Count('pk', filter=is_open & Q(due_date__lt=today)),
+        'due_week': Count('pk', filter=is_open & Q(due_date__range=(today, today + timedelta(days=DUE_SOON_DAYS)))),
+    }
+    for priority in PRIORITY_LABELS:
+        columns[f'priority_{priority}'] = Count('pk', filter=Q(priority=priority))
+        columns[f'priority_{priority}_open'] = Count('pk', filter=is_open & Q(priority=priority))
+    counts = (sharing.visible_todos(user, any(project['shared'] for project in projects))
+              .aggregate(**columns))
+
+    status = {'completed': counts['done'], 'incomplete': counts['total'] - counts['done'],
+              'overdue': counts['overdue'], 'due_week': counts['due_week']}
+    return {
+        'today': today.isoformat(),
+        'total': counts['total'],
+        'completion_percent': percent(counts['done'], counts['total']),
+        'status': [{'status': key, 'label': label, 'count': status[key]} for key, label in STATUS_FILTERS],
+        'priority': [
+            {'priority': priority, 'label': label,
+             'total': counts[f'priority_{priority}'], 'open': counts[f'priority_{priority}_open']}
+            for priority, label in PRIORITY_LABELS.items()
+        ],
+        'projects': [
+            {'id': project['id'], 'name': project['name'], 'shared': project['shared'],
+             'total': project['todo_count'], 'completed': project['completed_count'],
+             'completion_percent': percent(project['completed_count'], project['todo_count'])}
+            for project in projects
+        ],
+    }
+
+
+def user_stats(user):
+    """``compute()`` for ``user``, served from the cache while their version stamp holds."""
+    today = timezone.localdate()
+    key = STATS_KEY.format(user_id=user.pk, version=caching.list_version(user.pk), today=today)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute(user, today)
+        cache.set(key, stats, caching.fragment_timeout())
+    return stats
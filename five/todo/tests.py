@@ -1,9 +1,32 @@
-from django.test import TestCase
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.utils import timezone
+import asyncio
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 from datetime import timedelta, date
-from .models import ToDo, Project
+from io import StringIO
+from itertools import islice, product
+from unittest import mock
+from .models import Job, Membership, Project, Recurrence, ToDo
+from . import auth, benchmarks, caching, hashers, jobs, live, metrics, recurrence, sharing, sync, throttle, views
+from .listing import display_rows
+from .pagination import ORDERING, encode_cursor
+from .urls import build_urlpatterns
 
 class ToDoTests(TestCase):
     def setUp(self):
@@ -152,11 +175,1851 @@ class ToDoProjectFilterTests(TestCase):
     def test_filter_by_project(self):
         response = self.client.get(reverse("todo_list"), {"project": self.project_a.id})
         todos = response.context["todos"]
-        self.assertEqual(todos.count(), 1)
-        self.assertEqual(todos.first().project, self.project_a)
+        self.assertEqual(len(todos), 1)
+        self.assertEqual(todos[0].project, self.project_a)
         
     def test_delete_project(self):
         project = Project.objects.create(user=self.user, name="Temp Project")
         response = self.client.post(reverse("project_delete", args=[project.id]))
         self.assertEqual(response.status_code, 302)
-        self.assertFalse(Project.objects.filter(id=project.id).exists())
\ No newline at end of file
+        self.assertFalse(Project.objects.filter(id=project.id).exists())
+
+
+@override_settings(TODO_PAGE_SIZE=5)
+class ToDoListPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="pager", password="secret123")
+        self.client.login(username="pager", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Bulk")
+        today = timezone.now().date()
+        for i in range(12):
+            ToDo.objects.create(
+                user=self.user,
+                name=f"Task {i}",
+                priority=(i % 3) + 1,
+                due_date=None if i % 4 == 0 else today + timedelta(days=i % 5),
+                project=self.project,
+            )
+
+    def test_pages_cover_every_todo_once_in_order(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"after": cursor} if cursor else {}
+            response = self.client.get(reverse("todo_list"), params)
+            seen.extend(todo.id for todo in response.context["todos"])
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+        expected = list(ToDo.objects.filter(user=self.user).order_by(*ORDERING).values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_has_constant_query_count(self):
+        # session, user, projects, todos page, repeating todos
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("todo_list"))
+        self.assertContains(response, "(Bulk)")
+        self.assertEqual(len(response.context["todos"]), 5)
+
+    def test_next_link_keeps_filters(self):
+        response = self.client.get(reverse("todo_list"), {"project": self.project.id})
+        self.assertContains(response, f"project={self.project.id}&amp;after=")
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse("todo_list"), {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["todos"]), 5)
+
+
+class ToDoQueryPlanTests(TestCase):
+    """todo_list must be served from an index for every filter combination"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="planner", password="secret123")
+        self.client.login(username="planner", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Plans")
+        todo = ToDo.objects.create(user=self.user, name="Plan", project=self.project)
+        self.cursor = encode_cursor(todo)
+
+    def todo_plan(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("todo_list"), params)
+        sql = next(q["sql"] for q in ctx.captured_queries if 'FROM "todo_todo"' in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_every_filter_combination_uses_an_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+        options = {
+            "q": [None, "plan"],
+            "project": [None, self.project.id],
+            "priority": [None, 1],
+            "status": [None, "completed", "incomplete", "overdue", "due_week"],
+            "after": [None, self.cursor],
+        }
+        for values in product(*options.values()):
+            params = {k: v for k, v in zip(options, values) if v is not None}
+            with self.subTest(**params):
+                plan = self.todo_plan(params)
+                bad = [step for step in plan if step.startswith("SCAN todo_todo ") or step == "SCAN todo_todo"]
+                # Search results are ranked by bm25, and overdue/due-this-week
+                # read a due_date range from todo_user_open_due_idx, so sorting
+                # just those matches is expected.
+                if "q" not in params and params.get("status") not in ("overdue", "due_week"):
+                    bad += [step for step in plan if "TEMP B-TREE" in step]
+                self.assertFalse(bad, plan)
+
+
+class ToDoRowRenderingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="renderer", password="secret123")
+        self.client.login(username="renderer", password="secret123")
+        project = Project.objects.create(user=self.user, name="Garden")
+        self.late = ToDo.objects.create(
+            user=self.user, project=project, name="Weed <beds>", priority=1,
+            description=" ".join(f"word{i}" for i in range(30)), due_date=date(2020, 3, 1),
+        )
+        self.done = ToDo.objects.create(user=self.user, name="Water", priority=2, completed=True)
+
+    def test_rows_match_the_model(self):
+        todos = ToDo.objects.select_related("project").with_overdue().order_by("pk")
+        late, done = display_rows(todos)
+        self.assertTrue(late["description"].endswith("word19 …"))
+        self.assertEqual((late["due"], late["overdue"], late["project"]), ("Mar 01, 2020", True, "Garden"))
+        self.assertEqual((late["priority"], late["priority_badge"]), ("High", "bg-danger"))
+        self.assertEqual(late["edit_url"], reverse("todo_edit", args=[self.late.pk]))
+        self.assertEqual(late["delete_url"], reverse("todo_delete", args=[self.late.pk]))
+        self.assertEqual((done["priority"], done["due"], done["project"], done["overdue"]), ("Medium", "", "", False))
+
+        response = self.client.get(reverse("todo_list"))
+        self.assertContains(response, "Weed &lt;beds&gt;")
+        self.assertContains(response, '<span class="badge bg-warning text-dark">', html=False)
+        self.assertContains(response, f'href="{reverse("todo_delete", args=[self.done.pk])}"')
+
+    def test_production_template_profile(self):
+        templates = [{**settings.TEMPLATES[0], "APP_DIRS": False, "OPTIONS": {
+            **settings.TEMPLATES[0]["OPTIONS"],
+            "loaders": [("django.template.loaders.cached.Loader", ["django.template.loaders.app_directories.Loader"])],
+        }}]
+        with override_settings(TEMPLATES=templates):
+            for _ in range(2):
+                cache.clear()
+                self.assertContains(self.client.get(reverse("todo_list")), "Weed &lt;beds&gt;")
+
+
+class ToDoDueDateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="scheduler", password="secret123")
+        self.client.login(username="scheduler", password="secret123")
+        today = timezone.localdate()
+        self.today = today
+        make = lambda name, days, **kw: ToDo.objects.create(
+            user=self.user, name=name, due_date=today + timedelta(days=days) if days is not None else None, **kw,
+        )
+        self.late = make("Late", -3)
+        self.done_late = make("Done late", -1, completed=True)
+        self.today_todo = make("Today", 0)
+        self.soon = make("Soon", 5)
+        self.later = make("Later", 30)
+        self.undated = make("Undated", None)
+
+    def test_manager_methods(self):
+        self.assertEqual([t.name for t in ToDo.objects.overdue()], ["Late"])
+        self.assertEqual({t.name for t in ToDo.objects.due_within(7)}, {"Today", "Soon"})
+        flags = {t.name: t.is_overdue for t in ToDo.objects.with_overdue()}
+        self.assertEqual([name for name, overdue in flags.items() if overdue], ["Late"])
+
+    def test_status_filters(self):
+        response = self.client.get(reverse("todo_list"), {"status": "overdue"})
+        self.assertEqual([t.name for t in response.context["todos"]], ["Late"])
+        response = self.client.get(reverse("todo_list"), {"status": "due_week"})
+        self.assertEqual({t.name for t in response.context["todos"]}, {"Today", "Soon"})
+
+    def test_agenda_groups_by_day_in_constant_queries(self):
+        self.client.get(reverse("api_agenda"))
+        # session, user, todos, repeating todos
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse("api_agenda")).json()
+        self.assertEqual(data["today"], self.today.isoformat())
+        self.assertEqual([t["name"] for t in data["overdue"]], ["Late"])
+        self.assertEqual(len(data["days"]), 8)
+        self.assertEqual([t["name"] for t in data["days"][0]["todos"]], ["Today"])
+        self.assertEqual([t["name"] for t in data["days"][5]["todos"]], ["Soon"])
+
+        for i in range(20):
+            ToDo.objects.create(user=self.user, name=f"Extra {i}", due_date=self.today + timedelta(days=i % 7))
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse("api_agenda"), {"days": 40}).json()
+        self.assertEqual(sum(len(day["todos"]) for day in data["days"]), 23)
+        self.assertEqual(self.client.get(reverse("api_agenda"), {"days": "x"}).status_code, 400)
+
+    def test_agenda_uses_due_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+        from .api import agenda_query
+        sql, params = agenda_query(self.user, self.today, 7).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(any("todo_user_open_due_idx" in step for step in plan), plan)
+        self.assertFalse([step for step in plan if "TEMP B-TREE" in step], plan)
+
+
+class RecurrenceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chores", password="secret123")
+        self.client.login(username="chores", password="secret123")
+        self.today = timezone.localdate()
+        self.project = Project.objects.create(user=self.user, name="House")
+
+    def repeat(self, due_date, **rule):
+        todo = ToDo.objects.create(user=self.user, project=self.project, name="Bins", due_date=due_date)
+        return Recurrence.objects.create(todo=todo, user=self.user, **rule)
+
+    def dates(self, rule, after, count=4):
+        return list(islice(recurrence.dates_after(rule, rule.todo.due_date, after), count))
+
+    def test_dates_after(self):
+        start = date(2024, 1, 31)
+        weekly = self.repeat(start, frequency=Recurrence.WEEKLY, interval=2)
+        self.assertEqual(self.dates(weekly, start, 2), [date(2024, 2, 14), date(2024, 2, 28)])
+        # Ten years on, the next dates are computed directly, not by stepping.
+        self.assertEqual(self.dates(weekly, date(2034, 1, 1), 1), [date(2034, 1, 4)])
+        monthly = self.repeat(start, frequency=Recurrence.MONTHLY)
+        self.assertEqual(self.dates(monthly, start, 3), [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        daily = self.repeat(start, frequency=Recurrence.DAILY, interval=3, until=date(2024, 2, 9))
+        self.assertEqual(self.dates(daily, start), [date(2024, 2, 3), date(2024, 2, 6), date(2024, 2, 9)])
+        weekdays = self.repeat(start, frequency=Recurrence.CRON, cron="* * 1-5")
+        self.assertEqual(self.dates(weekdays, date(2024, 2, 2), 2), [date(2024, 2, 5), date(2024, 2, 6)])
+        # Both day fields restricted: either matches, as in cron.
+        either = self.repeat(start, frequency=Recurrence.CRON, cron="1 * 0")
+        self.assertEqual(self.dates(either, start, 2), [date(2024, 2, 1), date(2024, 2, 4)])
+        never = self.repeat(start, frequency=Recurrence.CRON, cron="31 2 *")
+        self.assertEqual(self.dates(never, start), [])
+        for bad in ("* *", "0 * *", "* 13 *", "* * 8", "5-1 * *", "*/0 * *", "x * *"):
+            with self.assertRaises(ValueError):
+                recurrence.parse_cron(bad)
+
+    def test_materialize_next_occurrences_only(self):
+        rule = self.repeat(self.today - timedelta(days=10), frequency=Recurrence.DAILY)
+        out = StringIO()
+        call_command("materialize_recurrences", "--ahead", "3", stdout=out)
+        self.assertIn("Created 3 occurrence(s).", out.getvalue())
+        occurrences = ToDo.objects.filter(occurrence_of=rule).order_by("due_date")
+        self.assertEqual([t.due_date for t in occurrences], [self.today + timedelta(days=i) for i in range(3)])
+        self.assertEqual({(t.name, t.project_id) for t in occurrences}, {("Bins", self.project.pk)})
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.todo_count, 4)
+
+        # Already materialized, and a deleted occurrence is not recreated.
+        occurrences[0].soft_delete()
+        call_command("materialize_recurrences", "--ahead", "3", stdout=out)
+        self.assertIn("Created 0 occurrence(s).", out.getvalue())
+        call_command("materialize_recurrences", "--ahead", "5", stdout=out)
+        self.assertEqual(ToDo.all_objects.filter(occurrence_of=rule).count(), 5)
+
+    def test_list_and_agenda_show_virtual_occurrences(self):
+        rule = self.repeat(self.today, frequency=Recurrence.WEEKLY)
+        call_command("materialize_recurrences", "--ahead", "1", stdout=StringIO())
+        response = self.client.get(reverse("todo_list"))
+        # Today's template and next week's row are real; the week after is previewed.
+        self.assertEqual(len(response.context["todos"]), 2)
+        self.assertEqual([t.due_date for t in response.context["upcoming"]], [self.today + timedelta(days=14)])
+        self.assertContains(response, "Coming up")
+        self.assertEqual(self.client.get(reverse("todo_list"), {"status": "completed"}).context["upcoming"], [])
+
+        days = self.client.get(reverse("api_agenda"), {"days": 21}).json()["days"]
+        entries = [(day["date"], todo["virtual"] if "virtual" in todo else False)
+                   for day in days for todo in day["todos"]]
+        expected = [(self.today + timedelta(days=offset)).isoformat() for offset in (0, 7, 14, 21)]
+        self.assertEqual(entries, list(zip(expected, [False, False, True, True])))
+        self.assertEqual(days[14]["todos"][0]["recurrence"], rule.pk)
+
+    def test_create_repeating_todo(self):
+        data = {"name": "Water plants", "priority": 2, "repeat-frequency": "cron", "repeat-cron": "* * 9"}
+        response = self.client.post(reverse("todo_create"), {**data, "due_date": self.today.isoformat()})
+        self.assertFormError(response.context["repeat_form"], "cron", "'9' is out of range 0-7")
+        response = self.client.post(reverse("todo_create"), {**data, "repeat-cron": "* * 6"})
+        self.assertFormError(response.context["form"], "due_date", "Repeating todos need a due date.")
+        response = self.client.post(reverse("todo_create"), {**data, "repeat-cron": "* * 6",
+                                                             "due_date": self.today.isoformat()})
+        self.assertRedirects(response, reverse("todo_list"))
+        todo = ToDo.objects.get(name="Water plants")
+        self.assertEqual((todo.recurrence.cron, todo.recurrence.interval, todo.recurrence.user), ("* * 6", 1, self.user))
+
+        response = self.client.post(reverse("todo_edit", args=[todo.pk]), {
+            "name": "Water plants", "priority": 2, "due_date": self.today.isoformat(), "repeat-frequency": "",
+        })
+        self.assertRedirects(response, reverse("todo_list"))
+        self.assertFalse(Recurrence.objects.exists())
+
+    def test_purge_deleted_template(self):
+        rule = self.repeat(self.today, frequency=Recurrence.DAILY)
+        [occurrence] = recurrence.materialize([rule.pk], self.today, 1)
+        rule.todo.soft_delete()
+        ToDo.all_objects.filter(pk=rule.todo.pk).update(deleted_at=timezone.now() - timedelta(days=60))
+        out = StringIO()
+        call_command("purge_deleted", "--sleep", "0", stdout=out)
+        self.assertIn("Purged 1 todo(s)", out.getvalue())
+        self.assertFalse(Recurrence.objects.exists())
+        occurrence.refresh_from_db()
+        self.assertIsNone(occurrence.occurrence_of_id)
+
+
+class ToDoSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="searcher", password="secret123")
+        self.client.login(username="searcher", password="secret123")
+        self.in_name = ToDo.objects.create(user=self.user, name="Buy milk")
+        self.in_description = ToDo.objects.create(user=self.user, name="Groceries", description="eggs and milk")
+        ToDo.objects.create(user=self.user, name="Walk the dog")
+        other = User.objects.create_user(username="other", password="secret123")
+        ToDo.objects.create(user=other, name="Milk the cow")
+
+    def search(self, q, **params):
+        response = self.client.get(reverse("todo_list"), {"q": q, **params})
+        return [todo.name for todo in response.context["todos"]]
+
+    def test_matches_description_and_ranks_name_hits_first(self):
+        self.assertEqual(self.search("milk"), ["Buy milk", "Groceries"])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search("gro"), ["Groceries"])
+
+    def test_fts_syntax_in_query_is_treated_as_text(self):
+        self.assertEqual(self.search('milk" OR "dog'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.in_name.name = "Buy bread"
+        self.in_name.save()
+        self.in_description.delete()
+        self.assertEqual(self.search("milk"), [])
+        self.assertEqual(self.search("bread"), ["Buy bread"])
+
+    @override_settings(TODO_PAGE_SIZE=1)
+    def test_ranked_results_paginate(self):
+        response = self.client.get(reverse("todo_list"), {"q": "milk"})
+        self.assertEqual([t.name for t in response.context["todos"]], ["Buy milk"])
+        cursor = response.context["next_cursor"]
+        self.assertEqual(self.search("milk", after=cursor), ["Groceries"])
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO todo_todo_fts(todo_todo_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search("milk"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("milk"), ["Buy milk", "Groceries"])
+
+
+class ReorderToDoTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="sorter", password="secret123")
+        self.client.login(username="sorter", password="secret123")
+        self.todos = [ToDo.objects.create(user=self.user, name=f"Task {i}", priority=2) for i in range(4)]
+
+    def names(self):
+        response = self.client.get(reverse("todo_list"))
+        return [todo.name for todo in response.context["todos"]]
+
+    def post_json(self, payload):
+        return self.client.post(reverse("reorder_todos"), json.dumps(payload), content_type="application/json")
+
+    def test_full_order_in_one_statement_keeps_priority(self):
+        order = [t.id for t in reversed(self.todos)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_json({"order": order})
+        self.assertEqual(response.json(), {"success": True, "updated": 4})
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.names(), ["Task 3", "Task 2", "Task 1", "Task 0"])
+        self.assertEqual(set(ToDo.objects.values_list("priority", flat=True)), {2})
+
+    def test_legacy_form_order(self):
+        order = [self.todos[1].id, self.todos[0].id, self.todos[2].id, self.todos[3].id]
+        response = self.client.post(reverse("reorder_todos"), {"order[]": order})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(), ["Task 1", "Task 0", "Task 2", "Task 3"])
+
+    def test_sparse_move_touches_only_moved_item(self):
+        self.post_json({"order": [t.id for t in self.todos]})
+        before = dict(ToDo.objects.values_list("id", "updated_at"))
+        moved = self.todos[3]
+        self.post_json({"moves": [{"id": moved.id, "position": 512}]})
+        self.assertEqual(self.names(), ["Task 0", "Task 3", "Task 1", "Task 2"])
+        after = dict(ToDo.objects.values_list("id", "updated_at"))
+        self.assertEqual([pk for pk in after if after[pk] != before[pk]], [moved.id])
+
+    def test_foreign_todo_rejects_whole_request(self):
+        other = User.objects.create_user(username="intruder", password="secret123")
+        theirs = ToDo.objects.create(user=other, name="Not yours")
+        response = self.post_json({"order": [self.todos[0].id, theirs.id]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(set(ToDo.objects.values_list("position", flat=True)), {0})
+
+    def test_malformed_body(self):
+        response = self.client.post(reverse("reorder_todos"), "{nope", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_large_reorder_is_one_update_per_batch_within_budget(self):
+        ToDo.objects.bulk_create(ToDo(user=self.user, name=f"Bulk {i}", priority=3) for i in range(996))
+        order = list(ToDo.objects.order_by("-id").values_list("id", flat=True))
+        self.assertEqual(len(order), 1000)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_json({"order": order})
+        self.assertEqual(response.json(), {"success": True, "updated": 1000})
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), -(-1000 // views.position_batch_size()))
+        self.assertLessEqual(len(ctx.captured_queries), settings.TODO_QUERY_BUDGETS["reorder_todos"])
+        positions = dict(ToDo.objects.values_list("id", "position"))
+        self.assertEqual([positions[pk] for pk in order], [i * views.POSITION_STEP for i in range(1000)])
+
+    def test_out_of_range_or_non_integer_positions(self):
+        todo = self.todos[0]
+        for position in (10**20, 2**31, -1, True, 1.5, "7", None):
+            with self.subTest(position=position):
+                response = self.post_json({"moves": [{"id": todo.id, "position": position}]})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post_json({"moves": [{"id": 10**20, "position": 0}]}).status_code, 400)
+        self.assertEqual(self.client.post(reverse("reorder_todos"), {"order[]": [str(10**20)]}).status_code, 400)
+        self.assertEqual(self.post_json({"moves": [{"id": todo.id, "position": 2**31 - 1}]}).status_code, 200)
+        self.assertEqual(ToDo.objects.get(pk=todo.pk).position, 2**31 - 1)
+
+    def test_reorder_limit(self):
+        with self.settings(TODO_REORDER_LIMIT=3):
+            self.assertEqual(self.post_json({"order": [t.id for t in self.todos]}).status_code, 400)
+
+
+class ProjectCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="counter", password="secret123")
+        self.client.login(username="counter", password="secret123")
+        self.home = Project.objects.create(user=self.user, name="Home")
+        self.work = Project.objects.create(user=self.user, name="Work")
+
+    def assertCounts(self, project, total, done):
+        project.refresh_from_db()
+        self.assertEqual((project.todo_count, project.completed_count), (total, done))
+
+    def test_create_toggle_move_delete(self):
+        todo = ToDo.objects.create(user=self.user, name="Dishes", project=self.home)
+        ToDo.objects.create(user=self.user, name="Laundry", project=self.home, completed=True)
+        self.assertCounts(self.home, 2, 1)
+
+        todo.mark_complete()
+        self.assertCounts(self.home, 2, 2)
+        todo.mark_incomplete()
+        self.assertCounts(self.home, 2, 1)
+
+        todo.project = self.work
+        todo.completed = True
+        todo.save()
+        self.assertCounts(self.home, 1, 1)
+        self.assertCounts(self.work, 1, 1)
+
+        todo.delete()
+        self.assertCounts(self.work, 0, 0)
+        self.assertEqual(self.home.completion_percent(), 100)
+
+    def test_views_keep_counts(self):
+        todo = ToDo.objects.create(user=self.user, name="Report", project=self.work)
+        self.client.post(reverse("todo_toggle_complete", args=[todo.pk]))
+        self.assertCounts(self.work, 1, 1)
+        self.client.post(reverse("todo_edit", args=[todo.pk]), {
+            "name": "Report", "priority": 3, "project": self.home.id,
+        })
+        self.assertCounts(self.work, 0, 0)
+        self.assertCounts(self.home, 1, 0)
+
+    def test_project_list_reads_counters_without_counting(self):
+        for project in (self.home, self.work):
+            ToDo.objects.create(user=self.user, name="Task", project=project)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("project_list"))
+        self.assertContains(response, "0/1 done (0%)", count=2)
+        self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+
+    def test_recount_projects_repairs_drift(self):
+        ToDo.objects.create(user=self.user, name="Task", project=self.home, completed=True)
+        Project.objects.filter(pk=self.home.pk).update(todo_count=7, completed_count=0)
+        out = StringIO()
+        call_command("recount_projects", "--dry-run", stdout=out)
+        self.assertIn("Found 1 drifted project(s).", out.getvalue())
+        self.assertCounts(self.home, 7, 0)
+        call_command("recount_projects", stdout=StringIO())
+        self.assertCounts(self.home, 1, 1)
+
+
+class SharingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="secret123")
+        self.editor = User.objects.create_user(username="editor", password="secret123")
+        self.viewer = User.objects.create_user(username="viewer", password="secret123")
+        self.outsider = User.objects.create_user(username="outsider", password="secret123")
+        self.project = Project.objects.create(user=self.owner, name="Team")
+        sharing.share(self.project, self.editor)
+        sharing.share(self.project, self.viewer, Membership.VIEWER)
+        self.shared = ToDo.objects.create(user=self.owner, project=self.project, name="Shared task")
+        self.private = ToDo.objects.create(user=self.owner, name="Owner only")
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def listed(self, user, params=None):
+        self.login(user)
+        return {row["id"] for row in self.client.get(reverse("todo_list"), params or {}).context["rows"]}
+
+    def test_members_see_shared_todos(self):
+        mine = ToDo.objects.create(user=self.editor, project=self.project, name="Editor's task")
+        self.assertEqual(self.listed(self.owner), {self.shared.pk, self.private.pk, mine.pk})
+        self.assertEqual(self.listed(self.editor), {self.shared.pk, mine.pk})
+        self.assertEqual(self.listed(self.viewer), {self.shared.pk, mine.pk})
+        self.assertEqual(self.listed(self.viewer, {"project": self.project.pk}), {self.shared.pk, mine.pk})
+        self.assertEqual(self.listed(self.outsider), set())
+        response = self.client.get(reverse("project_list"))
+        self.assertNotContains(response, "Team")
+        self.login(self.editor)
+        response = self.client.get(reverse("project_list"))
+        self.assertContains(response, "Shared")
+        self.assertNotContains(response, reverse("project_delete", args=[self.project.pk]))
+
+    def test_viewers_and_outsiders_cannot_change_todos(self):
+        for user in (self.viewer, self.outsider):
+            self.login(user)
+            with self.subTest(user=user.username):
+                self.assertEqual(self.client.post(reverse("todo_toggle_complete", args=[self.shared.pk])).status_code, 404)
+                self.assertEqual(self.client.get(reverse("todo_edit", args=[self.shared.pk])).status_code, 404)
+                self.assertEqual(self.client.get(reverse("project_delete", args=[self.project.pk])).status_code, 404)
+        self.shared.refresh_from_db()
+        self.assertFalse(self.shared.completed)
+        self.login(self.viewer)
+        response = self.client.post(reverse("todo_create"), {"name": "Sneaky", "priority": 3, "project": self.project.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ToDo.objects.filter(name="Sneaky").exists())
+
+        self.login(self.editor)
+        self.client.post(reverse("todo_toggle_complete", args=[self.shared.pk]))
+        self.client.post(reverse("todo_edit", args=[self.shared.pk]), {
+            "name": "Renamed", "priority": 3, "project": self.project.pk, "completed": "on",
+        })
+        self.shared.refresh_from_db()
+        self.assertEqual((self.shared.completed, self.shared.name), (True, "Renamed"))
+
+    def test_permission_check_is_part_of_the_one_query(self):
+        self.login(self.editor)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse("todo_toggle_complete", args=[self.shared.pk]), HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+        self.assertEqual(response.json()["completed"], True)
+        todo_queries = [q["sql"] for q in ctx.captured_queries if '"todo_todo"' in q["sql"]]
+        self.assertEqual(len(todo_queries), 1)
+        self.assertIn('"todo_membership"', todo_queries[0])
+
+        def list_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("todo_list"))
+            return len(ctx.captured_queries)
+
+        before = list_queries()
+        for i in range(10):
+            sharing.share(Project.objects.create(user=self.owner, name=f"Team {i}"), self.editor)
+        self.assertEqual(list_queries(), before)
+
+    def test_shared_listing_pages_in_order_from_indexes(self):
+        for i in range(7):
+            ToDo.objects.create(user=self.editor, name=f"Own {i}", priority=i % 3 + 1, position=i)
+            ToDo.objects.create(user=self.owner, project=self.project, name=f"Team {i}", priority=i % 3 + 1, position=i)
+        expected = list(sharing.visible_todos(self.editor).order_by(*ORDERING).values_list("pk", flat=True))
+        self.login(self.editor)
+        seen, params = [], {}
+        with self.settings(TODO_PAGE_SIZE=4):
+            while True:
+                response = self.client.get(reverse("todo_list"), params)
+                seen += [row["id"] for row in response.context["rows"]]
+                if not response.context["next_cursor"]:
+                    break
+                params = {"after": response.context["next_cursor"]}
+        self.assertEqual(seen, expected)
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("todo_list"), {"status": "incomplete"})
+        sql = next(q["sql"] for q in ctx.captured_queries if 'FROM "todo_todo"' in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(any("todo_membership_user_idx" in step for step in plan), plan)
+        self.assertFalse([step for step in plan if step.startswith("SCAN todo_todo")], plan)
+
+    def test_shared_writes_refresh_members_lists(self):
+        self.login(self.viewer)
+        self.assertContains(self.client.get(reverse("todo_list")), "Shared task")
+        versions = {user.pk: caching.list_version(user.pk) for user in (self.editor, self.viewer, self.outsider)}
+        self.login(self.editor)
+        self.client.post(reverse("todo_edit", args=[self.shared.pk]), {
+            "name": "Updated by editor", "priority": 3, "project": self.project.pk,
+        })
+        self.assertNotEqual(caching.list_version(self.viewer.pk), versions[self.viewer.pk])
+        self.assertEqual(caching.list_version(self.outsider.pk), versions[self.outsider.pk])
+        self.login(self.viewer)
+        self.assertContains(self.client.get(reverse("todo_list")), "Updated by editor")
+
+    def member_etag(self):
+        self.login(self.editor)
+        response = self.client.get(reverse("todo_list"))
+        return response["ETag"]
+
+    def test_project_rename_reaches_members(self):
+        etag = self.member_etag()
+        self.login(self.owner)
+        self.client.patch(reverse("api_project_detail", args=[self.project.pk]), {"name": "Renamed team"},
+                          content_type="application/json")
+        self.login(self.editor)
+        response = self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed team")
+
+        etag = response["ETag"]
+        self.login(self.owner)
+        self.client.patch(reverse("api_project_bulk"), {"items": [{"id": self.project.pk, "name": "Bulk team"}]},
+                          content_type="application/json")
+        self.login(self.editor)
+        self.assertContains(self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag), "Bulk team")
+
+    def test_project_delete_reaches_members(self):
+        etag = self.member_etag()
+        self.login(self.owner)
+        self.client.post(reverse("project_delete", args=[self.project.pk]))
+        jobs.run_pending()
+        self.login(self.editor)
+        response = self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Shared task")
+
+    def test_api_accepts_editable_projects_only(self):
+        def post(name, payload):
+            return self.client.post(reverse(name), payload, content_type="application/json")
+
+        for urlconf in (settings.ROOT_URLCONF, AsyncURLConf):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                self.login(self.editor)
+                created = post("api_todo_collection", {"name": "Via API", "project": self.project.pk})
+                self.assertEqual(created.status_code, 201)
+                self.assertEqual(created.json()["project"], self.project.pk)
+                bulk = post("api_todo_bulk", {"items": [{"name": "Via bulk", "project": self.project.pk}]})
+                self.assertEqual(bulk.json()["results"][0]["status"], "created")
+                self.login(self.viewer)
+                self.assertEqual(post("api_todo_collection", {"name": "Sneaky", "project": self.project.pk})
+                                 .status_code, 400)
+                bulk = post("api_todo_bulk", {"items": [{"name": "Sneaky", "project": self.project.pk}]})
+                self.assertEqual(bulk.json()["results"][0]["status"], "invalid")
+        self.assertEqual(ToDo.objects.filter(project=self.project, user=self.editor).count(), 4)
+        self.assertFalse(ToDo.objects.filter(name="Sneaky").exists())
+
+    def test_members_api(self):
+        url = reverse("api_project_members", args=[self.project.pk])
+        self.login(self.owner)
+        response = self.client.post(url, {"username": "outsider", "role": "viewer"}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["role"], "viewer")
+        self.assertEqual(self.client.post(url, {"username": "nobody"}, content_type="application/json").status_code, 400)
+        self.assertEqual(self.client.post(url, {"username": "outsider", "role": "owner"},
+                                          content_type="application/json").status_code, 400)
+        self.login(self.viewer)
+        members = self.client.get(url).json()["results"]
+        self.assertEqual([m["username"] for m in members], ["owner", "editor", "viewer", "outsider"])
+        self.assertEqual(self.client.post(url, {"username": "viewer", "role": "editor"},
+                                          content_type="application/json").status_code, 404)
+
+        self.login(self.owner)
+        for user in (self.editor, self.viewer, self.outsider):
+            self.assertEqual(self.client.delete(url, {"user": user.pk}, content_type="application/json").status_code, 204)
+        self.assertFalse(Membership.objects.filter(project=self.project).exists())
+        self.assertEqual(self.listed(self.editor), set())
+
+
+class StatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="counter", password="secret123")
+        self.client.login(username="counter", password="secret123")
+        self.today = timezone.localdate()
+        self.work = Project.objects.create(user=self.user, name="Work")
+        ToDo.objects.create(user=self.user, project=self.work, name="Late", priority=1,
+                            due_date=self.today - timedelta(days=2))
+        ToDo.objects.create(user=self.user, project=self.work, name="Soon", priority=2,
+                            due_date=self.today + timedelta(days=3))
+        ToDo.objects.create(user=self.user, project=self.work, name="Done", priority=1, completed=True,
+                            due_date=self.today - timedelta(days=5))
+        ToDo.objects.create(user=self.user, name="Loose", priority=3)
+        ToDo.objects.create(user=self.user, name="Deleted", priority=3).soft_delete()
+
+    def stats(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("api_stats"))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q["sql"] for q in ctx.captured_queries if '"todo_' in q["sql"]]
+
+    def test_counts_in_two_queries_then_from_cache(self):
+        stats, queries = self.stats()
+        self.assertEqual(len(queries), 2)
+        self.assertIn("FILTER (WHERE", queries[1])
+        self.assertEqual((stats["total"], stats["completion_percent"]), (4, 25))
+        self.assertEqual({s["status"]: s["count"] for s in stats["status"]},
+                         {"completed": 1, "incomplete": 3, "overdue": 1, "due_week": 1})
+        self.assertEqual([(p["priority"], p["total"], p["open"]) for p in stats["priority"]],
+                         [(1, 2, 1), (2, 1, 1), (3, 1, 1)])
+        self.assertEqual(stats["projects"], [{
+            "id": self.work.pk, "name": "Work", "shared": False, "total": 3, "completed": 1, "completion_percent": 33,
+        }])
+        self.assertEqual(self.stats(), (stats, []))
+
+    def test_writes_invalidate(self):
+        self.stats()
+        self.client.post(reverse("todo_toggle_complete", args=[ToDo.objects.get(name="Late").pk]))
+        stats, queries = self.stats()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(stats["completion_percent"], 50)
+        self.assertEqual(stats["projects"][0]["completed"], 2)
+
+        # A member's write reaches the owner's cached stats too.
+        member = User.objects.create_user(username="helper")
+        sharing.share(self.work, member)
+        self.stats()
+        ToDo.objects.create(user=member, project=self.work, name="Helping")
+        stats, _ = self.stats()
+        self.assertEqual((stats["total"], stats["projects"][0]["shared"]), (5, True))
+
+    def test_dashboard_page(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "25% done")
+        self.assertContains(response, "1/3 done (33%)")
+        self.assertContains(response, f'{reverse("todo_list")}?status=overdue')
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(reverse("dashboard"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_dashboard_agrees_with_itself_right_after_a_write(self):
+        self.client.get(reverse("dashboard"))
+        self.client.post(reverse("todo_toggle_complete", args=[ToDo.objects.get(name="Late").pk]))
+        stats = self.client.get(reverse("dashboard")).context["stats"]
+        counts = {s["status"]: s["count"] for s in stats["status"]}
+        self.assertEqual((counts["completed"], counts["overdue"], stats["completion_percent"]), (2, 0, 50))
+        self.assertEqual(stats["projects"][0]["completed"], 2)
+
+
+class ToDoCompletionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="finisher", password="secret123")
+        self.client.login(username="finisher", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Chores")
+        self.todos = [ToDo.objects.create(user=self.user, name=f"Chore {i}", project=self.project) for i in range(3)]
+
+    def counts(self):
+        self.project.refresh_from_db()
+        return self.project.todo_count, self.project.completed_count
+
+    def test_toggle_is_one_update(self):
+        todo = self.todos[0]
+        before = todo.updated_at
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse("todo_toggle_complete", args=[todo.pk]), HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+        self.assertEqual(response.json(), {"status": "complete", "completed": True})
+        todo_queries = [q["sql"] for q in ctx.captured_queries if '"todo_todo"' in q["sql"]]
+        self.assertEqual(len(todo_queries), 1)
+        self.assertTrue(todo_queries[0].startswith("UPDATE"))
+        todo.refresh_from_db()
+        self.assertTrue(todo.completed)
+        self.assertGreater(todo.updated_at, before)
+        self.assertEqual(self.counts(), (3, 1))
+
+        self.client.post(reverse("todo_toggle_complete", args=[todo.pk]))
+        self.assertEqual(self.counts(), (3, 0))
+
+    def test_toggle_other_users_todo(self):
+        other = User.objects.create_user(username="outsider", password="secret123")
+        theirs = ToDo.objects.create(user=other, name="Not yours")
+        response = self.client.post(reverse("todo_toggle_complete", args=[theirs.pk]))
+        self.assertEqual(response.status_code, 404)
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.completed)
+
+    def test_complete_selected(self):
+        self.todos[0].mark_complete()
+        ids = [self.todos[0].pk, self.todos[1].pk]
+        response = self.client.post(reverse("todo_complete_bulk"), {"ids": ids}, content_type="application/json")
+        self.assertEqual(response.json(), {"success": True, "updated": 1})
+        self.assertEqual(self.counts(), (3, 2))
+        response = self.client.post(
+            reverse("todo_complete_bulk"), {"ids": ids, "completed": False}, content_type="application/json",
+        )
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(self.counts(), (3, 0))
+
+    def test_complete_project(self):
+        response = self.client.post(reverse("todo_complete_bulk"), {"project": self.project.pk})
+        self.assertRedirects(response, reverse("project_list"))
+        self.assertEqual(self.counts(), (3, 3))
+        self.assertFalse(ToDo.objects.filter(project=self.project, completed=False).exists())
+
+    def test_bad_requests(self):
+        url = reverse("todo_complete_bulk")
+        self.assertEqual(self.client.post(url, {"ids": "nope"}, content_type="application/json").status_code, 400)
+        self.assertEqual(self.client.post(url, {}, content_type="application/json").status_code, 400)
+        other = Project.objects.create(user=User.objects.create_user(username="stranger"), name="Theirs")
+        self.assertEqual(self.client.post(url, {"project": other.pk}).status_code, 404)
+
+
+class SessionModeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="sessioned", password="secret123")
+        self.todo = ToDo.objects.create(user=self.user, name="Session task")
+
+    def toggle_queries(self, client):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(reverse("todo_toggle_complete", args=[self.todo.pk]))
+        self.assertEqual(response.status_code, 302)
+        return len(ctx.captured_queries)
+
+    def test_toggle_query_savings(self):
+        self.client.force_login(self.user)
+        baseline = self.toggle_queries(self.client)
+        for mode in ("cached", "signed_cookies"):
+            engine, backend = benchmarks.SESSION_MODES[mode]
+            with self.subTest(mode), self.settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]):
+                client = self.client_class()
+                client.force_login(self.user)
+                self.toggle_queries(client)
+                self.assertEqual(self.toggle_queries(client), baseline - 2)
+        results = benchmarks.session_cases(self.user, self.todo.pk, repeat=1)
+        self.assertEqual(
+            results["todo_toggle_complete[session=db]"]["queries"] - results["todo_toggle_complete[session=cached]"]["queries"],
+            2,
+        )
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        AUTHENTICATION_BACKENDS=["todo.auth.CachedModelBackend"],
+    )
+    def test_cached_user_is_invalidated(self):
+        self.client.login(username="sessioned", password="secret123")
+        other = self.client_class()
+        other.login(username="sessioned", password="secret123")
+        self.assertEqual(other.get(reverse("todo_list")).status_code, 200)
+
+        # A password change must end the other session despite the cached user.
+        self.user.set_password("changed123")
+        self.user.save()
+        self.assertEqual(other.get(reverse("todo_list")).status_code, 302)
+
+        self.client.login(username="sessioned", password="changed123")
+        self.assertEqual(self.client.get(reverse("todo_list")).status_code, 200)
+        self.client.get(reverse("logout"))
+        self.assertEqual(self.client.get(reverse("todo_list")).status_code, 302)
+
+    async def test_async_lookup_fills_the_cache(self):
+        backend = auth.CachedModelBackend()
+        key = auth.USER_KEY.format(user_id=self.user.pk)
+        self.assertEqual(await backend.aget_user(self.user.pk), self.user)
+        self.assertEqual(await cache.aget(key), self.user)
+        with mock.patch.object(ModelBackend, "aget_user") as lookup:
+            self.assertEqual(await backend.aget_user(self.user.pk), self.user)
+        lookup.assert_not_called()
+
+
+@override_settings(TODO_LOGIN_THROTTLE={"window": 60, "login_per_ip": 8, "login_per_username": 3, "register_per_ip": 2})
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="target", password="secret123")
+
+    def login(self, username="target", password="wrong", ip="10.0.0.1"):
+        return self.client.post(reverse("login"), {"username": username, "password": password}, REMOTE_ADDR=ip)
+
+    def test_username_limit_blocks_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 200)
+        with mock.patch("todo.views.authenticate") as authenticate:
+            response = self.login(password="secret123", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        authenticate.assert_not_called()
+        self.assertEqual(self.login(username="someone-else").status_code, 200)
+
+    def test_ip_limit_and_sliding_window(self):
+        now = 1_000_000.0
+        with mock.patch("todo.throttle.time.time", side_effect=lambda: now):
+            for i in range(8):
+                self.login(username=f"user{i}")
+            self.assertEqual(self.login(username="fresh").status_code, 429)
+            now += 61
+            self.assertEqual(self.login(username="fresh").status_code, 200)
+
+    def test_success_resets_username_count(self):
+        self.login()
+        self.login()
+        self.assertEqual(self.login(password="secret123").status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_register_limit(self):
+        for i in range(2):
+            self.client.post(reverse("register"), {"username": f"new{i}", "password": "pw", "password_confirm": "x"})
+        response = self.client.post(reverse("register"), {"username": "new9", "password": "pw", "password_confirm": "pw"})
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(User.objects.filter(username="new9").exists())
+
+    def test_concurrent_attempts_share_one_count(self):
+        request = RequestFactory().post(reverse("login"), REMOTE_ADDR="10.0.0.3")
+        start, waits = threading.Barrier(10), []
+
+        def guess():
+            start.wait()
+            waits.append(throttle.attempt("login", request, "target"))
+
+        threads = [threading.Thread(target=guess) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(waits.count(0), 3)
+        self.assertTrue(all(wait > 0 for wait in waits if wait))
+        self.assertEqual(self.login().status_code, 429)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["todo.hashers.TunablePBKDF2PasswordHasher"],
+    TODO_PBKDF2_ITERATIONS=1000,
+    TODO_HASHING_WORKERS=1,
+    TODO_HASHING_QUEUE=0,
+    TODO_HASHING_WAIT=0.05,
+)
+class PasswordHashingTests(TestCase):
+
+    def test_iterations_are_configurable_and_upgraded(self):
+        user = User.objects.create_user(username="hashed", password="secret123")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+        with self.settings(TODO_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(self.client.login(username="hashed", password="secret123"))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+
+    def test_full_pool_refuses_login(self):
+        User.objects.create_user(username="queued", password="secret123")
+        started, release = threading.Event(), threading.Event()
+
+        def hold_slot():
+            started.set()
+            release.wait(5)
+
+        holder = threading.Thread(target=hashers.pool.run, args=(hold_slot,))
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+        response = self.client.post(reverse("login"), {"username": "queued", "password": "secret123"})
+        self.assertEqual(response.status_code, 503)
+        release.set()
+        holder.join()
+        response = self.client.post(reverse("login"), {"username": "queued", "password": "secret123"})
+        self.assertEqual(response.status_code, 302)
+
+
+class ToDoListCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cached", password="secret123")
+        self.client.login(username="cached", password="secret123")
+        self.todo = ToDo.objects.create(user=self.user, name="Cached task")
+
+    def test_repeat_view_skips_todo_queries(self):
+        self.client.get(reverse("todo_list"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("todo_list"))
+        self.assertContains(response, "Cached task")
+        self.assertFalse([q for q in ctx.captured_queries if "todo_todo" in q["sql"]])
+
+    def test_writes_invalidate(self):
+        self.client.get(reverse("todo_list"))
+        self.todo.name = "Renamed task"
+        self.todo.save()
+        self.assertContains(self.client.get(reverse("todo_list")), "Renamed task")
+        Project.objects.create(user=self.user, name="Fresh project")
+        self.assertContains(self.client.get(reverse("todo_list")), "Fresh project")
+
+    def test_other_users_writes_do_not_invalidate(self):
+        self.client.get(reverse("todo_list"))
+        other = User.objects.create_user(username="neighbour", password="secret123")
+        ToDo.objects.create(user=other, name="Not mine")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("todo_list"))
+        self.assertFalse([q for q in ctx.captured_queries if "todo_todo" in q["sql"]])
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse("todo_list"))
+        etag = response["ETag"]
+        self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(reverse("todo_list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code,
+            304,
+        )
+        self.assertEqual(
+            self.client.get(reverse("todo_list"), {"status": "completed"}, HTTP_IF_NONE_MATCH=etag).status_code,
+            200,
+        )
+        self.todo.mark_complete()
+        self.assertEqual(self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_messages_skip_validation(self):
+        empty = Project.objects.create(user=self.user, name="Empty")
+        for urlconf in (settings.ROOT_URLCONF, AsyncURLConf):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                etag = self.client.get(reverse("todo_list"))["ETag"]
+                # Completes nothing: a message but no new version stamp.
+                self.client.post(reverse("todo_complete_bulk"), {"project": empty.pk})
+                response = self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, "0 todo(s) marked as complete")
+                self.assertNotIn("ETag", response)
+                self.assertNotIn("Last-Modified", response)
+                self.assertEqual(self.client.get(reverse("todo_list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {"default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }}
+            with self.settings(CACHES=backend):
+                self.client.get(reverse("todo_list"))
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertContains(self.client.get(reverse("todo_list")), "Cached task")
+                self.assertFalse([q for q in ctx.captured_queries if "todo_todo" in q["sql"]])
+                self.todo.delete()
+                self.assertNotContains(self.client.get(reverse("todo_list")), "Cached task")
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="integrator", password="secret123")
+        self.client.login(username="integrator", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Imported")
+
+    def send(self, method, name, payload=None, args=()):
+        return getattr(self.client, method)(
+            reverse(name, args=args), json.dumps(payload or {}), content_type="application/json",
+        )
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api_todo_collection")).status_code, 401)
+
+    def test_todo_crud(self):
+        response = self.send("post", "api_todo_collection", {"name": "Call bank", "project": self.project.id})
+        self.assertEqual(response.status_code, 201)
+        todo_id = response.json()["id"]
+        self.assertEqual(response.json()["priority"], 3)
+
+        response = self.send("patch", "api_todo_detail", {"completed": True}, args=[todo_id])
+        self.assertTrue(response.json()["completed"])
+        self.assertEqual(response.json()["name"], "Call bank")
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.completed_count, 1)
+
+        listing = self.client.get(reverse("api_todo_collection"), {"status": "completed"}).json()
+        self.assertEqual([t["id"] for t in listing["results"]], [todo_id])
+
+        self.assertEqual(self.send("delete", "api_todo_detail", args=[todo_id]).status_code, 204)
+        self.assertFalse(ToDo.objects.exists())
+
+    def test_malformed_priority_filter_is_ignored(self):
+        ToDo.objects.create(user=self.user, name="Urgent", priority=1)
+        ToDo.objects.create(user=self.user, name="Someday", priority=3)
+        for priority, expected in (("1", ["Urgent"]), ("abc", ["Urgent", "Someday"]), ("0", ["Urgent", "Someday"])):
+            response = self.client.get(reverse("api_todo_collection"), {"priority": priority})
+            self.assertEqual(response.status_code, 200)
+            self.assertCountEqual([t["name"] for t in response.json()["results"]], expected, priority)
+
+    def test_validation_reuses_form_rules(self):
+        response = self.send("post", "api_todo_collection", {"name": "Bad date", "due_date": "31-12-2025"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("due_date", response.json()["errors"])
+
+    def test_bulk_create_reports_each_item(self):
+        other = Project.objects.create(user=User.objects.create_user(username="x", password="x"), name="Theirs")
+        items = [{"name": f"Row {i}", "project": self.project.id, "completed": i % 2 == 0} for i in range(50)]
+        items.insert(1, {"name": ""})
+        items.insert(2, {"name": "Wrong project", "project": other.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.send("post", "api_todo_bulk", {"items": items})
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results[:3]], ["created", "invalid", "invalid"])
+        self.assertIn("project", results[2]["errors"])
+        self.assertEqual(ToDo.objects.filter(user=self.user).count(), 50)
+        self.assertEqual(results[0]["id"], ToDo.objects.get(name="Row 0").id)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "todo_todo"')]
+        self.assertEqual(len(inserts), 1)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.todo_count, self.project.completed_count), (50, 25))
+
+    def test_bulk_update_and_delete(self):
+        a = ToDo.objects.create(user=self.user, name="A", project=self.project)
+        b = ToDo.objects.create(user=self.user, name="B")
+        response = self.send("patch", "api_todo_bulk", {"items": [
+            {"id": a.id, "completed": True, "project": None},
+            {"id": b.id, "priority": 9},
+            {"id": 999999, "name": "Missing"},
+        ]})
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["updated", "invalid", "not_found"])
+        a.refresh_from_db()
+        self.assertTrue(a.completed)
+        self.assertIsNone(a.project)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.todo_count, 0)
+
+        response = self.send("delete", "api_todo_bulk", {"ids": [a.id, b.id, 999999]})
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["deleted", "deleted", "not_found"])
+        self.assertFalse(ToDo.objects.exists())
+
+    def test_bulk_update_rejects_repeated_ids(self):
+        a = ToDo.objects.create(user=self.user, name="A", project=self.project)
+        ToDo.objects.create(user=self.user, name="B", project=self.project, completed=True)
+        response = self.send("patch", "api_todo_bulk", {"items": [
+            {"id": a.id, "completed": True},
+            {"id": a.id, "completed": False},
+        ]})
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["updated", "invalid"])
+        self.assertIn("id", response.json()["results"][1]["errors"])
+        self.assertTrue(ToDo.objects.get(pk=a.pk).completed)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.todo_count, self.project.completed_count), (2, 2))
+
+    def test_bulk_limit(self):
+        with self.settings(TODO_API_BULK_LIMIT=2):
+            response = self.send("post", "api_todo_bulk", {"items": [{"name": "x"}] * 3})
+        self.assertEqual(response.status_code, 400)
+
+    def test_projects(self):
+        response = self.send("post", "api_project_bulk", {"items": [{"name": "One"}, {"name": "Two"}, {}]})
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["created", "created", "invalid"])
+        one = response.json()["results"][0]["id"]
+        self.send("patch", "api_project_bulk", {"items": [{"id": one, "description": "First"}]})
+        self.assertEqual(self.client.get(reverse("api_project_detail", args=[one])).json()["description"], "First")
+        names = [p["name"] for p in self.client.get(reverse("api_project_collection")).json()["results"]]
+        self.assertEqual(names, ["Imported", "One", "Two"])
+        response = self.send("delete", "api_project_bulk", {"ids": [one, 999999]})
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["deleted", "not_found"])
+        self.assertFalse(Project.objects.filter(pk=one).exists())
+        self.assertTrue(Project.all_objects.filter(pk=one, deleted_at__isnull=False).exists())
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", password="secret123")
+        self.client.login(username="worker", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Big")
+        for i in range(7):
+            ToDo.objects.create(user=self.user, project=self.project, name=f"Task {i}")
+
+    @override_settings(TODO_JOB_DELETE_BATCH=3)
+    def test_project_delete_hides_then_tombstones_in_batches(self):
+        response = self.client.post(reverse("project_delete", args=[self.project.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        stamp = Project.all_objects.get(pk=self.project.pk).deleted_at
+        self.assertIsNotNone(stamp)
+        self.assertEqual(ToDo.objects.filter(project_id=self.project.pk).count(), 7)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(jobs.run_pending(), 1)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "todo_todo" SET "deleted_at"')]
+        self.assertEqual(len(updates), 4)
+        self.assertFalse(ToDo.objects.exists())
+        self.assertEqual(ToDo.all_objects.filter(deleted_at=stamp).count(), 7)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {"todos_deleted": 7, "projects_deleted": 1})
+
+    def test_api_delete_and_polling(self):
+        response = self.client.delete(reverse("api_project_detail", args=[self.project.id]))
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        self.assertEqual(self.client.get(reverse("api_project_detail", args=[self.project.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api_job_detail", args=[job_id])).json()["status"], "queued")
+
+        call_command("run_workers", "--burst", "--workers", "1", stdout=StringIO())
+        polled = self.client.get(reverse("api_job_detail", args=[job_id])).json()
+        self.assertEqual((polled["status"], polled["result"]["todos_deleted"]), ("done", 7))
+        listed = self.client.get(reverse("api_job_collection")).json()["results"]
+        self.assertEqual([job["id"] for job in listed], [job_id])
+
+        User.objects.create_user(username="other", password="secret123")
+        self.client.login(username="other", password="secret123")
+        self.assertEqual(self.client.get(reverse("api_job_detail", args=[job_id])).status_code, 404)
+
+    def test_claim_order_failures_and_stale_jobs(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("no-such-kind")
+        first = jobs.enqueue("delete_projects", project_ids=[])
+        second = Job.objects.create(kind="retired-kind")
+        self.assertEqual(jobs.claim("a").pk, first.pk)
+        claimed = jobs.claim("b")
+        self.assertEqual((claimed.pk, claimed.status, claimed.worker), (second.pk, Job.RUNNING, "b"))
+        self.assertIsNone(jobs.claim("c"))
+
+        with self.assertLogs("todo.jobs", "ERROR"):
+            jobs.run(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, Job.FAILED)
+        self.assertIn("No handler", claimed.error)
+
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=first.pk).update(started_at=long_ago)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.QUEUED)
+        Job.objects.filter(pk=first.pk).update(status=Job.RUNNING, started_at=long_ago, attempts=jobs.MAX_ATTEMPTS)
+        self.assertEqual(jobs.requeue_stale(), 0)
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.FAILED)
+
+
+    def job_files(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return self.settings(TODO_JOB_FILES_DIR=tmp.name)
+
+    def test_large_upload_is_imported_by_a_job(self):
+        upload = SimpleUploadedFile("todos.csv", b"name,priority\nQueued,1\n,2\nAlso queued,3\n")
+        with self.job_files(), self.settings(TODO_IMPORT_INLINE_BYTES=10):
+            response = self.client.post(reverse("todo_import"), {"file": upload})
+            self.assertRedirects(response, reverse("todo_list"), fetch_redirect_response=False)
+            job = Job.objects.get(kind="import_todos")
+            self.assertFalse(ToDo.objects.filter(name__contains="queued").exists())
+            self.assertTrue(jobs.job_files().exists(job.payload["file"]))
+
+            self.assertEqual(jobs.run_pending(), 1)
+            job.refresh_from_db()
+            self.assertFalse(jobs.job_files().exists(job.payload["file"]))
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.result["created"], job.result["rejected"]), (2, 1))
+        self.assertEqual([reject["line"] for reject in job.result["rejects"]], [3])
+        self.assertEqual(ToDo.objects.filter(name__endswith="ueued").count(), 2)
+
+    def test_requeued_import_skips_finished_lines(self):
+        upload = SimpleUploadedFile("todos.ndjson", b'{"name": "First"}\n{"name": "Second"}\n')
+        with self.job_files():
+            job = jobs.import_later(self.user, upload, "ndjson")
+            # An earlier attempt committed line 1 before its worker died.
+            job.report(imported_through=1, created=1, rejected=0)
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.result["created"], job.result["imported_through"]), (2, 2))
+        self.assertEqual(list(ToDo.objects.filter(name__in=["First", "Second"]).values_list("name", flat=True)),
+                         ["Second"])
+
+    def test_queued_export_and_download(self):
+        ToDo.objects.filter(name="Task 0").update(priority=1)
+        with self.job_files():
+            response = self.client.get(reverse("todo_export"), {"format": "ndjson", "priority": "1", "queue": "1"})
+            self.assertEqual(response.status_code, 202)
+            download = response.json()["download"]
+            self.assertEqual(self.client.get(download).status_code, 404)
+
+            jobs.run_pending()
+            job = Job.objects.get(pk=response.json()["id"])
+            self.assertEqual(job.result["rows"], 1)
+            response = self.client.get(download)
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Task 0"])
+
+    def test_recount_job(self):
+        Project.objects.filter(pk=self.project.pk).update(todo_count=99)
+        out = StringIO()
+        call_command("recount_projects", "--queue", stdout=out)
+        self.assertIn("Queued job", out.getvalue())
+        jobs.run_pending()
+        self.assertEqual(Job.objects.get(kind="recount_projects").result, {"projects_repaired": 1})
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.todo_count, 7)
+
+class SoftDeleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="undoer", password="secret123")
+        self.client.login(username="undoer", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Garden")
+        self.todo = ToDo.objects.create(user=self.user, project=self.project, name="Weed", completed=True)
+        ToDo.objects.create(user=self.user, project=self.project, name="Water")
+
+    def counts(self):
+        self.project.refresh_from_db()
+        return self.project.todo_count, self.project.completed_count
+
+    def test_todo_delete_and_undo(self):
+        self.client.post(reverse("todo_delete", args=[self.todo.id]))
+        self.assertFalse(ToDo.objects.filter(pk=self.todo.pk).exists())
+        self.assertTrue(ToDo.all_objects.filter(pk=self.todo.pk).exists())
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertNotContains(self.client.get(reverse("todo_list")), "Weed")
+        self.assertEqual(self.client.get(reverse("api_todo_detail", args=[self.todo.id])).status_code, 404)
+
+        response = self.client.post(reverse("api_todo_restore", args=[self.todo.id]))
+        self.assertEqual(response.json()["name"], "Weed")
+        self.assertEqual(self.counts(), (2, 1))
+        self.assertContains(self.client.get(reverse("todo_list")), "Weed")
+        self.assertEqual(self.client.post(reverse("api_todo_restore", args=[self.todo.id])).status_code, 404)
+
+    def test_project_undo_restores_its_todos_only(self):
+        self.client.delete(reverse("api_todo_detail", args=[self.todo.id]))
+        self.client.post(reverse("project_delete", args=[self.project.id]))
+        jobs.run_pending()
+        self.assertEqual(self.client.post(reverse("api_todo_restore", args=[self.todo.id])).status_code, 409)
+
+        response = self.client.post(reverse("api_project_restore", args=[self.project.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Project.objects.filter(pk=self.project.pk).exists())
+        jobs.run_pending()
+        # The todo deleted on its own before the project stays deleted.
+        self.assertEqual(list(ToDo.objects.values_list("name", flat=True)), ["Water"])
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_undo_before_the_job_runs(self):
+        self.client.post(reverse("project_delete", args=[self.project.id]))
+        self.client.post(reverse("api_project_restore", args=[self.project.id]))
+        jobs.run_pending()
+        self.assertEqual(ToDo.objects.filter(project=self.project).count(), 2)
+        self.assertEqual(self.counts(), (2, 1))
+
+    def test_todos_of_a_deleted_project_are_hidden_before_the_job_runs(self):
+        loose = ToDo.objects.create(user=self.user, name="Loose")
+        self.client.post(reverse("project_delete", args=[self.project.id]))
+        self.assertEqual(ToDo.objects.filter(project=self.project).count(), 2)
+
+        response = self.client.get(reverse("todo_list"))
+        self.assertEqual([row["id"] for row in response.context["rows"]], [loose.pk])
+        listing = self.client.get(reverse("api_todo_collection")).json()["results"]
+        self.assertEqual([todo["id"] for todo in listing], [loose.pk])
+        self.assertEqual(self.client.post(reverse("todo_toggle_complete", args=[self.todo.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api_todo_detail", args=[self.todo.id])).status_code, 404)
+        self.assertTrue(ToDo.objects.get(pk=self.todo.pk).completed)
+
+        self.client.post(reverse("api_project_restore", args=[self.project.id]))
+        jobs.run_pending()
+        self.assertEqual(len(self.client.get(reverse("todo_list")).context["rows"]), 3)
+        self.assertEqual(self.counts(), (2, 1))
+
+    def test_recount_ignores_tombstones(self):
+        self.todo.soft_delete()
+        out = StringIO()
+        call_command("recount_projects", "--dry-run", stdout=out)
+        self.assertIn("Found 0 drifted", out.getvalue())
+
+    def test_purge_removes_old_tombstones_in_batches(self):
+        other = Project.objects.create(user=self.user, name="Kept")
+        keep = ToDo.objects.create(user=self.user, project=other, name="Recent")
+        self.client.post(reverse("project_delete", args=[self.project.id]))
+        jobs.run_pending()
+        keep.soft_delete()
+        long_ago = timezone.now() - timedelta(days=60)
+        ToDo.all_objects.filter(project=self.project).update(deleted_at=long_ago)
+        Project.all_objects.filter(pk=self.project.pk).update(deleted_at=long_ago)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("purge_deleted", "--batch-size", "1", "--sleep", "0", stdout=out)
+        self.assertIn("Purged 2 todo(s) and 1 project(s)", out.getvalue())
+        deletes = [q for q in ctx.captured_queries if q["sql"].startswith('DELETE FROM "todo_todo"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(list(ToDo.all_objects.values_list("name", flat=True)), ["Recent"])
+
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="syncer", password="secret123")
+        self.client.login(username="syncer", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Home")
+        self.todos = [ToDo.objects.create(user=self.user, project=self.project, name=f"Task {i}") for i in range(5)]
+        other = User.objects.create_user(username="stranger")
+        ToDo.objects.create(user=other, name="Not mine")
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params["cursor"] = cursor
+        return self.client.get(reverse("api_sync"), params)
+
+    def sync_all(self, cursor=None, limit=2):
+        todos, projects, deleted, pages = [], [], [], 0
+        while True:
+            page = self.sync(cursor, limit=limit).json()
+            todos += [todo["name"] for todo in page["todos"]]
+            projects += [project["name"] for project in page["projects"]]
+            deleted += page["deleted"]["todos"]
+            cursor, pages = page["cursor"], pages + 1
+            if not page["has_more"]:
+                return todos, projects, deleted, cursor, pages
+
+    def test_full_sync_then_only_changes(self):
+        todos, projects, deleted, cursor, pages = self.sync_all()
+        self.assertEqual(todos, [f"Task {i}" for i in range(5)])
+        # The project sorts last: adding its todos bumped its counters.
+        self.assertEqual((projects, deleted, pages), (["Home"], [], 3))
+        self.assertEqual(self.sync(cursor).json()["todos"], [])
+
+        ToDo.objects.filter(pk=self.todos[1].pk).toggle_completed()
+        ToDo.objects.filter(pk=self.todos[3].pk).update(name="Renamed")
+        self.todos[4].soft_delete()
+        todos, projects, deleted, cursor, _ = self.sync_all(cursor, limit=100)
+        self.assertEqual(todos, ["Task 1", "Renamed"])
+        self.assertEqual((projects, deleted), (["Home"], [self.todos[4].pk]))
+
+        self.todos[4].restore()
+        self.assertEqual(self.sync_all(cursor)[0], ["Task 4"])
+
+    def test_feed_is_an_index_range_scan(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+        with CaptureQueriesContext(connection) as ctx:
+            self.sync(limit=10)
+        for table, index in (("todo_todo", "todo_user_change_idx"), ("todo_project", "project_user_change_idx")):
+            sql = next(q["sql"] for q in ctx.captured_queries if f'FROM "{table}"' in q["sql"])
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertTrue(any(index in step for step in plan), plan)
+            self.assertFalse([step for step in plan if "TEMP B-TREE" in step], plan)
+
+    def test_members_see_changes_in_shared_projects(self):
+        member = User.objects.create_user(username="member")
+        sharing.share(self.project, member)
+        ToDo.objects.create(user=self.user, name="Private")
+        self.client.force_login(member)
+        page = self.sync().json()
+        self.assertEqual([todo["name"] for todo in page["todos"]], [f"Task {i}" for i in range(5)])
+        self.assertEqual([project["name"] for project in page["projects"]], ["Home"])
+
+        ToDo.objects.create(user=member, project=self.project, name="From the member")
+        self.todos[0].soft_delete()
+        todos, _, deleted, _, _ = self.sync_all(page["cursor"], limit=100)
+        self.assertEqual((todos, deleted), (["From the member"], [self.todos[0].pk]))
+
+    def test_purge_expires_older_cursors(self):
+        cursor = self.sync_all()[3]
+        self.todos[0].soft_delete()
+        ToDo.all_objects.filter(pk=self.todos[0].pk).update(deleted_at=timezone.now() - timedelta(days=60))
+        call_command("purge_deleted", "--sleep", "0", stdout=StringIO())
+        self.assertEqual(self.sync(cursor).status_code, 410)
+        self.assertEqual(self.sync().status_code, 200)
+        self.assertEqual(self.sync("garbage").status_code, 400)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="exporter", password="secret123")
+        self.client.login(username="exporter", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Garden")
+        ToDo.objects.create(user=self.user, name="Plant, water", project=self.project, due_date=date(2025, 5, 1))
+        ToDo.objects.create(user=self.user, name="Mow lawn", completed=True)
+        other = User.objects.create_user(username="stranger", password="secret123")
+        ToDo.objects.create(user=other, name="Not exported")
+
+    def export(self, **params):
+        response = self.client.get(reverse("todo_export"), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.reader(StringIO(self.export())))
+        self.assertEqual(rows[0][:4], ["id", "name", "description", "completed"])
+        self.assertEqual([row[1] for row in rows[1:]], ["Plant, water", "Mow lawn"])
+        self.assertIn("Garden", rows[1])
+        self.assertIn("2025-05-01", rows[1])
+
+    def test_ndjson_honours_filters(self):
+        lines = self.export(format="ndjson", status="completed").splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Mow lawn"])
+        lines = self.export(format="ndjson", q="plant").splitlines()
+        self.assertEqual([json.loads(line)["project_name"] for line in lines], ["Garden"])
+
+    def test_malformed_priority_is_ignored(self):
+        for priority in ("abc", "7", "10000000000000000000000"):
+            lines = self.export(format="ndjson", priority=priority).splitlines()
+            self.assertEqual(len(lines), 2, priority)
+        self.assertEqual(self.export(format="ndjson", priority="1"), "")
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse("todo_export"), {"format": "xml"}).status_code, 400)
+
+    def test_export_todos_command(self):
+        out = StringIO()
+        call_command("export_todos", "exporter", "--format", "ndjson", "--project", str(self.project.id), stdout=out)
+        self.assertEqual([json.loads(line)["name"] for line in out.getvalue().splitlines()], ["Plant, water"])
+        out = StringIO()
+        call_command("export_todos", "exporter", "--format", "ndjson", "--status", "overdue", stdout=out)
+        self.assertEqual([json.loads(line)["name"] for line in out.getvalue().splitlines()], ["Plant, water"])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/todos.csv"
+            call_command("export_todos", "exporter", "--output", path, "--chunk-size", "1")
+            with open(path, newline="") as f:
+                self.assertEqual(len(list(csv.reader(f))), 3)
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer", password="secret123")
+        self.client.login(username="importer", password="secret123")
+        self.garden = Project.objects.create(user=self.user, name="Garden")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = f"{self.tmp.name}/{name}"
+        with open(path, "w", newline="") as f:
+            f.write(text)
+        return path
+
+    def test_csv_import_in_batches_with_rejects(self):
+        path = self.write("todos.csv", (
+            "name,description,due_date,completed,priority,project_name\n"
+            "Weed beds,,2025-06-01,False,2,Garden\n"
+            ",missing name,,False,3,\n"
+            "Paint fence,,not-a-date,False,3,House\n"
+            "Fix roof,,,True,,House\n"
+            "Sweep,,,False,1,\n"
+        ))
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("import_todos", "importer", path, "--batch-size", "2", stdout=out)
+        self.assertIn("Imported 3 todos", out.getvalue())
+        self.assertIn("2 rows rejected", out.getvalue())
+
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "todo_todo"')]
+        self.assertEqual(len(inserts), 2)
+        roof = ToDo.objects.get(name="Fix roof")
+        self.assertEqual((roof.project.name, roof.priority, roof.completed), ("House", 3, True))
+        self.assertEqual(Project.objects.filter(user=self.user, name="House").count(), 1)
+        self.garden.refresh_from_db()
+        self.assertEqual(self.garden.todo_count, 1)
+
+        with open(f"{path}.rejects.ndjson") as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([r["line"] for r in rejects], [3, 4])
+        self.assertIn("due_date", rejects[1]["errors"])
+
+    def test_round_trip_from_export(self):
+        ToDo.objects.create(user=self.user, name="Exported", project=self.garden, completed=True)
+        out = StringIO()
+        call_command("export_todos", "importer", "--format", "ndjson", stdout=out)
+        path = self.write("todos.ndjson", out.getvalue() + "{broken\n")
+        call_command("import_todos", "importer", path, stdout=StringIO())
+        copies = ToDo.objects.filter(name="Exported")
+        self.assertEqual(copies.count(), 2)
+        self.assertEqual({t.project_id for t in copies}, {self.garden.id})
+
+    def test_upload_view(self):
+        upload = SimpleUploadedFile("todos.csv", b"name,priority\nUploaded,1\n,2\n", content_type="text/csv")
+        response = self.client.post(reverse("todo_import"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Line 3")
+        self.assertTrue(ToDo.objects.filter(user=self.user, name="Uploaded", priority=1).exists())
+
+
+class AsyncURLConf:
+    urlpatterns = [path("", include(build_urlpatterns(True)))]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="asyncer", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Async project")
+        self.todo = ToDo.objects.create(user=self.user, name="Async task", project=self.project)
+
+    async def test_todo_list_cache_and_conditional_get(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("todo_list"))
+        self.assertContains(response, "Async task")
+        self.assertIn("private", response["Cache-Control"])
+        cached = await self.async_client.get(reverse("todo_list"))
+        self.assertContains(cached, "Async task")
+        not_modified = await self.async_client.get(reverse("todo_list"), headers={"if-none-match": response["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_todo_list_requires_login(self):
+        response = await self.async_client.get(reverse("todo_list"))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_toggle_and_reorder(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse("todo_toggle_complete", args=[self.todo.pk]), headers={"x-requested-with": "XMLHttpRequest"},
+        )
+        self.assertEqual(response.json(), {"status": "complete", "completed": True})
+        await self.project.arefresh_from_db()
+        self.assertEqual(self.project.completed_count, 1)
+
+        response = await self.async_client.post(
+            reverse("reorder_todos"), {"order": [self.todo.pk]}, content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"success": True, "updated": 1})
+
+    async def test_api(self):
+        self.assertEqual((await self.async_client.get(reverse("api_todo_collection"))).status_code, 401)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse("api_todo_collection"), {"name": "Via ASGI", "project": self.project.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        created = response.json()["id"]
+        response = await self.async_client.patch(
+            reverse("api_todo_detail", args=[created]), {"priority": 1}, content_type="application/json",
+        )
+        self.assertEqual(response.json()["priority"], 1)
+        response = await self.async_client.post(
+            reverse("api_todo_bulk"), {"items": [{"name": "Bulk one"}, {"name": ""}]}, content_type="application/json",
+        )
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["created", "invalid"])
+        listing = (await self.async_client.get(reverse("api_todo_collection"))).json()
+        self.assertEqual(len(listing["results"]), 3)
+        await self.project.arefresh_from_db()
+        self.assertEqual(self.project.todo_count, 2)
+        response = await self.async_client.delete(reverse("api_todo_detail", args=[created]))
+        self.assertEqual(response.status_code, 204)
+
+
+class LiveUpdateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="watcher", password="secret123")
+        self.project = Project.objects.create(user=self.user, name="Live")
+        self.todos = [ToDo.objects.create(user=self.user, project=self.project, name=f"Live {i}") for i in range(3)]
+        self.cursor = sync.head()
+
+    async def test_broker_wakes_subscribers_of_that_user_only(self):
+        broker = live.InProcessBroker()
+        async with broker.subscribe(1) as mine, broker.subscribe(2) as theirs:
+            self.assertEqual(broker.subscriber_count(), 2)
+            await asyncio.to_thread(broker.publish, 1)
+            await asyncio.wait_for(mine.wait(), 1)
+            self.assertFalse(theirs.is_set())
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_file_broker_reaches_other_processes(self):
+        with tempfile.TemporaryDirectory() as path:
+            publisher = live.FileBroker(path, poll_interval=0.01)
+            subscriber = live.FileBroker(path, poll_interval=0.01)
+            async with subscriber.subscribe(7) as wake:
+                await asyncio.sleep(0.05)
+                publisher.publish(7)
+                await asyncio.wait_for(wake.wait(), 2)
+
+    def test_writes_publish_after_commit(self):
+        with mock.patch.object(live.InProcessBroker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.todos[0].mark_complete()
+                publish.assert_not_called()
+        publish.assert_called_with(self.user.pk)
+
+    def test_collect_events(self):
+        ToDo.objects.filter(pk=self.todos[0].pk).toggle_completed()
+        self.todos[1].soft_delete()
+        events, cursor = live.collect_events(self.user, self.cursor)
+        kinds = [event.split("\n")[1] for event in events]
+        # Each row appears once, at its latest change: both writes moved the project's counters.
+        self.assertEqual(kinds, ["event: todo", "event: todo-deleted", "event: project"])
+        data = json.loads(events[0].split("data: ")[1])
+        self.assertEqual((data["id"], data["completed"]), (self.todos[0].pk, True))
+        self.assertIn(f'data-todo-row="{self.todos[0].pk}"', data["html"])
+        self.assertEqual(cursor, sync.head())
+        self.assertEqual(live.collect_events(self.user, cursor), ([], cursor))
+
+        ToDo.objects.filter(user=self.user).update(priority=1)
+        with mock.patch.object(live, "MAX_EVENTS_PER_WAKE", 1):
+            events, cursor = live.collect_events(self.user, cursor)
+        self.assertEqual([event.split("\n")[1] for event in events], ["event: reload"])
+        self.assertEqual(cursor, sync.head())
+
+
+    def test_collect_events_reach_members(self):
+        member = User.objects.create_user(username="member")
+        sharing.share(self.project, member)
+        cursor = sync.head()
+        ToDo.objects.filter(pk=self.todos[0].pk).toggle_completed()
+        ToDo.objects.create(user=self.user, name="Private")
+        events, _ = live.collect_events(member, cursor)
+        self.assertEqual([event.split("\n")[1] for event in events], ["event: todo", "event: project"])
+        self.assertIn(f'"id": {self.todos[0].pk}', events[0])
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class LiveStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="streamer")
+        self.todo = ToDo.objects.create(user=self.user, name="Streamed")
+
+    async def test_stream_catches_up_then_closes(self):
+        self.assertEqual((await self.async_client.get(reverse("todo_events"))).status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        cursor = sync.encode_cursor(await sync.ahead())
+        await ToDo.objects.filter(pk=self.todo.pk).aupdate(name="Renamed")
+
+        response = await self.async_client.get(reverse("todo_events"), {"cursor": cursor})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 5000\n\n")
+        event = (await anext(chunks)).decode()
+        self.assertIn("event: todo\n", event)
+        self.assertIn("Renamed", event)
+        self.assertEqual(live.broker().subscriber_count(), 1)
+        # A client disconnect cancels the task streaming the response.
+        waiting = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(live.broker().subscriber_count(), 0)
+
+        response = await self.async_client.get(reverse("todo_events"), headers={"last-event-id": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_todo_list_opens_a_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("todo_list"))
+        self.assertContains(response, "EventSource")
+        self.assertContains(response, f'data-todo-row="{self.todo.pk}"')
+
+
+class BenchmarkTests(TestCase):
+
+    def test_seed_and_run_cases(self):
+        user = User.objects.create_user(username="bench")
+        benchmarks.seed(user, 60)
+        self.assertEqual(ToDo.objects.filter(user=user).count(), 60)
+        self.assertEqual(sum(p.todo_count for p in Project.objects.filter(user=user)), 60)
+        results = benchmarks.run_cases(user, repeat=1)
+        self.assertEqual(len([case for case in results if case.startswith("todo_list")]), 40)
+        self.assertIn("todo_list?status=completed&priority=1&project=first&q=report", results)
+        for case in ("reorder_todos", "todo_toggle_complete", "todo_create", "project_list"):
+            self.assertGreater(results[case]["queries"], 0)
+
+    def test_compare(self):
+        baseline = {"project_list": {"ms": 10.0, "queries": 3}, "todo_create": {"ms": 1.0, "queries": 5}}
+        results = {
+            "project_list": {"ms": 20.0, "queries": 4},
+            "todo_create": {"ms": 2.5, "queries": 5},
+            "new_case": {"ms": 99.0, "queries": 99},
+        }
+        self.assertEqual(benchmarks.compare(results, baseline), ["project_list: 4 queries, baseline 3"])
+        regressions = benchmarks.compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(r.startswith("project_list") for r in regressions))
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.histogram.reset()
+        self.user = User.objects.create_user(username="measured", password="secret123")
+        self.client.login(username="measured", password="secret123")
+        ToDo.objects.create(user=self.user, name="Measured task")
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("todo.metrics", "INFO") as logs:
+            response = self.client.get(reverse("project_list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["view"], line["status"]), ("project_list", 200))
+        self.assertGreater(line["queries"], 0)
+        self.assertGreater(line["template_ms"], 0)
+
+    def test_histogram_endpoint_is_staff_only(self):
+        self.client.get(reverse("todo_list"))
+        self.client.get(reverse("todo_list"))
+        self.assertEqual(self.client.get(reverse("request_metrics")).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        views = self.client.get(reverse("request_metrics")).json()["views"]
+        self.assertEqual(views["todo_list"]["count"], 2)
+        self.assertEqual(sum(views["todo_list"]["latency_ms"].values()), 2)
+        self.assertGreater(views["todo_list"]["max_queries"], 0)
+
+    def test_async_views_are_measured(self):
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            response = self.client.get(reverse("todo_list"))
+        self.assertNotIn('"0 queries"', response["Server-Timing"])
+        self.assertEqual(metrics.histogram.snapshot()["todo_list"]["count"], 1)
+
+    def test_query_budget(self):
+        with self.settings(TODO_QUERY_BUDGETS={"project_list": 1}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse("project_list"))
+            with self.settings(TODO_QUERY_BUDGET_ACTION="log"), self.assertLogs("todo.metrics", "WARNING") as logs:
+                self.assertEqual(self.client.get(reverse("project_list")).status_code, 200)
+        self.assertIn("over its budget of 1", logs.output[-1])
+
+    def test_budget_action_outside_the_test_suite(self):
+        env = {k: v for k, v in os.environ.items() if k != "DJANGO_QUERY_BUDGET_ACTION"}
+        command = "from django.conf import settings; print(settings.TODO_QUERY_BUDGET_ACTION)"
+        for extra, expected in (({}, "log"), ({"DJANGO_QUERY_BUDGET_ACTION": "raise"}, "raise")):
+            result = subprocess.run(
+                [sys.executable, "manage.py", "shell", "-c", command], cwd=settings.BASE_DIR,
+                env={**env, **extra}, capture_output=True, text=True, timeout=60,
+            )
+            self.assertEqual(result.stdout.split()[-1:], [expected], result.stderr)
+
+
+class ProductionDatabaseTests(SimpleTestCase):
+
+    def manage(self, *args, path):
+        env = {**os.environ, "DJANGO_DB_PROFILE": "production", "DJANGO_DB_PATH": path}
+        return subprocess.run(
+            [sys.executable, "manage.py", *args], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, timeout=300,
+        )
+
+    def test_concurrent_writers_hit_no_lock_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/stress.sqlite3"
+            self.assertEqual(self.manage("migrate", "-v0", path=path).returncode, 0)
+            result = self.manage("stress_writes", "--workers", "8", "--iterations", "60", path=path)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("0 error(s)", result.stdout)
+            pragmas = self.manage(
+                "shell", "-c",
+                "from django.db import connection; c = connection.cursor();"
+                "print(c.execute('PRAGMA journal_mode').fetchone()[0], c.execute('PRAGMA synchronous').fetchone()[0])",
+                path=path,
+            )
+            self.assertEqual(pragmas.stdout.split()[-2:], ["wal", "1"])
@@ -0,0 +1,95 @@
+"""
+Sliding-window throttling of login and registration attempts, kept in the
+cache so all workers sharing it enforce one limit.
+
+Attempts are counted per fixed window of ``window`` seconds. One more is
+allowed while the current window's count, plus the previous window's
+weighted by how much of it still falls in the last ``window`` seconds, is
+under the limit. Each attempt is counted with ``cache.add()`` and
+``cache.incr()`` (atomic on locmem, memcached and Redis) and the check reads
+the value incr returned, so concurrent requests cannot all pass on the same
+count; one that lands over a limit is taken back off. A request is refused
+before any password hashing.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+ATTEMPTS_KEY = 'todo:throttle:{scope}:{ident}:{slot}'
+
+DEFAULTS = {
+    'window': 300,
+    'login_per_ip': 30,
+    'login_per_username': 5,
+    'register_per_ip': 10,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'TODO_LOGIN_THROTTLE', {})}
+
+
+def client_ip(request):
+    # REMOTE_ADDR only: X-Forwarded-For is client controlled unless a trusted
+    # proxy rewrites it, and a spoofable key would defeat the limit.
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _key(scope, ident, slot):
+    digest = hashlib.md5(str(ident).lower().encode(), usedforsecurity=False).hexdigest()
+    return ATTEMPTS_KEY.format(scope=scope, ident=digest, slot=slot)
+
+
+def _wait(current, previous, elapsed, window, limit):
+    """
+    Seconds until ``current`` attempts in this window plus ``previous`` in the
+    last one, weighted by their overlap with the last ``window`` seconds, fall
+    under ``limit``.
+    """
+    if current < limit:
+        # Only the previous window's share has to fade.
+        wait = window - elapsed - window * (limit - current) / previous
+    else:
+        # This window's attempts become the previous ones and fade from there.
+        wait = window - elapsed + window * (1 - limit / current)
+    return max(1, math.ceil(wait))
+
+
+def _limits(action, request, username):
+    conf = config()
+    limits = [(f'{action}-ip', client_ip(request), conf[f'{action}_per_ip'])]
+    if username and f'{action}_per_username' in conf:
+        limits.append((f'{action}-user', username, conf[f'{action}_per_username']))
+    return limits
+
+
+def attempt(action, request, username=None):
+    """
+    Count an attempt at ``action`` and return 0, or, when a limit is already
+    reached, take it back and return the seconds until one is allowed again.
+    """
+    now, window = time.time(), config()['window']
+    slot, elapsed = divmod(now, window)
+    slot = int(slot)
+    counted, wait = [], 0
+    for scope, ident, limit in _limits(action, request, username):
+        key = _key(scope, ident, slot)
+        # Kept for two windows: it is the previous window's count in the next.
+        cache.add(key, 0, 2 * window)
+        current = cache.incr(key) - 1
+        counted.append(key)
+        previous = cache.get(_key(scope, ident, slot - 1), 0)
+        if current + previous * (window - elapsed) / window >= limit:
+            wait = max(wait, _wait(current, previous, elapsed, window, limit))
+    if wait:
+        for key in counted:
+            cache.decr(key)
+    return wait
+
+
+def reset(action, username):
+    slot = int(time.time() // config()['window'])
+    cache.delete_many([_key(f'{action}-user', username, s) for s in (slot, slot - 1)])
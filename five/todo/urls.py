@@ -1,33 +1,69 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
-
-urlpatterns = [
-    path("", views.login_view, name="login"),
-    path("login/", views.login_view, name="login"),
-    path("logout/", views.logout_view, name="logout"),
-    path("register/", views.register_view, name="register"),
-
-    path("password_reset/",
-         auth_views.PasswordResetView.as_view(template_name="registration/password_reset_form.html"),
-         name="password_reset"),
-    path("password_reset/done/",
-         auth_views.PasswordResetDoneView.as_view(template_name="registration/password_reset_done.html"),
-         name="password_reset_done"),
-    path("reset/<uidb64>/<token>/",
-         auth_views.PasswordResetConfirmView.as_view(template_name="registration/password_reset_confirm.html"),
-         name="password_reset_confirm"),
-    path("reset/done/",
-         auth_views.PasswordResetCompleteView.as_view(template_name="registration/password_reset_complete.html"),
-         name="password_reset_complete"),
-
-    path("todos/", views.todo_list, name="todo_list"),
-    path("create/", views.todo_create, name="todo_create"),
-    path("<int:pk>/edit/", views.todo_edit, name="todo_edit"),
-    path("<int:pk>/delete/", views.todo_delete, name="todo_delete"),
-    path("<int:pk>/toggle/", views.todo_toggle_complete, name="todo_toggle_complete"),
-
-    path("projects/", views.project_list, name="project_list"),
-    path("projects/create/", views.project_create, name="project_create"),
-    path("projects/<int:pk>/delete/", views.project_delete, name="project_delete"),
-]
\ No newline at end of file
+from . import api, async_views, views
+
+
+def build_urlpatterns(async_views_enabled=False):
+    """Route the hot views to their async twins when serving over ASGI."""
+    hot = async_views if async_views_enabled else views
+    json_api = async_views if async_views_enabled else api
+    live_updates = [
+        path("todos/events/", async_views.todo_events, name="todo_events"),
+    ] if async_views_enabled else []
+    return live_updates + [
+        path("", views.login_view, name="login"),
+        path("login/", views.login_view, name="login"),
+        path("logout/", views.logout_view, name="logout"),
+        path("register/", views.register_view, name="register"),
+
+        path("password_reset/",
+             auth_views.PasswordResetView.as_view(template_name="registration/password_reset_form.html"),
+             name="password_reset"),
+        path("password_reset/done/",
+             auth_views.PasswordResetDoneView.as_view(template_name="registration/password_reset_done.html"),
+             name="password_reset_done"),
+        path("reset/<uidb64>/<token>/",
+             auth_views.PasswordResetConfirmView.as_view(template_name="registration/password_reset_confirm.html"),
+             name="password_reset_confirm"),
+        path("reset/done/",
+             auth_views.PasswordResetCompleteView.as_view(template_name="registration/password_reset_complete.html"),
+             name="password_reset_complete"),
+
+        path("todos/", hot.todo_list, name="todo_list"),
+        path("todos/reorder/", hot.reorder_todos, name="reorder_todos"),
+        path("todos/complete/", views.todo_complete_bulk, name="todo_complete_bulk"),
+        path("todos/export/", views.todo_export, name="todo_export"),
+        path("todos/export/<int:pk>/", views.todo_export_file, name="todo_export_file"),
+        path("todos/import/", views.todo_import, name="todo_import"),
+        path("create/", views.todo_create, name="todo_create"),
+        path("<int:pk>/edit/", views.todo_edit, name="todo_edit"),
+        path("<int:pk>/delete/", views.todo_delete, name="todo_delete"),
+        path("<int:pk>/toggle/", hot.todo_toggle_complete, name="todo_toggle_complete"),
+
+        path("dashboard/", views.dashboard, name="dashboard"),
+
+        path("projects/", views.project_list, name="project_list"),
+        path("projects/create/", views.project_create, name="project_create"),
+        path("projects/<int:pk>/delete/", views.project_delete, name="project_delete"),
+
+        path("metrics/", views.request_metrics, name="request_metrics"),
+
+        path("api/v1/todos/", json_api.todo_collection, name="api_todo_collection"),
+        path("api/v1/todos/bulk/", json_api.todo_bulk, name="api_todo_bulk"),
+        path("api/v1/todos/<int:pk>/", json_api.todo_detail, name="api_todo_detail"),
+        path("api/v1/todos/<int:pk>/restore/", api.todo_restore, name="api_todo_restore"),
+        path("api/v1/agenda/", api.agenda, name="api_agenda"),
+        path("api/v1/sync/", api.sync_changes, name="api_sync"),
+        path("api/v1/stats/", api.stats_summary, name="api_stats"),
+        path("api/v1/projects/", json_api.project_collection, name="api_project_collection"),
+        path("api/v1/projects/bulk/", json_api.project_bulk, name="api_project_bulk"),
+        path("api/v1/projects/<int:pk>/", json_api.project_detail, name="api_project_detail"),
+        path("api/v1/projects/<int:pk>/restore/", api.project_restore, name="api_project_restore"),
+        path("api/v1/projects/<int:pk>/members/", api.project_members, name="api_project_members"),
+        path("api/v1/jobs/", api.job_collection, name="api_job_collection"),
+        path("api/v1/jobs/<int:pk>/", api.job_detail, name="api_job_detail"),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.TODO_ASYNC_VIEWS)
@@ -1,12 +1,56 @@
 # views.py - UPDATE function names
+import io
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from .models import Project, ToDo
-from .forms import ToDoForm, ProjectForm
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from . import caching, export, importer, jobs, metrics, recurrence, sharing, stats, throttle
+from .api import job_to_dict
+from .models import Job, Project, Recurrence, ToDo
+from .forms import ImportForm, ProjectForm, RecurrenceForm, ToDoForm
+from .hashers import HashingBusy
+from .listing import STATUS_FILTERS, TODO_LIST_FIELDS, display_rows, page_todos
+
+# Spacing between positions written by a full reorder.
+POSITION_STEP = 1024
+# Most todos one reorder request may move (TODO_REORDER_LIMIT).
+DEFAULT_REORDER_LIMIT = 1000
+# Largest values the position column and the BigAutoField ids accept; larger
+# ones overflow in the database driver rather than failing validation.
+MAX_POSITION = 2**31 - 1
+MAX_ID = 2**63 - 1
+
+# Rejected rows listed on the import page; the rest are only counted.
+MAX_SHOWN_REJECTS = 100
+# Uploads larger than this (TODO_IMPORT_INLINE_BYTES) are imported by a job.
+DEFAULT_IMPORT_INLINE_BYTES = 1_000_000
+
+def throttled(request, template, context, wait):
+    context['error'] = 'Too many attempts. Please try again later.'
+    response = render(request, template, context, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def hashing_busy(request, template, context):
+    context['error'] = 'The server is busy. Please try again in a moment.'
+    response = render(request, template, context, status=503)
+    response['Retry-After'] = '5'
+    return response
+
 
 def login_view(request):
     if request.user.is_authenticated:
@@ -15,8 +59,17 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
-        user = authenticate(request, username=username, password=password)
+        # Refuse before authenticate() so throttled attempts cost no hashing,
+        # and count the attempt up front so concurrent guesses all see it.
+        wait = throttle.attempt('login', request, username)
+        if wait:
+            return throttled(request, 'todo/login.html', context, wait)
+        try:
+            user = authenticate(request, username=username, password=password)
+        except HashingBusy:
+            return hashing_busy(request, 'todo/login.html', context)
         if user is not None:
+            throttle.reset('login', username)
             auth_login(request, user)
             return redirect('todo_list')
         else:
@@ -36,109 +89,278 @@ def register_view(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
         password_confirm = request.POST.get('password_confirm')
-        
+        wait = throttle.attempt('register', request)
+        if wait:
+            return throttled(request, 'todo/register.html', context, wait)
+
         if password != password_confirm:
             context['error'] = 'Passwords do not match.'
         elif User.objects.filter(username=username).exists():
             context['error'] = 'Username already taken.'
         else:
-            user = User.objects.create_user(username=username, password=password)
+            try:
+                user = User.objects.create_user(username=username, password=password)
+            except HashingBusy:
+                return hashing_busy(request, 'todo/register.html', context)
             auth_login(request, user)
             return redirect('todo_list')
     
     return render(request, 'todo/register.html', context)
 
-@login_required
-def todo_list(request):  
-    todos = ToDo.objects.filter(user=request.user).order_by('priority', 'due_date')
-    projects = Project.objects.filter(user=request.user)
-    
-    query = request.GET.get('q')
-    project_filter = request.GET.get('project')
-    priority = request.GET.get('priority')
-    status = request.GET.get('status')
-    
-    if query:
-        todos= todos.filter(name__icontains=query)
-    if project_filter:
-        try:
-            todos = todos.filter(project__id=project_filter)
-        except (ValueError, TypeError):
-            pass
-    if priority: 
-        todos = todos.filter(priority=priority)
-    if status == 'completed':
-        todos = todos.filter(completed = True)
-    elif status == 'incomplete':
-        todos = todos.filter(completed = False)
-    return render(request, 'todo/todo_list.html', {
+def todo_list_context(request, todos, next_cursor, projects, rules):
+    """
+    The todo_list template context for one page of evaluated ``todos``,
+    shared with async_views.todo_list. ``rules`` is what
+    recurrence.preview_rules() returned, or None.
+    """
+    return {
         'todos': todos,
+        'rows': display_rows(todos),
+        'upcoming': recurrence.preview(rules, request.GET, timezone.localdate()) if rules is not None else [],
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
         'projects': projects,
-        'query': query,
-        'project_filter': project_filter,
-        'priority': priority,
-        'status': status,
-    })
+        'query': request.GET.get('q'),
+        'project_filter': request.GET.get('project'),
+        'priority': request.GET.get('priority'),
+        'status': request.GET.get('status'),
+        'status_filters': STATUS_FILTERS,
+    }
 
 @login_required
-def reorder_todos(request):
-    if request.method == 'POST':
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.list_etag, last_modified_func=caching.list_last_modified)
+def todo_list(request):  
+    content = caching.get_fragment(request)
+    if content is not None:
+        return render(request, 'todo/todo_list.html', {'content': content})
+
+    # The dropdown's projects say whether any are shared, which decides if
+    # the todo query needs the membership subquery at all.
+    projects = list(sharing.visible_projects(request.user).only('id', 'name'))
+    shared = any(p.shared for p in projects)
+    todos = (sharing.visible_todos(request.user, shared)
+             .select_related('project')
+             .only(*TODO_LIST_FIELDS)
+             .with_overdue())
+    todos, next_cursor = page_todos(todos, request.GET, sharing.todo_parts(request.user) if shared else ())
+    rules = recurrence.preview_rules(request.user, request.GET)
+    context = todo_list_context(request, todos, next_cursor, projects, rules)
+    content = render_to_string('todo/todo_list_items.html', context, request)
+    caching.set_fragment(request, content)
+    return render(request, 'todo/todo_list.html', {'content': content, **context})
+
+def _position(value):
+    # JSON numbers only: int() would also take true, 1.5 or "7".
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f'Position must be an integer, not {value!r}')
+    return value
+
+
+def _parse_reorder(request):
+    """
+    Read a reorder request into ``{todo_id: position}``.
+
+    Accepts a JSON body with either the full ``order`` (list of ids, top
+    first) or a sparse ``moves`` list of ``{"id": ..., "position": ...}`` for
+    just the dragged items, plus the legacy form-encoded ``order[]``.
+    """
+    if request.content_type == 'application/json':
+        payload = json.loads(request.body)
+        if 'moves' in payload:
+            return {int(move['id']): _position(move['position']) for move in payload['moves']}
+        order = payload['order']
+    else:
         order = request.POST.getlist('order[]')
-        for idx, todo_id in enumerate(order):
-            ToDo.objects.filter(id=todo_id, user=request.user).update(priority=idx)
-        return JsonResponse({'success': True})
-    return JsonResponse({'error' : 'Invalid request'}, status=400)
+    # Leave gaps so a later single move can land between two neighbours.
+    return {int(todo_id): idx * POSITION_STEP for idx, todo_id in enumerate(order)}
+
+
+def reorder_limit():
+    return getattr(settings, 'TODO_REORDER_LIMIT', DEFAULT_REORDER_LIMIT)
+
+
+def position_batch_size():
+    """Ids per UPDATE: each takes three parameters (WHEN id THEN position, IN id), plus updated_at."""
+    max_params = connection.features.max_query_params
+    return (max_params - 1) // 3 if max_params else None
+
+
+def apply_positions(user, positions):
+    """
+    Write ``{todo_id: position}`` in one transaction, as one
+    ``UPDATE ... SET position = CASE id WHEN ... END`` per
+    ``position_batch_size()`` ids: a single UPDATE up to 332 ids on SQLite.
+
+    Returns False, writing nothing, if any id does not belong to ``user``.
+    """
+    with transaction.atomic():
+        owned = set(ToDo.objects.filter(user=user, id__in=positions)
+                    .values_list('id', flat=True))
+        if owned != positions.keys():
+            return False
+        now = timezone.now()
+        items = sorted(positions.items())
+        size = position_batch_size() or len(items)
+        for start in range(0, len(items), size):
+            batch = items[start:start + size]
+            ToDo.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                position=Case(*(When(pk=pk, then=Value(position)) for pk, position in batch),
+                              output_field=ToDo._meta.get_field('position')),
+                updated_at=now,
+            )
+    caching.bump_list_version(user.pk)
+    return True
+
+
+def parse_positions(request):
+    """``_parse_reorder`` plus validation; returns None for a bad request."""
+    try:
+        positions = _parse_reorder(request)
+    except (ValueError, TypeError, KeyError):
+        return None
+    if len(positions) > reorder_limit():
+        return None
+    if any(not 0 < pk <= MAX_ID for pk in positions) or any(
+            not 0 <= position <= MAX_POSITION for position in positions.values()):
+        return None
+    return positions
+
+
+@login_required
+def reorder_todos(request):
+    if request.method != 'POST':
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+    positions = parse_positions(request)
+    if positions is None:
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+
+    if not apply_positions(request.user, positions):
+        return JsonResponse({'error': 'Unknown todo'}, status=404)
+    return JsonResponse({'success': True, 'updated': len(positions)})
     
+@login_required
+def todo_export(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return JsonResponse({'error': 'Unknown format'}, status=400)
+    if request.GET.get('queue'):
+        # Write the file off-request; poll the job, then fetch todo_export_file.
+        params = {key: value for key, value in request.GET.items() if key not in ('format', 'queue')}
+        job = jobs.export_later(request.user, fmt, params)
+        return JsonResponse({**job_to_dict(job), 'download': reverse('todo_export_file', args=[job.pk])}, status=202)
+    rows = export.export_rows(sharing.own_todos(request.user), request.GET)
+    response = StreamingHttpResponse(export.export_lines(rows, fmt), content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="todos.{fmt}"'
+    return response
+
+@login_required
+def todo_export_file(request, pk):
+    """The file written by a finished export job."""
+    job = get_object_or_404(Job, pk=pk, user=request.user, kind='export_todos', status=Job.DONE)
+    fmt = job.payload['format']
+    return FileResponse(jobs.job_files().open(job.result['file'], 'rb'), as_attachment=True,
+                        filename=f'todos.{fmt}', content_type=export.FORMATS[fmt])
+
+def import_inline_bytes():
+    return getattr(settings, 'TODO_IMPORT_INLINE_BYTES', DEFAULT_IMPORT_INLINE_BYTES)
+
+@login_required
+def todo_import(request):
+    rejects = []
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = importer.detect_format(upload.name)
+            if upload.size > import_inline_bytes():
+                job = jobs.import_later(request.user, upload, fmt)
+                messages.info(request, f'Large file: importing in the background (job {job.pk}).')
+                return redirect('todo_list')
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8', errors='replace', newline='')
+
+            def on_reject(number, row, errors):
+                if len(rejects) < MAX_SHOWN_REJECTS:
+                    rejects.append({'line': number, 'errors': errors})
+
+            run = importer.Importer(request.user, on_reject=on_reject).run(importer.read_rows(lines, fmt))
+            messages.success(request, f'Imported {run.created} tasks ({run.rejected} rejected).')
+            if not run.rejected:
+                return redirect('todo_list')
+    else:
+        form = ImportForm()
+    return render(request, 'todo/todo_import.html', {'form': form, 'rejects': rejects})
+
 @login_required
 def todo_create(request): 
     project_id = request.GET.get('project')  
     project= None
     if project_id:
-        project=get_object_or_404(Project, id=project_id, user=request.user)
+        project=get_object_or_404(sharing.editable_projects(request.user), id=project_id)
         
     if request.method == 'POST':
         form = ToDoForm(request.POST, user= request.user)
-        if form.is_valid():
+        repeat_form = RecurrenceForm(request.POST, prefix='repeat')
+        if forms_valid(form, repeat_form):
             todo = form.save(commit=False)
             todo.user = request.user
             todo.save()
+            repeat_form.save_for(todo)
             messages.success(request, 'Task created successfully!')
             return redirect('todo_list')
         else:
             print(form.errors)
     else:
         form = ToDoForm(user= request.user, initial={'project': project})
+        repeat_form = RecurrenceForm(prefix='repeat')
     
     return render(request, 'todo/todo_form.html', {
         'form': form,
+        'repeat_form': repeat_form,
         'action': 'Create'
     })
 
+def forms_valid(form, repeat_form):
+    """Validate a ToDoForm and its RecurrenceForm together; repeating needs a due date."""
+    valid = form.is_valid() & repeat_form.is_valid()
+    if valid and repeat_form.repeats and not form.cleaned_data.get('due_date'):
+        form.add_error('due_date', 'Repeating todos need a due date.')
+        valid = False
+    return valid
+
 @login_required
 def todo_edit(request, pk):  # Renamed from todo_edit
-    todo = get_object_or_404(ToDo, pk=pk, user=request.user)
-    
+    # The repeat rule comes in the same query, through the reverse one-to-one.
+    todo = get_object_or_404(sharing.editable_todos(request.user).select_related('recurrence'), pk=pk)
+    try:
+        rule = todo.recurrence
+    except Recurrence.DoesNotExist:
+        rule = None
     if request.method == 'POST':
         form = ToDoForm(request.POST, instance=todo, user=request.user)
-        if form.is_valid():
+        repeat_form = RecurrenceForm(request.POST, prefix='repeat', instance=rule)
+        if forms_valid(form, repeat_form):
             form.save()
+            repeat_form.save_for(todo)
             messages.success(request, 'Task updated successfully!')
             return redirect('todo_list')
     else:
         form = ToDoForm(instance=todo)
+        repeat_form = RecurrenceForm(prefix='repeat', instance=rule)
     
     return render(request, 'todo/todo_form.html', {
         'form': form,
+        'repeat_form': repeat_form,
         'todo': todo,
         'action': 'Edit'
     })
 
 @login_required
 def todo_delete(request, pk):  # Renamed from todo_delete
-    todo = get_object_or_404(ToDo, pk=pk, user=request.user)
+    todo = get_object_or_404(sharing.editable_todos(request.user), pk=pk)
     
     if request.method == 'POST':
-        todo.delete()
+        todo.soft_delete()
         messages.success(request, 'Task deleted successfully!')
         return redirect('todo_list')
     
@@ -146,27 +368,88 @@ def todo_delete(request, pk):  # Renamed from todo_delete
 
 @login_required
 def todo_toggle_complete(request, pk):  # Renamed from todo_toggle_complete
-    todo = get_object_or_404(ToDo, pk=pk, user=request.user)
-    
-    if todo.completed:
-        todo.mark_incomplete()
-        status = 'incomplete'
-    else:
-        todo.mark_complete()
-        status = 'complete'
-    
+    # One UPDATE flips the flag, with the permission check in its WHERE;
+    # there is no SELECT of the todo first.
+    changed = sharing.editable_todos(request.user).filter(pk=pk).toggle_completed()
+    if not changed:
+        raise Http404('No ToDo matches the given query.')
+    sharing.bump_members(changed.project_ids, [request.user.pk])
+    completed = changed[pk]
+    status = 'complete' if completed else 'incomplete'
+
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'status': status,
-            'completed': todo.completed
+            'completed': completed
         })
 
     messages.success(request, f'Todo marked as {status}!')
     return redirect('todo_list')
 
+
+def parse_completion(request):
+    """
+    Read a bulk completion request into ``(filters, completed)``.
+
+    Takes ``ids`` (list of todo ids) or ``project`` (a project id), plus an
+    optional ``completed`` flag that defaults to true, as JSON or form data.
+    Returns None for a bad request.
+    """
+    try:
+        if request.content_type == 'application/json':
+            payload = json.loads(request.body)
+            ids, project, completed = payload.get('ids'), payload.get('project'), payload.get('completed', True)
+        else:
+            ids = request.POST.getlist('ids[]') or None
+            project = request.POST.get('project')
+            completed = request.POST.get('completed', 'true').lower() not in ('0', 'false')
+        if ids is not None:
+            filters = {'pk__in': [int(pk) for pk in ids]}
+        elif project is not None:
+            filters = {'project_id': int(project)}
+        else:
+            return None
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not isinstance(completed, bool):
+        return None
+    return filters, completed
+
+
+def complete_todos(user, filters, completed=True):
+    """Set ``completed`` on the matching todos the user may change with one UPDATE; returns the count."""
+    changed = sharing.editable_todos(user).filter(**filters).set_completed(completed)
+    if changed:
+        sharing.bump_members(changed.project_ids, [user.pk])
+    return len(changed)
+
+
+@login_required
+def todo_complete_bulk(request):
+    if request.method != 'POST':
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+    parsed = parse_completion(request)
+    if parsed is None:
+        return JsonResponse({'error' : 'Invalid request'}, status=400)
+    filters, completed = parsed
+    if 'project_id' in filters:
+        get_object_or_404(sharing.editable_projects(request.user), pk=filters['project_id'])
+
+    updated = complete_todos(request.user, filters, completed)
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.content_type == 'application/json':
+        return JsonResponse({'success': True, 'updated': updated})
+    messages.success(request, f'{updated} todo(s) marked as {"complete" if completed else "incomplete"}.')
+    return redirect('project_list' if 'project_id' in filters else 'todo_list')
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.list_etag, last_modified_func=caching.list_last_modified)
+def dashboard(request):
+    return render(request, 'todo/dashboard.html', {'stats': stats.user_stats(request.user)})
+
 @login_required
 def project_list(request):
-    projects = Project.objects.filter(user=request.user)
+    projects = sharing.visible_projects(request.user)
     return render(request, 'todo/project_list.html', {
         'projects': projects,})
 
@@ -189,8 +472,16 @@ def project_delete(request, pk):
     project = get_object_or_404(Project, pk=pk, user=request.user)
     
     if request.method == 'POST':
-        project.delete()
+        # Big projects take a while; the job deletes in batches off-request.
+        jobs.delete_projects_later(request.user, [project.pk])
         messages.success(request, f"Project '{project.name}' deleted successfully!")
         return redirect('project_list')
     
-    return render(request, 'todo/project_confirm_delete.html', {'project': project})
\ No newline at end of file
+    return render(request, 'todo/project_confirm_delete.html', {'project': project})
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view latency histogram and query/DB/template averages for this process."""
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.histogram.reset()
+    return JsonResponse({'views': metrics.histogram.snapshot()})